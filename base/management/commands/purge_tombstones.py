@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from base.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Remove the tombstones older than the time to live, older sync tokens start over'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl', type=int, default=int(settings.SYNC_SETTINGS['TOMBSTONE_TTL']),
+            help='Days the tombstones are kept',
+        )
+
+    def handle(self, *args, **options):
+        count, _ = Tombstone.objects.filter(modified_at__lt=timezone.now() - timedelta(days=options['ttl'])).delete()
+        self.stdout.write(f'{count} tombstones removed')
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0002_alter_address_latitude'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='modified at')),
+                ('model', models.CharField(help_text='Label of the model, e.g. fields.footballfield', max_length=100)),
+                ('object_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['modified_at', 'id'], name='base_addres_modifie_a1b51c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['modified_at', 'id'], name='base_tombst_modifie_4e1a80_idx'),
+        ),
+    ]
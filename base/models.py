@@ -56,3 +56,26 @@ class Address(BaseModel):
     latitude = models.FloatField(
         blank=True, null=True
     )
+
+    class Meta:
+        indexes = [
+            # changes since a sync token, see fields.services.FieldChangesService
+            models.Index(fields=('modified_at', 'id')),
+        ]
+
+
+class Tombstone(BaseModel):
+    """
+    Deleted rows, the clients syncing the changes remove them as well.
+    Kept for `SYNC_SETTINGS['TOMBSTONE_TTL']` days, older sync tokens start over.
+    """
+    model = models.CharField(max_length=100, help_text=_("Label of the model, e.g. fields.footballfield"))
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('modified_at', 'id')),
+        ]
+
+    def __str__(self):
+        return f'{self.model}:{self.object_id}'
@@ -4,6 +4,10 @@ from base.models import Address
 
 
 class AddressSerializer(serializers.ModelSerializer):
+    # the name of the district is returned, see `to_representation`
+    select_related_fields = {'district': ('district',)}
+    method_field_columns = {'district': ('district', 'district__name')}
+
     country = serializers.CharField(source='district.region.country.name', read_only=True)
     region = serializers.CharField(source='district.region.name', read_only=True)
 
@@ -22,5 +26,6 @@ class AddressSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['district'] = instance.district.name
+        if 'district' in data:
+            data['district'] = instance.district.name
         return data
\ No newline at end of file
@@ -1,10 +1,133 @@
+import hashlib
+from typing import Optional
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.translation import get_language
 from rest_framework import viewsets, status
 
 from utils.paginations import DynamicPagination
 from utils.response import SuccessResponse
+from utils.serializers import EagerLoadingMixin, parse_fieldset
 
 
 class BaseModelViewSet(DynamicPagination, viewsets.ModelViewSet):
+    # `utils.projections.Projection` used for the list instead of the serializer, see `get_list_projection`
+    list_projection = None
+    # sparse fieldsets, e.g. `?fields=id,name,address.latitude`
+    fields_query_param = 'fields'
+    # columns the response changes with, usually `modified_at` of the model and of the relations
+    # the serializer reads, the ETag of `retrieve` and `list` is built from their greatest values
+    etag_fields = ('modified_at',)
+    # the ETag of the list is an aggregate over the whole filtered queryset on every request,
+    # enabled where that is cheaper than building the page, never in keyset pagination
+    list_etag = False
+
+    def get_fieldset(self):
+        """
+        Returns the fields requested by the client, None for all of them.
+        Reads only, writes validate and return the whole object.
+        """
+        if not hasattr(self, '_fieldset'):
+            request = self.request
+            is_read = request is not None and request.method in ('GET', 'HEAD')
+            value = request.query_params.get(self.fields_query_param) if is_read else None
+            self._fieldset = parse_fieldset(value) if value else None
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+    def get_list_projection(self):
+        if self.action == 'list' and self.list_projection is not None:
+            return self.list_projection(self.get_fieldset())
+        return None
+
+    def get_list_data(self, queryset):
+        """
+        Paginates the queryset and returns the serialized page
+        """
+        projection = self.get_list_projection()
+        if projection is not None:
+            rows = self.paginate_queryset(projection.apply(queryset), self.request)
+            return projection.map(rows)
+
+        paginated_queryset = self.paginate_queryset(queryset, self.request)
+        return self.get_serializer(paginated_queryset, many=True).data
+
+    def get_etag_fields(self):
+        return self.etag_fields
+
+    def get_etag_validator(self, queryset) -> Optional[str]:
+        """
+        Validator of the rows the response is built from, read with one aggregate query
+        instead of serializing them. None if there are no rows or nothing to validate.
+        """
+        fields = self.get_etag_fields()
+        if not fields:
+            return None
+        queryset = queryset.order_by()
+        aggregates = queryset.aggregate(
+            etag_count=Count('pk'),
+            # changes when rows leave the result and others join it
+            etag_ids=Sum('pk'),
+            **{f'etag_{index}': Max(name) for index, name in enumerate(fields)}
+        )
+        if not aggregates['etag_count']:
+            return None
+        sql, params = queryset.query.sql_with_params()
+        return f'{sql}:{params!r}:{sorted(aggregates.items())!r}'
+
+    def get_etag(self, validator: Optional[str]) -> Optional[str]:
+        """
+        Strong ETag of the response, the same validator gives the same response for the same request
+        """
+        if validator is None:
+            return None
+        request = self.request
+        parts = (
+            validator,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            str(request.user.pk),
+            get_language() or '',
+        )
+        return '"%s"' % hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+    def get_not_modified_response(self, etag: Optional[str]):
+        """
+        Returns 304 if the client has the response with the ETag, None to build the response
+        """
+        if etag is None:
+            return None
+        response = get_conditional_response(self.request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+        return response
+
+    def get_object_queryset(self):
+        """
+        Queryset of the object `get_object` returns
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def get_list_response_data(self, queryset) -> dict:
+        """
+        The paginated list, views add to it what is computed from the whole filtered queryset
+        """
+        return self.get_paginated_data(self.get_list_data(queryset))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # load the relations the serializer of the action reads, see `EagerLoadingMixin`
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, EagerLoadingMixin):
+            queryset = serializer_class.setup_eager_loading(queryset, self.get_fieldset())
+        return queryset
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -16,17 +139,28 @@ class BaseModelViewSet(DynamicPagination, viewsets.ModelViewSet):
         }
         return SuccessResponse(**data)
 
+    def has_list_etag(self) -> bool:
+        return self.list_etag and self.cursor_query_param not in self.request.query_params
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        paginated_queryset = self.paginate_queryset(queryset, request)
-        serializer = self.get_serializer(paginated_queryset, many=True)
-        return SuccessResponse(**{"data": self.get_paginated_data(serializer.data)})
+        etag = self.get_etag(self.get_etag_validator(queryset)) if self.has_list_etag() else None
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = SuccessResponse(**{"data": self.get_list_response_data(queryset)})
+        if etag:
+            response['ETag'] = etag
+        return response
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance=instance, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        # relations prefetched by `filter_queryset` may have changed, they are read again
+        instance._prefetched_objects_cache = {}
         data = {
             "status": status.HTTP_200_OK,
             "message": "Updated successfully.",
@@ -35,20 +169,31 @@ class BaseModelViewSet(DynamicPagination, viewsets.ModelViewSet):
         return SuccessResponse(**data)
 
     def retrieve(self, request, *args, **kwargs):
+        # the object permissions are checked before anything is answered about it
         instance = self.get_object()
+        etag = self.get_etag(self.get_etag_validator(self.get_object_queryset()))
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = self.get_serializer(instance=instance)
         data = {
             "status": status.HTTP_200_OK,
             "message": "Retrieved successfully.",
             "data": serializer.data
         }
-        return SuccessResponse(**data)
+        response = SuccessResponse(**data)
+        if etag:
+            response['ETag'] = etag
+        return response
 
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance=instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        # relations prefetched by `filter_queryset` may have changed, they are read again
+        instance._prefetched_objects_cache = {}
         data = {
             "status": status.HTTP_200_OK,
             "message": "Updated successfully.",
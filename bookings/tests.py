@@ -1,3 +1,73 @@
+import json
+from datetime import datetime, timedelta, timezone
+
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from bookings.models import Booking
+from bookings.v1.projections import BookingListProjection
+from bookings.v1.serializers import BookingSerializer
+from fields.tests import create_field, create_owner
+from user.models import User
+from utils.constants import AuthMethod, BookingStatus, UserTypes
+from utils.serializers import parse_fieldset
+
+
+def render(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+class BookingListProjectionTest(TestCase):
+    """
+    The projection returns what the serializer it stands for does
+    """
+
+    def setUp(self):
+        field = create_field(create_owner())
+        customer = User.objects.create_user(
+            phone_number='+998901112233', user_type=UserTypes.CUSTOMER,
+            auth_method=AuthMethod.PHONE, full_name='Customer',
+        )
+        # microseconds and a time zone other than the one of the response
+        start_time = datetime(2030, 1, 1, 10, 0, 0, 123456, tzinfo=timezone.utc)
+        for index, status in enumerate((BookingStatus.PENDING, BookingStatus.ACCEPTED)):
+            Booking.objects.create(
+                user=customer, field=field, status=status, total_price=100000,
+                start_time=start_time + timedelta(hours=index * 2),
+                end_time=start_time + timedelta(hours=index * 2 + 1),
+            )
+
+    def assertProjectionEqual(self, fields=None):
+        fieldset = parse_fieldset(fields) if fields else None
+        queryset = BookingSerializer.setup_eager_loading(Booking.objects.order_by('start_time'), fieldset)
+        serialized = BookingSerializer(queryset, many=True, context={'fieldset': fieldset}).data
+        projection = BookingListProjection(fieldset)
+        self.assertEqual(render(projection.map(projection.apply(queryset))), render(serialized))
+
+    def test_all_fields(self):
+        self.assertProjectionEqual()
+
+    def test_fieldset(self):
+        self.assertProjectionEqual('id,field_name,start_time')
+
+
+class BookingCreateTest(TestCase):
+
+    def setUp(self):
+        self.field = create_field(create_owner())
+        customer = User.objects.create_user(
+            phone_number='+998901112233', user_type=UserTypes.CUSTOMER,
+            auth_method=AuthMethod.PHONE, full_name='Customer',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {customer.get_pair_token()['access']}")
+
+    def test_fieldset_does_not_skip_validation(self):
+        response = self.client.post(f'/api/v1/fields/{self.field.pk}/bookings/?fields=id', {}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
 
-# Create your tests here.
+    def test_serializer_with_data_is_not_pruned(self):
+        serializer = BookingSerializer(data={}, context={'fieldset': parse_fieldset('id')})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('hours', serializer.errors)
@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+from utils.projections import Projection, field_converter
+
+datetime = field_converter(serializers.DateTimeField())
+
+
+class BookingListProjection(Projection):
+    """
+    `BookingSerializer` read from rows
+    """
+    fields = {
+        'id': 'id',
+        'field': 'field_id',
+        'field_name': 'field__name',
+        'start_time': ('start_time', datetime),
+        'end_time': ('end_time', datetime),
+        'total_price': 'total_price',
+        'status': 'status',
+    }
@@ -3,9 +3,10 @@ from rest_framework import serializers
 from bookings.dataclasses import BookingData
 from bookings.models import Booking
 from bookings.services import BookingService
+from utils.serializers import EagerLoadingMixin, SparseFieldsetMixin
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for creating and displaying bookings.
     """
@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 
 from base.v1.views import BaseModelViewSet
 from bookings.models import Booking
+from bookings.v1.projections import BookingListProjection
 from bookings.v1.serializers import BookingSerializer
 from user.permissions import IsOwnerOrAdmin
 from utils.constants import BookingStatus
@@ -18,6 +19,9 @@ class BookingViewSet(BaseModelViewSet):
         'status'
     )
     serializer_class = BookingSerializer
+    list_projection = BookingListProjection
+    # the name of the field is shown as well
+    etag_fields = ('modified_at', 'field__modified_at')
 
     def get_permissions(self):
         if self.action == 'create':
@@ -37,14 +41,14 @@ class BookingViewSet(BaseModelViewSet):
             BookingStatus.CANCELLED: 4,
             BookingStatus.REJECTED: 5
         }
-        queryset = Booking.objects.filter(field_id=field_id)
-        return queryset.order_by(
-            Case(
+        queryset = Booking.objects.filter(field_id=field_id).annotate(
+            # annotated, so it can be a key of the cursor pagination
+            status_priority=Case(
                 *[When(status=status, then=Value(priority)) for status, priority in status_order.items()],
                 output_field=IntegerField()
-            ),
-            'start_time'
+            )
         )
+        return queryset.order_by('status_priority', 'start_time')
 
     def list(self, request, *args, **kwargs):
         """
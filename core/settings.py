@@ -46,6 +46,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # trigram lookups of the field search, see fields.filters.FieldsSearchFilter
+    'django.contrib.postgres',
 
     # my apps
     'user',
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
     'bookings',
     'file',
     'base',
+    'notifications',
 
     # third party apps
     'django_filters',
@@ -108,6 +111,18 @@ DATABASES = {
     }
 }
 
+# Cache
+# should be shared between the workers in production, set REDIS_URL (requires the `redis` package),
+# the revoked user tokens are kept in it, `manage.py check --deploy` fails with the local memory cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL'),
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
@@ -118,7 +133,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.StatelessJWTAuthentication',
     ),
 
     'DEFAULT_PAGINATION_CLASS': 'utils.paginations.DynamicPagination',
@@ -127,7 +142,17 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter'
-    ]
+    ],
+    # reverse proxies in front of the app which append the client address to X-Forwarded-For,
+    # the address of the client is taken from there and REMOTE_ADDR is used with none, see user.throttling
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # see user.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'send_otp_identifier': os.environ.get('SEND_OTP_IDENTIFIER_RATE', '5/hour'),
+        'send_otp_ip': os.environ.get('SEND_OTP_IP_RATE', '100/hour'),
+        'verify_otp_identifier': os.environ.get('VERIFY_OTP_IDENTIFIER_RATE', '10/hour'),
+        'verify_otp_ip': os.environ.get('VERIFY_OTP_IP_RATE', '200/hour'),
+    }
 }
 
 SIMPLE_JWT = {
@@ -137,12 +162,90 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer", ),
 }
 
+PAGINATION_SETTINGS = {
+    # exact counts are cached per query for this many seconds, see utils.paginations.CountingPaginator
+    'COUNT_CACHE_TIMEOUT': os.environ.get('PAGINATION_COUNT_CACHE_TIMEOUT', 30),
+    # above this many rows estimated by the PostgreSQL planner the estimate is returned instead of counting
+    'COUNT_ESTIMATE_THRESHOLD': os.environ.get('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 100000),
+}
+
+AUTH_SETTINGS = {
+    # full users kept in memory for requests authenticated from the token claims
+    'USER_CACHE_SIZE': os.environ.get('AUTH_USER_CACHE_SIZE', 1024),
+    'USER_CACHE_TIMEOUT': os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60),  # seconds
+    # in-process filter in front of the revoked tokens table
+    'REVOCATION_REBUILD_INTERVAL': os.environ.get('AUTH_REVOCATION_REBUILD_INTERVAL', 60),  # seconds
+    'REVOCATION_ERROR_RATE': os.environ.get('AUTH_REVOCATION_ERROR_RATE', 0.001),
+}
+
 OTP_SETTINGS = {
     'OTP_LENGTH': os.environ.get('OTP_LENGTH', 6),
     'OTP_EXPIRE_TIME': os.environ.get('OTP_EXPIRE_TIME', 120),  # seconds
     'OTP_RESEND_TIME': os.environ.get('OTP_RESEND_TIME', 120),  # seconds
 }
 
+FILE_SETTINGS = {
+    # worker processes generating the image variants, see file.services.ImagePipeline
+    'PROCESS_POOL_SIZE': os.environ.get('FILE_PROCESS_POOL_SIZE', 2),
+    # resumable uploads, see file.services.UploadSessionService
+    'UPLOAD_MAX_SIZE': os.environ.get('FILE_UPLOAD_MAX_SIZE', 100 * 1024 * 1024),
+    # seconds an unfinished upload is kept after its last chunk
+    'UPLOAD_SESSION_TTL': os.environ.get('FILE_UPLOAD_SESSION_TTL', 24 * 60 * 60),
+    # media served by file.serving.serve_media, the bytes can be sent by the front proxy:
+    # 'x-accel-redirect' (nginx, MEDIA_ACCEL_PREFIX is an internal location aliased to MEDIA_ROOT)
+    # or 'x-sendfile' (apache, lighttpd), empty to send them from the worker
+    'MEDIA_OFFLOAD': os.environ.get('FILE_MEDIA_OFFLOAD', ''),
+    'MEDIA_ACCEL_PREFIX': os.environ.get('FILE_MEDIA_ACCEL_PREFIX', '/protected-media/'),
+    # cache lifetime of the files without a content hash in the name
+    'MEDIA_MAX_AGE': os.environ.get('FILE_MEDIA_MAX_AGE', 60 * 60),
+    # files no model refers to are deleted after this many seconds, see file.services.OrphanFileCollector
+    'ORPHAN_GRACE_PERIOD': os.environ.get('FILE_ORPHAN_GRACE_PERIOD', 24 * 60 * 60),
+    'ORPHAN_BATCH_SIZE': os.environ.get('FILE_ORPHAN_BATCH_SIZE', 500),
+}
+
+FIELDS_SETTINGS = {
+    # responses of the anonymous field list are cached for this many seconds, see fields.v1.views.FootballFieldViewSet
+    'LIST_CACHE_TIMEOUT': os.environ.get('FIELDS_LIST_CACHE_TIMEOUT', 60),
+    # degrees the latitude and longitude are rounded to, 0.01 is about a kilometer
+    'LIST_CACHE_COORDINATE_GRID': os.environ.get('FIELDS_LIST_CACHE_COORDINATE_GRID', '0.01'),
+    # seconds the other requests wait for the one building a missing response
+    'LIST_CACHE_LOCK_TIMEOUT': os.environ.get('FIELDS_LIST_CACHE_LOCK_TIMEOUT', 10),
+    # names suggested by the autocomplete, see fields.autocomplete.AutocompleteIndex
+    'AUTOCOMPLETE_LIMIT': os.environ.get('FIELDS_AUTOCOMPLETE_LIMIT', 10),
+    'AUTOCOMPLETE_MAX_LIMIT': os.environ.get('FIELDS_AUTOCOMPLETE_MAX_LIMIT', 50),
+    # seconds, picks up the changes made by the other processes
+    'AUTOCOMPLETE_REBUILD_INTERVAL': os.environ.get('FIELDS_AUTOCOMPLETE_REBUILD_INTERVAL', 300),
+    # `?ordering=best_match`, see fields.services.FieldRankingService
+    'RANKING_MAX_CANDIDATES': os.environ.get('FIELDS_RANKING_MAX_CANDIDATES', 500),
+    'RANKING_DISTANCE_WEIGHT': os.environ.get('FIELDS_RANKING_DISTANCE_WEIGHT', 0.5),
+    'RANKING_PRICE_WEIGHT': os.environ.get('FIELDS_RANKING_PRICE_WEIGHT', 0.3),
+    'RANKING_AVAILABILITY_WEIGHT': os.environ.get('FIELDS_RANKING_AVAILABILITY_WEIGHT', 0.2),
+    # bounds of the bands counted by `?facets=true`, see fields.services.FieldFacetService
+    'FACET_PRICE_BANDS': os.environ.get('FIELDS_FACET_PRICE_BANDS', '100000,200000,300000'),  # hourly price
+    'FACET_SIZE_BANDS': os.environ.get('FIELDS_FACET_SIZE_BANDS', '1000,3000,6000'),  # square meters
+}
+
+SYNC_SETTINGS = {
+    # rows of each kind returned by one request of the changes endpoint, see fields.services.FieldChangesService
+    'BATCH_SIZE': os.environ.get('SYNC_BATCH_SIZE', 200),
+    # seconds rows are left to settle, so rows of transactions committed late are not skipped
+    'SETTLE_TIME': os.environ.get('SYNC_SETTLE_TIME', 5),
+    # days the tombstones of deleted rows are kept, older tokens get the whole catalog again
+    'TOMBSTONE_TTL': os.environ.get('SYNC_TOMBSTONE_TTL', 30),
+}
+
+SMS_SETTINGS = {
+    # class implementing notifications.providers.BaseSMSProvider
+    'PROVIDER': os.environ.get('SMS_PROVIDER', 'notifications.providers.LogSMSProvider'),
+    'LOG_FILE': os.environ.get('SMS_LOG_FILE'),  # used by LogSMSProvider
+    'BATCH_SIZE': os.environ.get('SMS_BATCH_SIZE', 50),
+    'CONCURRENCY': os.environ.get('SMS_CONCURRENCY', 5),
+    'MAX_ATTEMPTS': os.environ.get('SMS_MAX_ATTEMPTS', 5),
+    'RETRY_DELAY': os.environ.get('SMS_RETRY_DELAY', 5),  # seconds, doubled on every retry
+    'LEASE_TIME': os.environ.get('SMS_LEASE_TIME', 60),  # seconds
+    'SEND_TIMEOUT': os.environ.get('SMS_SEND_TIMEOUT', 10),  # seconds, shorter than the lease time
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -1,6 +1,42 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
 
 class FieldsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fields'
+
+    def ready(self):
+        from base.models import Address, Country, District, Region
+        from bookings.models import Booking
+        from file.models import File
+        from file.signals import file_processed
+        from fields.models import FootballField, FootballFieldImage
+        from fields.signals import (
+            cover_image_processed_signal, cover_image_deleted_signal, fields_list_changed_signal, tombstone_signal,
+            search_vector_signal, autocomplete_signal, autocomplete_deleted_signal,
+        )
+
+        # keep the denormalized cover thumbnail in sync with the cover image
+        file_processed.connect(cover_image_processed_signal, sender=File)
+        pre_delete.connect(cover_image_deleted_signal, sender=File)
+
+        # invalidate the cached field lists, the names of the places are shown and filtered by as well
+        for model in (FootballField, FootballFieldImage, Address, District, Region, Country, File, Booking):
+            post_save.connect(fields_list_changed_signal, sender=model)
+            post_delete.connect(fields_list_changed_signal, sender=model)
+        m2m_changed.connect(fields_list_changed_signal, sender=FootballField.images.through)
+
+        # deleted rows are synced to the clients, see `FieldChangesService`
+        for model in (FootballField, Address, File):
+            post_delete.connect(tombstone_signal, sender=model)
+
+        # keep the full text search index up to date
+        post_save.connect(search_vector_signal, sender=FootballField)
+        post_save.connect(search_vector_signal, sender=Address)
+        post_save.connect(search_vector_signal, sender=District)
+
+        # names suggested by the autocomplete of this process
+        for model in (FootballField, District, Region):
+            post_save.connect(autocomplete_signal, sender=model)
+            post_delete.connect(autocomplete_deleted_signal, sender=model)
@@ -0,0 +1,107 @@
+import threading
+import time
+import unicodedata
+from typing import List
+
+from django.conf import settings
+
+from utils.prefix_index import PrefixIndex
+
+# Uzbek latin is written with any of these for o‘ and g‘
+APOSTROPHES = str.maketrans({'‘': "'", '’': "'", 'ʻ': "'", 'ʼ': "'", '`': "'"})
+
+
+def normalize_name(value: str) -> str:
+    """
+    Case, accents and apostrophes are ignored, so `Chilonzor`, `chilonzor` and `Chilónzor` are the same
+    """
+    value = unicodedata.normalize('NFKD', value.translate(APOSTROPHES).casefold())
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.split())
+
+
+def get_name_keys(name: str) -> List[str]:
+    """
+    The name from the start of every word, `Olimp Arena` is found by `oli` and `are` as well
+    """
+    words = normalize_name(name).split(' ')
+    return [' '.join(words[index:]) for index in range(len(words)) if words[index]]
+
+
+class AutocompleteIndex:
+    """
+    Process local prefix index of the names of the active fields, the districts and the regions.
+
+    Changes made in this process are applied by the signals once committed, see `fields.signals.autocomplete_signal`,
+    changes made by the other processes once the index is rebuilt every `rebuild_interval` seconds.
+    """
+    FIELD = 'field'
+    DISTRICT = 'district'
+    REGION = 'region'
+
+    def __init__(self, rebuild_interval: int):
+        self.rebuild_interval = rebuild_interval
+        self._index = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        index = self._get_index()
+        with self._lock:
+            return index.search(prefix, limit)
+
+    def update(self, kind: str, pk, name: str, is_active: bool = True):
+        if self._index is None:
+            # built with the change on first use
+            return
+        with self._lock:
+            if is_active:
+                self._index.add((kind, pk), get_name_keys(name), {'type': kind, 'id': pk, 'name': name})
+            else:
+                self._index.remove((kind, pk))
+
+    def remove(self, kind: str, pk):
+        self.update(kind, pk, '', is_active=False)
+
+    def rebuild(self):
+        from base.models import District, Region
+        from fields.models import FootballField
+
+        querysets = (
+            (self.FIELD, FootballField.objects.active()),
+            (self.DISTRICT, District.objects.all()),
+            (self.REGION, Region.objects.all()),
+        )
+        index = PrefixIndex()
+        index.build(
+            ((kind, pk), get_name_keys(name), {'type': kind, 'id': pk, 'name': name})
+            for kind, queryset in querysets
+            for pk, name in queryset.values_list('pk', 'name').iterator()
+        )
+
+        with self._lock:
+            self._index = index
+        self._built_at = time.monotonic()
+
+    def _get_index(self) -> PrefixIndex:
+        if self._index is None:
+            with self._rebuild_lock:
+                if self._index is None:
+                    self.rebuild()
+        elif time.monotonic() - self._built_at > self.rebuild_interval:
+            # a single thread rebuilds, the others keep using the current index
+            if self._rebuild_lock.acquire(blocking=False):
+                try:
+                    self.rebuild()
+                finally:
+                    self._rebuild_lock.release()
+        return self._index
+
+
+autocomplete_index = AutocompleteIndex(
+    rebuild_interval=int(settings.FIELDS_SETTINGS['AUTOCOMPLETE_REBUILD_INTERVAL']),
+)
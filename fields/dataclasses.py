@@ -1,7 +1,9 @@
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Dict, Optional, List
 
-from base.models import District
+from base.models import Address, District
+from fields.models import FootballField
+from file.models import File
 from user.models import User
 
 
@@ -24,5 +26,22 @@ class FootballFieldData:
     length: float
     contact_number2: Optional[str] = None
     description: Optional[str] = None
-    images: Optional[List[str]] = None
+    images: Optional[List[File]] = None
+    cover_image: Optional[File] = None
     address_data: Optional[AddressData] = None
+
+
+@dataclass
+class FieldChanges:
+    """
+    One batch of the changes of the field catalog, see `FieldChangesService`
+    """
+    token: str
+    has_more: bool
+    fields: List[FootballField]
+    addresses: List[Address]
+    images: List[File]
+    # kind -> ids of the deleted or deactivated rows
+    deleted: Dict[str, List[int]]
+    # the token is too old, the client drops its copy and gets the whole catalog
+    reset: bool = False
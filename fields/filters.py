@@ -1,7 +1,41 @@
-from rest_framework.filters import OrderingFilter
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.filters import OrderingFilter, SearchFilter
 from django_filters import rest_framework as filters
 
 from fields.models import FootballField
+from utils.constants import Languages
+
+
+class FieldsSearchFilter(SearchFilter):
+    """
+    Full text search over `FootballField.search_vector`, annotated with its relevance as `search_rank`.
+
+    The query is matched in every language of `Languages.SEARCH_CONFIGS`, names are matched by trigrams
+    of their words as well, so a mistyped or unfinished name still finds the field.
+    On other databases than PostgreSQL, e.g. SQLite in tests, it falls back to the icontains search
+    of `search_fields`, which matches the same columns but neither ranks nor forgives typos.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        text = ' '.join(terms)
+        query = reduce(or_, (
+            SearchQuery(text, config=config, search_type='websearch')
+            for config in dict.fromkeys(Languages.SEARCH_CONFIGS.values())
+        ))
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=text)
+        ).annotate(
+            search_rank=SearchRank(F('search_vector'), query) + TrigramWordSimilarity(text, 'name')
+        )
 
 
 class FieldsOrdering(OrderingFilter):
@@ -17,13 +51,27 @@ class FieldsOrdering(OrderingFilter):
         - `?ordering=-distance` (Descending by distance)
         - `?ordering=name` (Ascending by name)
         - `?ordering=-name` (Descending by name)
+        - `?ordering=best_match` (By the score of `FieldRankingService`, ordered by the view,
+          only the first `RANKING_MAX_CANDIDATES` fields are ranked)
+
+    Searched fields are ordered by relevance unless the ordering is given.
     """
+    BEST_MATCH = 'best_match'
+
+    def is_best_match(self, request) -> bool:
+        return request.query_params.get(self.ordering_param) == self.BEST_MATCH
+
     def filter_queryset(self, request, queryset, view):
         ordering = self.get_ordering(request, queryset, view)
         return queryset.order_by(*ordering) if ordering else queryset
 
     def get_ordering(self, request, queryset, view):
+        if self.ordering_param not in request.query_params and 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', 'name')
         ordering = request.query_params.get(self.ordering_param, 'distance')
+        if ordering == self.BEST_MATCH:
+            # the order of the candidates
+            return ('distance', 'name')
         if not ordering:
             return ('name',)
         asc = not ordering.startswith('-')
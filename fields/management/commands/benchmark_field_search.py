@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from base.models import Address, Country, District, Region
+from fields.filters import FieldsSearchFilter
+from fields.models import FootballField
+from fields.services import FootballFieldService
+from fields.v1.views import FootballFieldViewSet
+from user.models import User
+from utils.constants import AuthMethod, UserTypes
+
+NAME_WORDS = (
+    'arena', 'stadium', 'park', 'olimp', 'victory', 'star', 'lokomotiv', 'bunyodkor', 'pakhtakor',
+    'sport', 'city', 'green', 'central', 'football', 'futbol', 'maydon', 'stadion', 'mini',
+)
+STREET_WORDS = ('amir temur', 'navoi', 'mustaqillik', 'bobur', 'chilonzor', 'yunusobod', 'shota rustaveli')
+DESCRIPTION_WORDS = (
+    'covered', 'artificial', 'grass', 'lights', 'parking', 'showers', 'lockers', 'indoor', 'outdoor',
+    'крытое', 'поле', 'освещение', 'парковка', 'искусственный', 'газон',
+)
+# exact words, prefixes, typos, several words and other languages
+QUERIES = ('arena', 'pakhtakor', 'bunyod', 'stadiun', 'green park', 'covered parking', 'поле', 'amir temur')
+
+
+class Command(BaseCommand):
+    help = 'Measure the search of the field list on a catalog seeded at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Fields in the catalog')
+        parser.add_argument('--repeat', type=int, default=20, help='Times each query is run')
+        parser.add_argument('--page-size', type=int, default=10, help='Rows of the page read')
+        parser.add_argument('--query', action='append', dest='queries', help='Searched text, may be repeated')
+        parser.add_argument('--explain', action='store_true', help='Print the plan of each query')
+
+    def handle(self, *args, **options):
+        database = FootballField.objects.db
+        vendor = connections[database].vendor
+        if vendor != 'postgresql':
+            self.stdout.write(f'{vendor}: the icontains fallback is measured, not the full text search')
+
+        # the rows are rolled back, nothing is left in the tables
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed(options['rows'])
+            self.stdout.write(f"seeded {options['rows']} fields in {time.perf_counter() - started:.1f} s")
+
+            for text in options['queries'] or QUERIES:
+                queryset = self.search(text)
+                if options['explain']:
+                    self.stdout.write(queryset.explain())
+                self.report(text, queryset, options['repeat'], options['page_size'])
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows: int):
+        generator = random.Random(0)
+        country, _ = Country.objects.get_or_create(code='UZ', defaults={'name': 'Uzbekistan'})
+        region, _ = Region.objects.get_or_create(name='Tashkent', country=country)
+        districts = [District.objects.create(name=f'District {index}', region=region) for index in range(10)]
+        owner = User.objects.create_user(
+            phone_number=f'+99890{generator.randint(0, 9999999):07d}', user_type=UserTypes.FIELD_OWNER,
+            auth_method=AuthMethod.PHONE, full_name='Benchmark',
+        )
+
+        addresses = Address.objects.bulk_create([
+            Address(
+                address_line=f'{generator.choice(STREET_WORDS)} street {index}',
+                district=districts[index % len(districts)], latitude=41.3, longitude=69.2,
+            )
+            for index in range(rows)
+        ], batch_size=1000)
+        fields = FootballField.objects.bulk_create([
+            FootballField(
+                name=' '.join(generator.sample(NAME_WORDS, 2)).title() + f' {index}',
+                description=' '.join(generator.sample(DESCRIPTION_WORDS, 4)),
+                owner=owner, address=address, contact_number='+998901234567',
+                hourly_price=100000, width=40, length=60,
+            )
+            for index, address in enumerate(addresses)
+        ], batch_size=1000)
+
+        FootballFieldService.update_search_vector(FootballField.objects.filter(pk__in=[field.pk for field in fields]))
+        connection = connections[FootballField.objects.db]
+        if connection.vendor == 'postgresql':
+            # the planner chooses the indexes by the statistics of the new rows
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE fields_footballfield')
+
+    def search(self, text: str):
+        view = FootballFieldViewSet()
+        request = Request(APIRequestFactory().get('/', {'search': text}))
+        queryset = FieldsSearchFilter().filter_queryset(request, FootballField.objects.active(), view)
+        if 'search_rank' in queryset.query.annotations:
+            return queryset.order_by('-search_rank', 'id')
+        return queryset.order_by('name', 'id')
+
+    def report(self, text, queryset, repeat, page_size):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            page = list(queryset.values_list('pk', flat=True)[:page_size])
+            count = queryset.count()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{text!r}: {count} matches, page of {len(page)}, '
+            f'{statistics.median(timings):.1f} ms median, {max(timings):.1f} ms max ({repeat} runs)'
+        )
@@ -0,0 +1,103 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import FloatField, Value
+from django.utils import timezone
+
+from base.models import Address, Country, District, Region
+from bookings.models import Booking
+from bookings.v1.projections import BookingListProjection
+from bookings.v1.serializers import BookingSerializer
+from fields.models import FootballField
+from fields.v1.projections import FootballFieldListProjection
+from fields.v1.serializers import FootballFieldListSerializer
+from user.models import User
+from utils.constants import AuthMethod, UserTypes
+from utils.serializers import parse_fieldset
+
+
+class Command(BaseCommand):
+    help = 'Measure the rows per second of the list serializers and of the projections standing for them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Fields and bookings listed')
+        parser.add_argument('--repeat', type=int, default=5, help='Times each list is read')
+        parser.add_argument('--fields', default='', help='Sparse fieldset, e.g. id,name,address.district')
+
+    def handle(self, *args, **options):
+        fieldset = parse_fieldset(options['fields']) if options['fields'] else None
+        # the rows are rolled back, nothing is left in the tables
+        with transaction.atomic():
+            field = self.seed(options['rows'])
+            fields = FootballField.objects.active().annotate(
+                distance=Value(1.5, output_field=FloatField())
+            ).order_by('name')
+            bookings = Booking.objects.filter(field=field).order_by('start_time')
+
+            for name, queryset, serializer_class, projection_class in (
+                ('fields', fields, FootballFieldListSerializer, FootballFieldListProjection),
+                ('bookings', bookings, BookingSerializer, BookingListProjection),
+            ):
+                queryset = serializer_class.setup_eager_loading(queryset, fieldset)
+                repeat = options['repeat']
+                self.report(f'{name}, serializer', repeat, self.serialize, serializer_class, queryset, fieldset)
+                self.report(f'{name}, projection', repeat, self.project, projection_class, queryset, fieldset)
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows: int) -> FootballField:
+        country, _ = Country.objects.get_or_create(code='UZ', defaults={'name': 'Uzbekistan'})
+        region, _ = Region.objects.get_or_create(name='Tashkent', country=country)
+        districts = [District.objects.create(name=f'District {index}', region=region) for index in range(10)]
+        owner = User.objects.create_user(
+            phone_number=f'+99890{random.randint(0, 9999999):07d}', user_type=UserTypes.FIELD_OWNER,
+            auth_method=AuthMethod.PHONE, full_name='Benchmark',
+        )
+
+        addresses = Address.objects.bulk_create([
+            Address(
+                address_line=f'Street {index}', district=districts[index % len(districts)],
+                zipcode='100000', latitude=41 + index / rows, longitude=69 + index / rows,
+            )
+            for index in range(rows)
+        ], batch_size=1000)
+        fields = FootballField.objects.bulk_create([
+            FootballField(
+                name=f'Field {index}', owner=owner, address=address, contact_number='+998901234567',
+                description='Benchmark field', hourly_price=100000, width=40, length=60,
+                cover_thumbnail=f'20240101/field{index}_thumbnail.webp' if index % 2 else '',
+            )
+            for index, address in enumerate(addresses)
+        ], batch_size=1000)
+
+        # all of them on one field, as the nested list shows them
+        start_time = timezone.now()
+        Booking.objects.bulk_create([
+            Booking(
+                user=owner, field=fields[0], total_price=100000,
+                start_time=start_time + timedelta(hours=index),
+                end_time=start_time + timedelta(hours=index + 1),
+            )
+            for index in range(rows)
+        ], batch_size=1000)
+        return fields[0]
+
+    @staticmethod
+    def serialize(serializer_class, queryset, fieldset):
+        return serializer_class(queryset.all(), many=True, context={'fieldset': fieldset}).data
+
+    @staticmethod
+    def project(projection_class, queryset, fieldset):
+        projection = projection_class(fieldset)
+        return projection.map(projection.apply(queryset.all()))
+
+    def report(self, name, repeat, read, *args):
+        rows = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            rows += len(read(*args))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{name}: {rows / elapsed:,.0f} rows per second ({rows} rows)')
@@ -3,6 +3,10 @@ from django.db import models
 
 class FootballFieldManager(models.Manager):
 
+    def get_queryset(self):
+        # the search index is only read by the database
+        return super().get_queryset().defer('search_vector')
+
     def active(self, *args, **kwargs):
         """
         Return all active football fields.
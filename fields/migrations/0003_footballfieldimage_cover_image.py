@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_cover_images(apps, schema_editor):
+    FootballField = apps.get_model('fields', 'FootballField')
+    FootballFieldImage = apps.get_model('fields', 'FootballFieldImage')
+
+    for field in FootballField.objects.filter(cover_image__isnull=True, images__isnull=False).distinct():
+        image = FootballFieldImage.objects.filter(footballfield=field).select_related('file').order_by('id').first()
+        field.cover_image = image.file
+        field.cover_thumbnail = image.file.variants.get('thumbnail') or image.file.file.name
+        field.save(update_fields=['cover_image', 'cover_thumbnail'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0005_file_metadata'),
+        ('fields', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='footballfield',
+            name='cover_image',
+            field=models.ForeignKey(blank=True, help_text='Image shown on the field card, one of the images.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='covered_fields', to='file.file'),
+        ),
+        migrations.AddField(
+            model_name='footballfield',
+            name='cover_thumbnail',
+            field=models.CharField(blank=True, help_text='Storage name of the cover thumbnail, kept in sync by FootballFieldService.', max_length=255),
+        ),
+        # the table of the auto created through model is kept, only the state changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='FootballFieldImage',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_images', to='file.file')),
+                        ('footballfield', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_images', to='fields.footballfield')),
+                    ],
+                    options={
+                        'db_table': 'fields_footballfield_images',
+                        'ordering': ('id',),
+                        'unique_together': {('footballfield', 'file')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='footballfield',
+                    name='images',
+                    field=models.ManyToManyField(blank=True, related_name='fields', through='fields.FootballFieldImage', to='file.file'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='footballfieldimage',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterModelOptions(
+            name='footballfieldimage',
+            options={'ordering': ('position', 'id')},
+        ),
+        migrations.RunPython(set_cover_images, migrations.RunPython.noop),
+    ]
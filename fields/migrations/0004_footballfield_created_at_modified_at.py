@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fields', '0003_footballfieldimage_cover_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='footballfield',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='created at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='footballfield',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='modified at'),
+        ),
+    ]
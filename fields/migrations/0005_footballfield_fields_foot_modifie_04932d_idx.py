@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fields', '0004_footballfield_created_at_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='footballfield',
+            index=models.Index(fields=['modified_at', 'id'], name='fields_foot_modifie_04932d_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:42
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# configurations of utils.constants.Languages.SEARCH_CONFIGS at the time of the migration
+SEARCH_CONFIGS = ('english', 'simple', 'russian')
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # other databases fall back to icontains, see fields.filters.FieldsSearchFilter
+        return
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{config}', coalesce(f.name, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', coalesce(a.address_line, '')), 'B') || "
+        f"setweight(to_tsvector('{config}', coalesce(f.description, '')), 'C')"
+        for config in SEARCH_CONFIGS
+    )
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'UPDATE fields_footballfield f SET search_vector = {vector} FROM base_address a WHERE a.id = f.address_id'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS fields_footballfield_search_vector_idx '
+        'ON fields_footballfield USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS fields_footballfield_name_trgm_idx '
+        'ON fields_footballfield USING gin (name gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS fields_footballfield_search_vector_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS fields_footballfield_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fields', '0005_footballfield_fields_foot_modifie_04932d_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='footballfield',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# configurations of utils.constants.Languages.SEARCH_CONFIGS at the time of the migration
+SEARCH_CONFIGS = ('english', 'simple', 'russian')
+
+
+def index_district_names(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # other databases fall back to icontains, see fields.filters.FieldsSearchFilter
+        return
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{config}', coalesce(f.name, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', coalesce(a.address_line, '') || ' ' || coalesce(d.name, '')), 'B') || "
+        f"setweight(to_tsvector('{config}', coalesce(f.description, '')), 'C')"
+        for config in SEARCH_CONFIGS
+    )
+    schema_editor.execute(
+        f'UPDATE fields_footballfield f SET search_vector = {vector} '
+        f'FROM base_address a LEFT JOIN base_district d ON d.id = a.district_id WHERE a.id = f.address_id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fields', '0006_footballfield_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_district_names, migrations.RunPython.noop),
+    ]
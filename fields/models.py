@@ -1,14 +1,17 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
+from base.models import BaseModel
 from bookings.models import Booking
 from fields.managers import FootballFieldManager
 from utils.validators import phone_number_validator
 
 
-class FootballField(models.Model):
+class FootballField(BaseModel):
     """
     Model representing a football field with detailed information.
+    `modified_at` is also touched when the images change, see `FootballFieldService.set_cover_image`.
     """
     name = models.CharField(max_length=200)
     owner = models.ForeignKey(
@@ -39,9 +42,22 @@ class FootballField(models.Model):
     )
     images = models.ManyToManyField(
         'file.File',
+        through='FootballFieldImage',
         related_name='fields',
         blank=True,
     )
+    cover_image = models.ForeignKey(
+        'file.File',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='covered_fields',
+        help_text="Image shown on the field card, one of the images."
+    )
+    cover_thumbnail = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Storage name of the cover thumbnail, kept in sync by FootballFieldService."
+    )
     is_active = models.BooleanField(default=True)
     width = models.SmallIntegerField(
         validators=[MinValueValidator(0)],
@@ -51,11 +67,31 @@ class FootballField(models.Model):
         validators=[MinValueValidator(0)],
         help_text="Length of the field in meters."
     )
+    # name, address line, district and description in every language of `Languages.SEARCH_CONFIGS`,
+    # kept up to date by `FootballFieldService.update_search_vector` on PostgreSQL.
+    # Empty on other databases, e.g. SQLite in tests, `FieldsSearchFilter` falls back to icontains there
+    search_vector = SearchVectorField(null=True, editable=False)
     objects = FootballFieldManager()
 
+    class Meta:
+        indexes = [
+            # changes since a sync token, see fields.services.FieldChangesService
+            models.Index(fields=('modified_at', 'id')),
+        ]
+        # the GIN indexes of `search_vector` and of the trigrams of `name` are created by the migration
+        # on PostgreSQL, see 0006_footballfield_search_vector
+
     def __str__(self):
         return self.name
 
+    def get_images(self):
+        """
+        Returns the images in their order, from the prefetched `field_images` if they are
+        """
+        if 'field_images' in getattr(self, '_prefetched_objects_cache', {}):
+            return [image.file for image in self.field_images.all()]
+        return self.images.order_by('field_images__position', 'field_images__id')
+
     def is_booked_during(self, start_time, end_time):
         """
         Returns True if the field is booked for the given time slot.
@@ -65,4 +101,26 @@ class FootballField(models.Model):
             start_time__lt=end_time,
             end_time__gt=start_time,
             status__in=['pending', 'accepted']
-        ).exists()
\ No newline at end of file
+        ).exists()
+
+
+class FootballFieldImage(models.Model):
+    """
+    Ordered images of a football field, uses the table of the former auto created through model.
+    """
+    footballfield = models.ForeignKey(
+        FootballField,
+        on_delete=models.CASCADE,
+        related_name='field_images',
+    )
+    file = models.ForeignKey(
+        'file.File',
+        on_delete=models.CASCADE,
+        related_name='field_images',
+    )
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        db_table = 'fields_footballfield_images'
+        unique_together = ('footballfield', 'file')
+        ordering = ('position', 'id')
@@ -1,10 +1,27 @@
-from django.db import transaction
+import base64
+import json
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import add
+from typing import Dict, List, Optional, Tuple
 
-from base.models import Address
-from fields.dataclasses import FootballFieldData, AddressData
-from fields.models import FootballField
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Prefetch, Q, QuerySet, Subquery, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from base.models import Address, Tombstone
+from bookings.models import Booking
+from fields.dataclasses import FootballFieldData, AddressData, FieldChanges
+from fields.models import FootballField, FootballFieldImage
+from file.models import File
 from fields.validators import FieldValidator
 from user.models import User
+from utils.constants import BookingStatus, Languages
 
 
 class AddressCreator:
@@ -49,6 +66,382 @@ class FootballFieldService:
             owner=data.owner,
         )
 
-        field.images.set(data.images)
+        FootballFieldService.set_images(field, data.images or [], data.cover_image)
 
         return field
+
+    @staticmethod
+    def set_images(field: FootballField, images: List[File], cover_image: Optional[File] = None) -> None:
+        """
+        Replace the images of the field keeping the given order.
+        The cover stays unless it is removed, then the first image becomes the cover.
+        """
+        FootballFieldImage.objects.filter(footballfield=field).delete()
+        FootballFieldImage.objects.bulk_create([
+            FootballFieldImage(footballfield=field, file=image, position=position)
+            for position, image in enumerate(images)
+        ])
+
+        cover_image = cover_image or field.cover_image
+        if cover_image not in images:
+            cover_image = images[0] if images else None
+        FootballFieldService.set_cover_image(field, cover_image)
+
+    @staticmethod
+    def set_cover_image(field: FootballField, cover_image: Optional[File]) -> None:
+        """
+        The thumbnail of the cover is kept on the field, so the field list needs no image query.
+        Saved with `modified_at`, `set_images` ends here so any change of the images touches the field.
+        """
+        field.cover_image = cover_image
+        field.cover_thumbnail = cover_image.thumbnail_name if cover_image else ''
+        field.save(update_fields=['cover_image', 'cover_thumbnail', 'modified_at'])
+
+    @staticmethod
+    def update_search_vector(fields: QuerySet) -> None:
+        """
+        Indexes the text searched by `FieldsSearchFilter` once per configuration of `Languages.SEARCH_CONFIGS`,
+        so a query in any of the languages is matched. Nothing is indexed on other databases than PostgreSQL,
+        the filter falls back to icontains there.
+        """
+        if connections[fields.db].vendor != 'postgresql':
+            return
+        address = Address.objects.filter(pk=OuterRef('address_id'))
+        address_line = Subquery(address.values('address_line')[:1])
+        district = Subquery(address.values('district__name')[:1])
+        vector = reduce(add, (
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(address_line, district, weight='B', config=config)
+            + SearchVector('description', weight='C', config=config)
+            for config in dict.fromkeys(Languages.SEARCH_CONFIGS.values())
+        ))
+        fields.update(search_vector=vector)
+
+
+class FieldChangesService:
+    """
+    Changes of the field catalog since a sync token, for the clients keeping a local copy.
+
+    The token keeps the (modified_at, id) of the last row returned of each kind, the rows are read
+    after it in batches by the (modified_at, id) indexes. Deleted rows are read from `Tombstone`,
+    deactivated fields are returned as deleted. An empty token returns the whole catalog.
+    """
+    # kind -> model of the rows deleted by `Tombstone`
+    KINDS = {
+        'fields': FootballField,
+        'addresses': Address,
+        'images': File,
+    }
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or int(settings.SYNC_SETTINGS['BATCH_SIZE'])
+
+    def get_changes(self, token: str) -> FieldChanges:
+        now = timezone.now()
+        # rows newer than this may belong to transactions not committed yet, they are returned next time
+        until = now - timedelta(seconds=int(settings.SYNC_SETTINGS['SETTLE_TIME']))
+
+        state = decode_sync_token(token) if token else None
+        tombstones_kept_since = now - timedelta(days=int(settings.SYNC_SETTINGS['TOMBSTONE_TTL']))
+        reset = state is not None and state['until'] < tombstones_kept_since
+        initial = state is None or reset
+        if initial:
+            # the rows deleted before the catalog is read are not needed
+            state = {kind: None for kind in self.KINDS}
+            state['deleted'] = (until, None)
+
+        fields_queryset = FootballField.objects.active() if initial else FootballField.objects.all()
+        fields, state['fields'], fields_more = self._read(
+            fields_queryset.prefetch_related(
+                Prefetch('field_images', queryset=FootballFieldImage.objects.select_related('file'))
+            ),
+            state['fields'], until,
+        )
+        addresses, state['addresses'], addresses_more = self._read(
+            Address.objects.filter(fields__is_active=True).distinct().select_related('district__region__country'),
+            state['addresses'], until,
+        )
+        images, state['images'], images_more = self._read(
+            File.objects.filter(field_images__footballfield__is_active=True).distinct(),
+            state['images'], until,
+        )
+        tombstones, state['deleted'], deleted_more = self._read(
+            Tombstone.objects.filter(model__in=[model._meta.label_lower for model in self.KINDS.values()]),
+            state['deleted'], until,
+        )
+        state['until'] = until
+
+        deleted = {kind: [] for kind in self.KINDS}
+        labels = {model._meta.label_lower: kind for kind, model in self.KINDS.items()}
+        for tombstone in tombstones:
+            deleted[labels[tombstone.model]].append(tombstone.object_id)
+        deleted['fields'] += [field.pk for field in fields if not field.is_active]
+        fields = [field for field in fields if field.is_active]
+
+        # the rows the changed fields refer to, they may not have changed since the last sync themselves
+        address_ids = {address.pk for address in addresses}
+        missing = {field.address_id for field in fields} - address_ids
+        if missing:
+            addresses += Address.objects.filter(pk__in=missing).select_related('district__region__country')
+        image_ids = {image.pk for image in images}
+        for field in fields:
+            for field_image in field.field_images.all():
+                if field_image.file_id not in image_ids:
+                    image_ids.add(field_image.file_id)
+                    images.append(field_image.file)
+
+        return FieldChanges(
+            token=encode_sync_token(state),
+            has_more=fields_more or addresses_more or images_more or deleted_more,
+            fields=fields,
+            addresses=addresses,
+            images=images,
+            deleted=deleted,
+            reset=reset,
+        )
+
+    def _read(self, queryset, cursor: Optional[Tuple[datetime, Optional[int]]], until: datetime):
+        """
+        Returns the batch of rows changed after the cursor, the cursor of the last one and whether there are more
+        """
+        queryset = queryset.filter(modified_at__lte=until)
+        if cursor is not None:
+            modified_at, pk = cursor
+            after = Q(modified_at__gt=modified_at)
+            if pk is not None:
+                after |= Q(modified_at=modified_at, pk__gt=pk)
+            queryset = queryset.filter(after)
+        rows = list(queryset.order_by('modified_at', 'pk')[:self.batch_size + 1])
+        has_more = len(rows) > self.batch_size
+        rows = rows[:self.batch_size]
+        if rows:
+            cursor = (rows[-1].modified_at, rows[-1].pk)
+        return rows, cursor, has_more
+
+
+class FieldRankingService:
+    """
+    Orders the fields by how well they match, the `best_match` ordering.
+
+    Every candidate gets a score in 0..1 for each criterion, weighted by the `RANKING_*_WEIGHT` settings:
+     - distance, the nearest candidate scores 1 and the farthest 0
+     - price, the cheapest candidate scores 1 and the most expensive 0
+     - availability, the free share of the days of the requested time window,
+       the fields booked in the window itself are excluded by the filters already
+    The candidates are the first `max_candidates` fields of the filtered queryset, which must be annotated
+    with `distance`: the nearest ones, without a location the most relevant ones of a search or else the cheapest.
+    Only their ids and scores are read, the other fields are not ranked.
+    """
+
+    def __init__(self, max_candidates: Optional[int] = None, weights: Optional[Dict[str, float]] = None):
+        self.max_candidates = max_candidates or int(settings.FIELDS_SETTINGS['RANKING_MAX_CANDIDATES'])
+        self.weights = weights or {
+            'distance': float(settings.FIELDS_SETTINGS['RANKING_DISTANCE_WEIGHT']),
+            'price': float(settings.FIELDS_SETTINGS['RANKING_PRICE_WEIGHT']),
+            'availability': float(settings.FIELDS_SETTINGS['RANKING_AVAILABILITY_WEIGHT']),
+        }
+
+    def rank(self, queryset, window: Optional[Tuple[datetime, datetime]] = None, by_distance: bool = True) -> List[int]:
+        """
+        Returns the ids of the candidates, the best match first.
+        :param by_distance: False if no location is given, the distances are all the same then
+        """
+        candidates = list(
+            queryset.order_by(*self.get_candidates_ordering(queryset, by_distance))
+            .values_list('pk', 'distance', 'hourly_price')[:self.max_candidates]
+        )
+        if not candidates:
+            return []
+        ids, distances, prices = zip(*candidates)
+        distances = [distance or 0 for distance in distances]
+
+        scores = [0.0] * len(ids)
+        criteria = (
+            ('distance', self._scale(distances)),
+            ('price', self._scale(prices)),
+            ('availability', self.get_availability(ids, window) if window else None),
+        )
+        for name, values in criteria:
+            weight = self.weights.get(name, 0)
+            if values is None or not weight:
+                continue
+            scores = [score + weight * value for score, value in zip(scores, values)]
+
+        # the nearer one wins a tie
+        order = sorted(range(len(ids)), key=lambda index: (-scores[index], distances[index], ids[index]))
+        return [ids[index] for index in order]
+
+    @staticmethod
+    def get_candidates_ordering(queryset, by_distance: bool) -> Tuple[str, str]:
+        if by_distance:
+            return 'distance', 'pk'
+        if 'search_rank' in queryset.query.annotations:
+            return '-search_rank', 'pk'
+        return 'hourly_price', 'pk'
+
+    @staticmethod
+    def _scale(values) -> List[float]:
+        """
+        1 for the lowest value and 0 for the highest
+        """
+        low, high = min(values), max(values)
+        if high == low:
+            return [1.0] * len(values)
+        return [(high - value) / (high - low) for value in values]
+
+    @staticmethod
+    def get_availability(ids, window: Tuple[datetime, datetime]) -> List[float]:
+        """
+        Free share of the days of the window for each field, one query for the bookings of the candidates
+        """
+        start, end = window
+        day_start = timezone.localtime(start).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = timezone.localtime(end).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        total = (day_end - day_start).total_seconds()
+
+        booked = dict.fromkeys(ids, 0.0)
+        bookings = Booking.objects.filter(
+            field_id__in=ids,
+            start_time__lt=day_end,
+            end_time__gt=day_start,
+            status__in=[BookingStatus.PENDING, BookingStatus.ACCEPTED],
+        ).values_list('field_id', 'start_time', 'end_time')
+        for field_id, booking_start, booking_end in bookings:
+            booked[field_id] += (min(booking_end, day_end) - max(booking_start, day_start)).total_seconds()
+        return [max(0.0, 1 - booked[pk] / total) for pk in ids]
+
+
+class FieldFacetService:
+    """
+    Counts of the filtered fields per district, hourly price band and size band, for the filters of the list.
+
+    On PostgreSQL the three are counted by one query with GROUPING SETS,
+    other databases count the bands by conditional aggregation and the districts by a second query.
+    The bands are split by the bounds of `FACET_PRICE_BANDS` and `FACET_SIZE_BANDS`, the size is width * length.
+    """
+
+    def __init__(self, price_bounds: Optional[List[int]] = None, size_bounds: Optional[List[int]] = None):
+        self.price_bounds = self._parse_bounds(price_bounds or settings.FIELDS_SETTINGS['FACET_PRICE_BANDS'])
+        self.size_bounds = self._parse_bounds(size_bounds or settings.FIELDS_SETTINGS['FACET_SIZE_BANDS'])
+
+    @staticmethod
+    def _parse_bounds(value) -> List[int]:
+        if isinstance(value, str):
+            value = value.split(',')
+        return sorted(int(bound) for bound in value)
+
+    @staticmethod
+    def _band(lookup: str, bounds: List[int]) -> Case:
+        """
+        Index of the band of the value, the values below the first bound are in band 0
+        """
+        return Case(
+            *[When(**{f'{lookup}__lt': bound}, then=Value(index)) for index, bound in enumerate(bounds)],
+            default=Value(len(bounds)),
+            output_field=IntegerField(),
+        )
+
+    def get_facets(self, queryset) -> dict:
+        queryset = queryset.order_by().annotate(
+            # the sizes are small integers, their product may not be
+            facet_area=Cast('width', IntegerField()) * F('length'),
+        ).annotate(
+            facet_price=self._band('hourly_price', self.price_bounds),
+            facet_size=self._band('facet_area', self.size_bounds),
+        )
+        if connections[queryset.db].vendor == 'postgresql':
+            districts, prices, sizes = self._count_grouping_sets(queryset)
+        else:
+            districts, prices, sizes = self._count_aggregates(queryset)
+
+        # the most common district first
+        districts = sorted(districts.items(), key=lambda item: (-item[1], item[0][1] or ''))
+        return {
+            'district': [{'id': district_id, 'name': name, 'count': count} for (district_id, name), count in districts],
+            'price': self._get_bands(self.price_bounds, prices),
+            'size': self._get_bands(self.size_bounds, sizes),
+        }
+
+    @staticmethod
+    def _count_grouping_sets(queryset):
+        sql, params = queryset.values_list(
+            'address__district_id', 'address__district__name', 'facet_price', 'facet_size'
+        ).query.sql_with_params()
+        query = f"""
+            SELECT f.district_id, f.district_name, f.price, f.size,
+                   GROUPING(f.district_id), GROUPING(f.price), COUNT(*)
+            FROM ({sql}) AS f (district_id, district_name, price, size)
+            GROUP BY GROUPING SETS ((f.district_id, f.district_name), (f.price), (f.size))
+        """
+        districts, prices, sizes = {}, {}, {}
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(query, params)
+            for district_id, district_name, price, size, no_district, no_price, count in cursor.fetchall():
+                if not no_district:
+                    districts[(district_id, district_name)] = count
+                elif not no_price:
+                    prices[price] = count
+                else:
+                    sizes[size] = count
+        return districts, prices, sizes
+
+    def _count_aggregates(self, queryset):
+        price_bands = range(len(self.price_bounds) + 1)
+        size_bands = range(len(self.size_bounds) + 1)
+        counts = queryset.aggregate(
+            **{f'price_{index}': Count('pk', filter=Q(facet_price=index)) for index in price_bands},
+            **{f'size_{index}': Count('pk', filter=Q(facet_size=index)) for index in size_bands},
+        )
+        prices = {index: counts[f'price_{index}'] for index in price_bands}
+        sizes = {index: counts[f'size_{index}'] for index in size_bands}
+        districts = {
+            (district_id, name): count
+            for district_id, name, count in queryset.values(
+                'address__district_id', 'address__district__name'
+            ).annotate(count=Count('pk')).values_list('address__district_id', 'address__district__name', 'count')
+        }
+        return districts, prices, sizes
+
+    @staticmethod
+    def _get_bands(bounds: List[int], counts: dict) -> List[dict]:
+        """
+        Every band with its bounds, `max` is exclusive and None for the last band as `min` is for the first
+        """
+        edges = [None] + bounds + [None]
+        return [
+            {'min': edges[index], 'max': edges[index + 1], 'count': counts.get(index, 0)}
+            for index in range(len(bounds) + 1)
+        ]
+
+
+def encode_sync_token(state: dict) -> str:
+    def encode_cursor(cursor):
+        return None if cursor is None else [cursor[0].isoformat(), cursor[1]]
+
+    data = {name: encode_cursor(cursor) for name, cursor in state.items() if name != 'until'}
+    data['until'] = state['until'].isoformat()
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_sync_token(token: str) -> dict:
+    def decode_cursor(cursor):
+        if cursor is None:
+            return None
+        modified_at, pk = cursor
+        if pk is not None and not isinstance(pk, int):
+            raise ValueError(pk)
+        return decode_timestamp(modified_at), pk
+
+    def decode_timestamp(value):
+        timestamp = datetime.fromisoformat(value)
+        if timezone.is_naive(timestamp):
+            raise ValueError(value)
+        return timestamp
+
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        state = {kind: decode_cursor(data[kind]) for kind in (*FieldChangesService.KINDS, 'deleted')}
+        state['until'] = decode_timestamp(data['until'])
+    except (TypeError, ValueError, KeyError):
+        raise ValidationError(_("Invalid sync token"))
+    return state
@@ -0,0 +1,94 @@
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from base.models import District, Region, Tombstone
+from fields.autocomplete import autocomplete_index
+from fields.models import FootballField
+from fields.services import FootballFieldService
+from utils.cache import bump_cache_version
+from utils.constants import CacheNamespace
+
+
+def cover_image_processed_signal(sender, file_id, result, **kwargs):
+    """
+    the variants of a cover image are generated, point the fields at its thumbnail
+    """
+    thumbnail = result.get('variants', {}).get('thumbnail')
+    if thumbnail:
+        FootballField.objects.filter(cover_image_id=file_id).update(
+            cover_thumbnail=thumbnail, modified_at=timezone.now()
+        )
+        invalidate_fields_list()
+
+
+def cover_image_deleted_signal(sender, instance, **kwargs):
+    """
+    the cover image is deleted, the next image of the field by position becomes the cover
+    """
+    for field in FootballField.objects.filter(cover_image_id=instance.pk):
+        next_image = field.images.exclude(pk=instance.pk).order_by(
+            'field_images__position', 'field_images__id'
+        ).first()
+        FootballFieldService.set_cover_image(field, next_image)
+
+
+def invalidate_fields_list():
+    # bumped before the commit, a concurrent request would cache the old rows under the new version
+    transaction.on_commit(partial(bump_cache_version, CacheNamespace.FIELDS_LIST))
+
+
+def fields_list_changed_signal(sender, **kwargs):
+    """
+    a field or something shown in or filtering the field list changed, the cached lists are outdated
+    """
+    invalidate_fields_list()
+
+
+def tombstone_signal(sender, instance, **kwargs):
+    """
+    a synced row is deleted, the clients remove their copy on the next sync
+    """
+    Tombstone.objects.create(model=sender._meta.label_lower, object_id=instance.pk)
+
+
+# columns of the field indexed in `search_vector`
+SEARCH_VECTOR_COLUMNS = {'name', 'description', 'address'}
+
+
+def search_vector_signal(sender, instance, update_fields=None, **kwargs):
+    """
+    the text of a field, of its address or the name of its district changed, index it again
+    """
+    if sender is FootballField:
+        if update_fields is not None and not SEARCH_VECTOR_COLUMNS.intersection(update_fields):
+            return
+        fields = FootballField.objects.filter(pk=instance.pk)
+    elif sender is District:
+        fields = FootballField.objects.filter(address__district_id=instance.pk)
+    else:
+        fields = FootballField.objects.filter(address_id=instance.pk)
+    FootballFieldService.update_search_vector(fields)
+
+
+AUTOCOMPLETE_KINDS = {
+    FootballField: autocomplete_index.FIELD,
+    District: autocomplete_index.DISTRICT,
+    Region: autocomplete_index.REGION,
+}
+
+
+def autocomplete_signal(sender, instance, **kwargs):
+    """
+    a name is added, renamed or the field is deactivated, update the autocomplete of this process
+    once committed, a rolled back change is not suggested
+    """
+    transaction.on_commit(partial(
+        autocomplete_index.update,
+        AUTOCOMPLETE_KINDS[sender], instance.pk, instance.name, is_active=getattr(instance, 'is_active', True),
+    ))
+
+
+def autocomplete_deleted_signal(sender, instance, **kwargs):
+    transaction.on_commit(partial(autocomplete_index.remove, AUTOCOMPLETE_KINDS[sender], instance.pk))
@@ -1,3 +1,749 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, Value
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from base.models import Address, Country, District, Region, Tombstone
+from bookings.models import Booking
+from fields.autocomplete import autocomplete_index
+from fields.models import FootballField
+from fields.services import (
+    FieldChangesService, FieldFacetService, FieldRankingService, FootballFieldService, encode_sync_token,
+)
+from fields.v1.projections import FootballFieldListProjection
+from fields.v1.serializers import FootballFieldListSerializer
+from fields.v1.views import FootballFieldViewSet
+from file.models import File
+from user.models import User
+from utils.cache import get_cache_version
+from utils.constants import AuthMethod, BookingStatus, CacheNamespace, UserTypes
+from utils.paginations import ApproximatePage, CountingPaginator, encode_cursor
+from utils.serializers import parse_fieldset
+from utils.testing import RequestQueriesMixin
+
+
+def create_owner(phone_number='+998901234567'):
+    return User.objects.create_user(
+        phone_number=phone_number, user_type=UserTypes.FIELD_OWNER,
+        auth_method=AuthMethod.PHONE, full_name='Owner',
+    )
+
+
+def create_district(name='Yunusobod'):
+    country, _ = Country.objects.get_or_create(code='UZ', defaults={'name': 'Uzbekistan'})
+    region, _ = Region.objects.get_or_create(name='Tashkent', country=country)
+    district, _ = District.objects.get_or_create(name=name, region=region)
+    return district
+
+
+def create_field(owner, name='Arena', district=None, **kwargs):
+    address = Address.objects.create(
+        address_line='Amir Temur street', district=district or create_district(), latitude=41.3, longitude=69.2
+    )
+    return FootballField.objects.create(
+        name=name, owner=owner, address=address, contact_number='+998901234567',
+        hourly_price=kwargs.pop('hourly_price', 100000), width=40, length=60, **kwargs
+    )
+
+
+def create_image(name='photo.jpg'):
+    return File.objects.create(file=f'20240101/{name}', variants={'thumbnail': f'20240101/{name}_thumbnail.webp'})
+
+
+class CoverImageTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.field = create_field(create_owner())
+        self.images = [create_image(f'photo{index}.jpg') for index in range(3)]
+        FootballFieldService.set_images(self.field, self.images)
+
+    def test_first_image_is_cover(self):
+        self.assertEqual(self.field.cover_image, self.images[0])
+        self.assertEqual(self.field.cover_thumbnail, self.images[0].thumbnail_name)
+
+    def test_next_image_becomes_cover_on_delete(self):
+        self.images[0].delete()
+        self.field.refresh_from_db()
+        self.assertEqual(self.field.cover_image, self.images[1])
+        self.assertEqual(self.field.cover_thumbnail, self.images[1].thumbnail_name)
+
+    def test_no_cover_without_images(self):
+        for image in self.images:
+            image.delete()
+        self.field.refresh_from_db()
+        self.assertIsNone(self.field.cover_image)
+        self.assertEqual(self.field.cover_thumbnail, '')
+
+
+class FieldQueriesTestCase(TestCase):
+    """
+    Query counts of the field endpoints do not depend on the number of rows they return
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = create_owner()
+        self.fields = []
+        for index in range(12):
+            field = create_field(self.owner, name=f'Arena {index}', district=create_district(f'District {index % 3}'))
+            FootballFieldService.set_images(field, [create_image(f'photo{index}_{image}.jpg') for image in range(2)])
+            self.fields.append(field)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.owner.get_pair_token()['access']}")
+        # the process-wide caches are built by the first request
+        self.client.get('/api/v1/fields/')
+
+    def count_queries(self, url, client=None):
+        # the counts and the anonymous lists are cached
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+
+class FieldListQueriesTest(FieldQueriesTestCase):
+
+    def assertConstantQueries(self, url, client=None):
+        separator = '&' if '?' in url else '?'
+        self.assertEqual(
+            self.count_queries(f'{url}{separator}page_size=2', client),
+            self.count_queries(f'{url}{separator}page_size=12', client),
+        )
+
+    def test_list(self):
+        self.assertConstantQueries('/api/v1/fields/')
+
+    def test_anonymous_list(self):
+        self.assertConstantQueries('/api/v1/fields/', client=APIClient())
+
+    def test_list_with_fieldset(self):
+        self.assertConstantQueries('/api/v1/fields/?fields=id,name,address.district')
+
+    def test_list_by_distance(self):
+        self.assertConstantQueries('/api/v1/fields/?latitude=41.3&longitude=69.2&ordering=distance')
+
+    def test_my_fields(self):
+        self.assertConstantQueries('/api/v1/fields/my-fields/')
+
+    def test_retrieve(self):
+        field = self.fields[0]
+        url = f'/api/v1/fields/{field.pk}/'
+        count = self.count_queries(url)
+        FootballFieldService.set_images(field, [create_image(f'more{index}.jpg') for index in range(6)])
+        self.assertEqual(self.count_queries(url), count)
+
+
+class FieldUpdateTest(FieldQueriesTestCase):
+
+    def test_response_shows_new_images(self):
+        field = self.fields[0]
+        image = create_image('new.jpg')
+        response = self.client.patch(f'/api/v1/fields/{field.pk}/', {'images': [image.pk]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([item['id'] for item in response.json()['data']['images']], [image.pk])
+
+
+def render(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+class FieldListProjectionTest(TestCase):
+    """
+    The projection returns what the serializer it stands for does
+    """
+
+    def setUp(self):
+        owner = create_owner()
+        field = create_field(owner, name='Arena', description='Covered', contact_number2='+998907654321')
+        FootballFieldService.set_images(field, [create_image('photo.jpg')])
+        # no cover, no description, other district
+        create_field(owner, name='Stadium', district=create_district('Chilonzor'), hourly_price=150000)
+
+    def get_queryset(self):
+        return FootballField.objects.active().annotate(
+            distance=Value(1.23456, output_field=FloatField())
+        ).order_by('name')
+
+    def assertProjectionEqual(self, fields=None):
+        fieldset = parse_fieldset(fields) if fields else None
+        queryset = FootballFieldListSerializer.setup_eager_loading(self.get_queryset(), fieldset)
+        serialized = FootballFieldListSerializer(queryset, many=True, context={'fieldset': fieldset}).data
+        projection = FootballFieldListProjection(fieldset)
+        self.assertEqual(render(projection.map(projection.apply(queryset))), render(serialized))
+
+    def test_all_fields(self):
+        self.assertProjectionEqual()
+
+    def test_fieldset(self):
+        self.assertProjectionEqual('id,name,cover_thumbnail')
+
+    def test_nested_fieldset(self):
+        self.assertProjectionEqual('id,address.district,address.latitude,distance')
+
+
+class FieldListCursorTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        owner = create_owner()
+        self.fields = [create_field(owner, name=f'Arena {index}') for index in range(3)]
+        self.url = '/api/v1/fields/?latitude=41.3&longitude=69.2&ordering=distance&page_size=1&cursor='
+
+    def test_next_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200, response.content)
+        response = self.client.get(response.json()['data']['links']['next'])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['data']['results'][0]['name'], 'Arena 1')
+
+    def test_invalid_values(self):
+        for values in ([0, 'x', 'abc'], ['near', 'x', 1], [0, 'x', {'id': 1}], [0, ['x'], 1]):
+            with self.subTest(values=values):
+                response = self.client.get(self.url + encode_cursor(values))
+                self.assertEqual(response.status_code, 404, response.content)
+
+
+class CountingPaginatorTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        owner = create_owner()
+        for index in range(3):
+            create_field(owner, name=f'Arena {index}')
+        self.queryset = FootballField.objects.order_by('id')
+
+    def test_exact_count(self):
+        paginator = CountingPaginator(self.queryset, 2)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.count_approximate)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertNotIsInstance(paginator.page(2), ApproximatePage)
+
+    def test_count_is_cached(self):
+        self.assertEqual(CountingPaginator(self.queryset, 2).count, 3)
+        create_field(create_owner('+998901234568'), name='Arena 3')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(CountingPaginator(self.queryset, 2).count, 3)
+        # the ordering does not change the count, other filters do
+        with self.assertNumQueries(0):
+            self.assertEqual(CountingPaginator(self.queryset.order_by('-name'), 2).count, 3)
+        self.assertEqual(CountingPaginator(self.queryset.filter(name__startswith='Arena'), 2).count, 4)
+
+        cache.clear()
+        self.assertEqual(CountingPaginator(self.queryset, 2).count, 4)
+
+    def test_list_is_not_cached(self):
+        self.assertEqual(CountingPaginator([1, 2, 3], 2).count, 3)
+        self.assertEqual(CountingPaginator([1, 2], 2).count, 2)
+
+    @skipIf(connection.vendor == 'postgresql', 'Estimates are only skipped on other databases')
+    def test_no_estimate(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(CountingPaginator(self.queryset, 2).estimate_count())
+
+    @skipUnless(connection.vendor == 'postgresql', 'Estimates are made by the PostgreSQL planner')
+    def test_estimate(self):
+        self.assertIsInstance(CountingPaginator(self.queryset, 2).estimate_count(), int)
+
+    @override_settings(PAGINATION_SETTINGS=dict(settings.PAGINATION_SETTINGS, COUNT_ESTIMATE_THRESHOLD=1000))
+    def test_small_estimate_is_counted(self):
+        with mock.patch.object(CountingPaginator, 'estimate_count', return_value=999):
+            paginator = CountingPaginator(self.queryset, 2)
+            self.assertEqual(paginator.count, 3)
+            self.assertFalse(paginator.count_approximate)
+
+    @override_settings(PAGINATION_SETTINGS=dict(settings.PAGINATION_SETTINGS, COUNT_ESTIMATE_THRESHOLD=1000))
+    def test_large_estimate(self):
+        with mock.patch.object(CountingPaginator, 'estimate_count', return_value=1000):
+            paginator = CountingPaginator(self.queryset, 2)
+            self.assertEqual(paginator.count, 1000)
+            self.assertTrue(paginator.count_approximate)
+
+            page = paginator.page(1)
+            self.assertIsInstance(page, ApproximatePage)
+            self.assertEqual(len(page), 2)
+            self.assertTrue(page.has_next())
+            # the pages are not limited by the estimate
+            page = paginator.page(2)
+            self.assertEqual(len(page), 1)
+            self.assertFalse(page.has_next())
+            with self.assertRaises(EmptyPage):
+                paginator.page(3)
+
+        # the estimate is cached as the count
+        with mock.patch.object(CountingPaginator, 'estimate_count') as estimate_count:
+            self.assertEqual(CountingPaginator(self.queryset, 2).count, 1000)
+            estimate_count.assert_not_called()
+
+    @override_settings(PAGINATION_SETTINGS=dict(settings.PAGINATION_SETTINGS, COUNT_ESTIMATE_THRESHOLD=1000))
+    def test_large_estimate_response(self):
+        with mock.patch.object(CountingPaginator, 'estimate_count', return_value=5000):
+            response = self.client.get('/api/v1/fields/?page_size=2')
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual(data['count'], 5000)
+        self.assertTrue(data['count_approximate'])
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['links']['next'])
+
+
+class FieldListInvalidationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.field = create_field(create_owner())
+
+    def assertInvalidatedOnCommit(self, change):
+        version = get_cache_version(CacheNamespace.FIELDS_LIST)
+        with self.captureOnCommitCallbacks() as callbacks:
+            change()
+            self.assertEqual(get_cache_version(CacheNamespace.FIELDS_LIST), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_cache_version(CacheNamespace.FIELDS_LIST), version)
+
+    def test_field_change(self):
+        self.field.hourly_price = 120000
+        self.assertInvalidatedOnCommit(self.field.save)
+
+    def test_district_rename(self):
+        district = self.field.address.district
+        district.name = 'Mirzo Ulugbek'
+        self.assertInvalidatedOnCommit(district.save)
+
+    def test_region_rename(self):
+        region = self.field.address.district.region
+        region.name = 'Tashkent region'
+        self.assertInvalidatedOnCommit(region.save)
+
+
+@override_settings(SYNC_SETTINGS=dict(settings.SYNC_SETTINGS, SETTLE_TIME=0))
+class FieldChangesTest(TestCase):
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.field = create_field(self.owner)
+
+    def sync(self, token='', batch_size=None):
+        return FieldChangesService(batch_size=batch_size).get_changes(token)
+
+    def sync_all(self, token, batch_size=None):
+        """Field ids changed and deleted since the token, read until there are no more"""
+        changed, deleted = [], []
+        while True:
+            changes = self.sync(token, batch_size)
+            changed += [field.pk for field in changes.fields]
+            deleted += changes.deleted['fields']
+            token = changes.token
+            if not changes.has_more:
+                return changed, deleted, token
+
+    def test_initial(self):
+        create_field(self.owner, name='Closed', is_active=False)
+        changes = self.sync()
+        self.assertEqual([field.pk for field in changes.fields], [self.field.pk])
+        self.assertEqual([address.pk for address in changes.addresses], [self.field.address_id])
+        self.assertEqual(changes.deleted, {'fields': [], 'addresses': [], 'images': []})
+        self.assertFalse(changes.has_more)
+        self.assertFalse(changes.reset)
+
+    def test_token_round_trip(self):
+        token = self.sync().token
+        self.assertEqual(self.sync_all(token), ([], [], mock.ANY))
+
+        self.field.hourly_price = 120000
+        self.field.save()
+        changed, deleted, token = self.sync_all(token)
+        self.assertEqual(changed, [self.field.pk])
+        self.assertEqual(self.sync_all(token)[:2], ([], []))
+
+    def test_delete(self):
+        token = self.sync().token
+        field_id, address_id = self.field.pk, self.field.address_id
+        self.field.delete()
+        Address.objects.filter(pk=address_id).delete()
+
+        changes = self.sync(token)
+        self.assertEqual(changes.fields, [])
+        self.assertEqual(changes.deleted['fields'], [field_id])
+        self.assertEqual(changes.deleted['addresses'], [address_id])
+        # the tombstones are read once
+        self.assertEqual(self.sync(changes.token).deleted, {'fields': [], 'addresses': [], 'images': []})
+
+    def test_deleted_before_the_initial_sync(self):
+        self.field.delete()
+        self.assertTrue(Tombstone.objects.exists())
+        self.assertEqual(self.sync().deleted['fields'], [])
+
+    def test_deactivate(self):
+        token = self.sync().token
+        self.field.is_active = False
+        self.field.save()
+
+        changes = self.sync(token)
+        self.assertEqual(changes.fields, [])
+        self.assertEqual(changes.deleted['fields'], [self.field.pk])
+
+    def test_same_modified_at(self):
+        fields = [self.field] + [create_field(self.owner, name=f'Arena {index}') for index in range(3)]
+        modified_at = timezone.now() - timedelta(seconds=1)
+        FootballField.objects.update(modified_at=modified_at)
+
+        changed, _, token = self.sync_all('', batch_size=1)
+        self.assertEqual(changed, [field.pk for field in fields])
+
+        # committed late with the timestamp of the last row read, after its id
+        late = create_field(self.owner, name='Late')
+        FootballField.objects.filter(pk=late.pk).update(modified_at=modified_at)
+        self.assertEqual(self.sync_all(token, batch_size=1)[0], [late.pk])
+
+    @override_settings(SYNC_SETTINGS=dict(settings.SYNC_SETTINGS, SETTLE_TIME=60))
+    def test_unsettled_rows_are_returned_later(self):
+        self.assertEqual(self.sync().fields, [])
+        FootballField.objects.update(modified_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual([field.pk for field in self.sync().fields], [self.field.pk])
+
+    def test_old_token_resets(self):
+        state = {kind: None for kind in (*FieldChangesService.KINDS, 'deleted')}
+        state['until'] = timezone.now() - timedelta(days=int(settings.SYNC_SETTINGS['TOMBSTONE_TTL']) + 1)
+        changes = self.sync(encode_sync_token(state))
+        self.assertTrue(changes.reset)
+        self.assertEqual([field.pk for field in changes.fields], [self.field.pk])
+
+    def test_api(self):
+        response = self.client.get('/api/v1/fields/changes/', {'since': ''})
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual([field['id'] for field in data['fields']], [self.field.pk])
+
+        response = self.client.get('/api/v1/fields/changes/', {'since': data['token']})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['data']['fields'], [])
+
+    def test_invalid_token(self):
+        token = self.sync().token
+        state = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        invalid = [
+            'x', token[:-4], '!!!', 'e30',
+            dict(state, fields=[state['until'], 'x']),
+            dict(state, until='2024-01-01T00:00:00'),
+            dict(state, deleted='x'),
+            {key: value for key, value in state.items() if key != 'images'},
+            [],
+        ]
+        for value in invalid:
+            if not isinstance(value, str):
+                value = base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            with self.subTest(token=value):
+                response = self.client.get('/api/v1/fields/changes/', {'since': value})
+                self.assertEqual(response.status_code, 400, response.content)
+
+
+class FieldETagTest(RequestQueriesMixin, FieldQueriesTestCase):
+
+    def test_cached_list_is_validated_without_query(self):
+        client = APIClient()
+        etag = client.get('/api/v1/fields/')['ETag']
+        with self.assertNumRequestQueries(0):
+            response = client.get('/api/v1/fields/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_uncached_list_has_no_etag(self):
+        self.assertNotIn('ETag', self.client.get('/api/v1/fields/'))
+        self.assertNotIn('ETag', self.client.get('/api/v1/fields/?cursor='))
+
+    def test_retrieve(self):
+        url = f'/api/v1/fields/{self.fields[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_retrieve_checks_permissions_first(self):
+        url = f'/api/v1/fields/{self.fields[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        with mock.patch.object(FootballFieldViewSet, 'check_object_permissions', side_effect=PermissionDenied):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+
+
+class FieldRankingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = create_owner()
+        # (latitude, hourly price): the nearest is the most expensive
+        self.fields = []
+        for index, (latitude, price) in enumerate(((41.30, 300000), (41.35, 200000), (41.40, 100000))):
+            field = create_field(self.owner, name=f'Arena {index}', hourly_price=price)
+            Address.objects.filter(pk=field.address_id).update(latitude=latitude)
+            self.fields.append(field)
+        self.ids = [field.pk for field in self.fields]
+
+    def get_queryset(self):
+        # the latitude stands for the distance
+        return FootballField.objects.annotate(distance=F('address__latitude'))
+
+    def rank(self, window=None, by_distance=True, **kwargs):
+        return FieldRankingService(**kwargs).rank(self.get_queryset(), window, by_distance=by_distance)
+
+    def test_weights(self):
+        self.assertEqual(self.rank(weights={'distance': 1}), self.ids)
+        self.assertEqual(self.rank(weights={'price': 1}), self.ids[::-1])
+        # the middle one is neither the nearest nor the cheapest but the best of both
+        self.assertEqual(self.rank(weights={'distance': 1, 'price': 1})[-1], self.ids[1])
+
+    def test_availability(self):
+        day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=7)
+        customer = User.objects.create_user(
+            phone_number='+998901112233', user_type=UserTypes.CUSTOMER,
+            auth_method=AuthMethod.PHONE, full_name='Customer',
+        )
+        # most of the day of the nearest field is booked
+        Booking.objects.create(
+            user=customer, field=self.fields[0], status=BookingStatus.ACCEPTED, total_price=300000,
+            start_time=day + timedelta(hours=6), end_time=day + timedelta(hours=22),
+        )
+        window = (day + timedelta(hours=23), day + timedelta(hours=23, minutes=30))
+        self.assertEqual(self.rank(window, weights={'distance': 0.1, 'availability': 1})[0], self.ids[1])
+        # cancelled bookings do not count
+        Booking.objects.update(status=BookingStatus.CANCELLED)
+        self.assertEqual(self.rank(window, weights={'distance': 0.1, 'availability': 1})[0], self.ids[0])
+
+    def test_candidates_are_nearest(self):
+        self.assertEqual(self.rank(max_candidates=2, weights={'price': 1}), self.ids[1::-1])
+
+    def test_candidates_without_location_are_cheapest(self):
+        self.assertEqual(self.rank(by_distance=False, max_candidates=2, weights={'price': 1}), self.ids[:0:-1])
+
+    def test_list_without_location(self):
+        with override_settings(FIELDS_SETTINGS=dict(settings.FIELDS_SETTINGS, RANKING_MAX_CANDIDATES=2)):
+            response = self.client.get('/api/v1/fields/?ordering=best_match')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([field['id'] for field in response.json()['data']['results']], self.ids[:0:-1])
+
+
+class FieldSearchTest(TestCase):
+    """
+    Full text search on PostgreSQL, the icontains fallback on other databases
+    """
+
+    def setUp(self):
+        cache.clear()
+        owner = create_owner()
+        self.lokomotiv = create_field(owner, name='Lokomotiv Arena', district=create_district('Yunusobod'))
+        self.covered = create_field(
+            owner, name='Central Stadium', district=create_district('Chilonzor'), description='Covered pitch'
+        )
+
+    def search(self, text):
+        response = self.client.get('/api/v1/fields/', {'search': text})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [field['id'] for field in response.json()['data']['results']]
+
+    def test_name(self):
+        self.assertEqual(self.search('lokomotiv'), [self.lokomotiv.pk])
+
+    def test_district(self):
+        self.assertEqual(self.search('chilonzor'), [self.covered.pk])
+
+    def test_description(self):
+        self.assertEqual(self.search('covered'), [self.covered.pk])
+
+    def test_no_match(self):
+        self.assertEqual(self.search('pakhtakor'), [])
+
+    def test_district_rename(self):
+        district = self.lokomotiv.address.district
+        district.name = 'Mirobod'
+        district.save()
+        self.assertEqual(self.search('mirobod'), [self.lokomotiv.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'trigrams need PostgreSQL')
+    def test_typo(self):
+        self.assertEqual(self.search('lokomativ'), [self.lokomotiv.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'ranking needs PostgreSQL')
+    def test_name_ranks_above_description(self):
+        field = create_field(create_owner('+998907654321'), name='Covered Arena')
+        self.assertEqual(self.search('covered'), [field.pk, self.covered.pk])
+
+
+class FieldAutocompleteTest(TestCase):
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.field = create_field(self.owner, name='Olimp Arena', district=create_district('Chilonzor'))
+        autocomplete_index.rebuild()
+
+    def names(self, query):
+        return [suggestion['name'] for suggestion in autocomplete_index.search(query, 10)]
+
+    def test_search(self):
+        self.assertEqual(self.names('oli'), ['Olimp Arena'])
+        self.assertEqual(self.names('ARE'), ['Olimp Arena'])
+        self.assertEqual(self.names('chilón'), ['Chilonzor'])
+        self.assertEqual(self.names('lim'), [])
+        self.assertEqual(self.names(' '), [])
+
+    def test_apostrophes(self):
+        create_district("Mirzo Ulug‘bek")
+        autocomplete_index.rebuild()
+        self.assertEqual(self.names("ulug'b"), ["Mirzo Ulug‘bek"])
+
+    def test_added_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_field(self.owner, name='Bunyodkor')
+            self.assertEqual(self.names('buny'), [])
+        self.assertEqual(self.names('buny'), ['Bunyodkor'])
+
+    def test_rolled_back(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                create_field(self.owner, name='Bunyodkor')
+                self.field.name = 'Pakhtakor'
+                self.field.save()
+                raise RuntimeError
+        self.assertEqual(self.names('buny'), [])
+        self.assertEqual(self.names('pakh'), [])
+        self.assertEqual(self.names('olimp'), ['Olimp Arena'])
+
+    def test_renamed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.field.name = 'Pakhtakor'
+            self.field.save()
+        self.assertEqual(self.names('olimp'), [])
+        self.assertEqual(self.names('pakh'), ['Pakhtakor'])
+
+    def test_deactivated_and_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.field.is_active = False
+            self.field.save()
+        self.assertEqual(self.names('olimp'), [])
+
+        district = self.field.address.district
+        with self.captureOnCommitCallbacks(execute=True):
+            self.field.address.delete()
+            district.delete()
+        self.assertEqual(self.names('chil'), [])
+
+    def test_api(self):
+        create_field(self.owner, name='Olimpiya', district=self.field.address.district)
+        autocomplete_index.rebuild()
+        response = self.client.get('/api/v1/fields/autocomplete/', {'q': 'olimp', 'limit': 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()['data']['results']), 1)
+
+        response = self.client.get('/api/v1/fields/autocomplete/', {'q': 'chil'})
+        self.assertEqual(response.json()['data']['results'], [
+            {'type': autocomplete_index.DISTRICT, 'id': self.field.address.district_id, 'name': 'Chilonzor'},
+        ])
+
+
+class FieldFacetTest(TestCase):
+    price_bounds = [100000, 200000]
+    size_bounds = [1000, 3000]
+
+    def setUp(self):
+        cache.clear()
+        owner = create_owner()
+        self.districts = [create_district('Chilonzor'), create_district('Yunusobod'), create_district('Sergeli')]
+        rows = [
+            # district, hourly price, width, length
+            (0, 50000, 20, 40),
+            (0, 100000, 40, 60),
+            (0, 150000, 40, 60),
+            (1, 199999, 50, 60),
+            (1, 200000, 60, 90),
+            (1, 350000, 20, 50),
+            (2, 120000, 30, 40),
+        ]
+        for index, (district, price, width, length) in enumerate(rows):
+            field = create_field(owner, name=f'Arena {index}', district=self.districts[district], hourly_price=price)
+            FootballField.objects.filter(pk=field.pk).update(width=width, length=length)
+        create_field(owner, name='Closed', district=self.districts[2], hourly_price=50000, is_active=False)
+
+    @staticmethod
+    def get_band(value, bounds):
+        return sum(value >= bound for bound in bounds)
+
+    def count_facets(self, queryset) -> dict:
+        """The facets counted one by one with plain GROUP BY queries"""
+        queryset = queryset.order_by()
+        districts = queryset.values('address__district_id', 'address__district__name').annotate(count=Count('pk'))
+        prices = [0] * (len(self.price_bounds) + 1)
+        for row in queryset.values('hourly_price').annotate(count=Count('pk')):
+            prices[self.get_band(row['hourly_price'], self.price_bounds)] += row['count']
+        sizes = [0] * (len(self.size_bounds) + 1)
+        for row in queryset.values('width', 'length').annotate(count=Count('pk')):
+            sizes[self.get_band(row['width'] * row['length'], self.size_bounds)] += row['count']
+        return {
+            'district': sorted(
+                ({'id': row['address__district_id'], 'name': row['address__district__name'], 'count': row['count']}
+                 for row in districts),
+                key=lambda row: (-row['count'], row['name']),
+            ),
+            'price': prices,
+            'size': sizes,
+        }
+
+    def assertFacetsCounted(self, facets, queryset):
+        expected = self.count_facets(queryset)
+        self.assertEqual(facets['district'], expected['district'])
+        self.assertEqual([band['count'] for band in facets['price']], expected['price'])
+        self.assertEqual([band['count'] for band in facets['size']], expected['size'])
+
+    def test_counts(self):
+        service = FieldFacetService(price_bounds=self.price_bounds, size_bounds=self.size_bounds)
+        querysets = [
+            FootballField.objects.active(),
+            FootballField.objects.active().filter(address__district=self.districts[1]),
+            FootballField.objects.active().filter(hourly_price__gte=100000, name__in=['Arena 1', 'Arena 5', 'Arena 6']),
+            FootballField.objects.all(),
+            FootballField.objects.none(),
+        ]
+        for queryset in querysets:
+            with self.subTest(query=str(queryset.query) if queryset.exists() else 'none'):
+                self.assertFacetsCounted(service.get_facets(queryset), queryset)
+
+    def test_bands(self):
+        facets = FieldFacetService(price_bounds=[200000, 100000], size_bounds=self.size_bounds).get_facets(
+            FootballField.objects.active()
+        )
+        self.assertEqual(facets['price'], [
+            {'min': None, 'max': 100000, 'count': 1},
+            {'min': 100000, 'max': 200000, 'count': 4},
+            {'min': 200000, 'max': None, 'count': 2},
+        ])
+        self.assertEqual([band['count'] for band in facets['size']], [1, 4, 2])
+
+    @override_settings(FIELDS_SETTINGS=dict(
+        settings.FIELDS_SETTINGS, FACET_PRICE_BANDS='100000,200000', FACET_SIZE_BANDS='1000,3000',
+    ))
+    def test_api(self):
+        district = self.districts[0]
+        for params, queryset in (
+            ({}, FootballField.objects.active()),
+            ({'district': district.pk}, FootballField.objects.active().filter(address__district=district)),
+            ({'search': 'Sergeli'}, FootballField.objects.active().filter(address__district=self.districts[2])),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/api/v1/fields/', dict(params, facets='true'))
+                self.assertEqual(response.status_code, 200, response.content)
+                data = response.json()['data']
+                self.assertEqual(data['count'], queryset.count())
+                self.assertFacetsCounted(data['facets'], queryset)
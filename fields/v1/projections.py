@@ -0,0 +1,32 @@
+from rest_framework import serializers
+
+from fields.v1.serializers import get_cover_thumbnail_url, round_distance
+from utils.projections import Projection, field_converter
+
+coordinate = field_converter(serializers.FloatField())
+
+
+class FootballFieldListProjection(Projection):
+    """
+    `FootballFieldListSerializer` read from rows
+    """
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'address': {
+            'id': 'address__id',
+            'country': 'address__district__region__country__name',
+            'region': 'address__district__region__name',
+            'district': 'address__district__name',
+            'address_line': 'address__address_line',
+            'zipcode': 'address__zipcode',
+            'latitude': ('address__latitude', coordinate),
+            'longitude': ('address__longitude', coordinate),
+        },
+        'contact_number': 'contact_number',
+        'contact_number2': 'contact_number2',
+        'description': 'description',
+        'hourly_price': 'hourly_price',
+        'cover_thumbnail': ('cover_thumbnail', get_cover_thumbnail_url),
+        'distance': ('distance', round_distance),
+    }
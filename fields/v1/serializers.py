@@ -1,21 +1,45 @@
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from base.v1.serializers import AddressSerializer
 from fields.dataclasses import FootballFieldData, AddressData
-from fields.models import FootballField
+from fields.models import FootballField, FootballFieldImage
 from fields.services import FootballFieldService
+from file.models import File
 from file.v1.serializers import FileSerializer
 from user.v1.serializers import UserMiniSerializer
+from utils.serializers import EagerLoadingMixin, SparseFieldsetMixin
 
+# images in their order, see `FootballField.get_images`
+IMAGES_PREFETCH = Prefetch('field_images', queryset=FootballFieldImage.objects.select_related('file'))
 
-class FootballFieldSerializer(serializers.ModelSerializer):
+
+def round_distance(distance):
+    return round(distance or 0, 2)
+
+
+def get_cover_thumbnail_url(name):
+    if not name:
+        return None
+    return f"{settings.API_HOST}{storages['default'].url(name)}"
+
+
+class FootballFieldSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     used to create and update football fields
 
     if admin is creating a field, he should be able to set the owner
     if owner is creating a field, owner should be set automatically
     """
+    # read in `to_representation`
+    select_related_fields = ('owner',)
+    prefetch_related_fields = (IMAGES_PREFETCH,)
+
     address = AddressSerializer()
+    # in the given order, the first one is the cover unless `cover_image` is set
+    images = serializers.PrimaryKeyRelatedField(queryset=File.objects.all(), many=True, required=False)
 
     class Meta:
         model = FootballField
@@ -28,6 +52,7 @@ class FootballFieldSerializer(serializers.ModelSerializer):
             'description',
             'hourly_price',
             'images',
+            'cover_image',
             'width',
             'length',
             'owner',
@@ -48,6 +73,15 @@ class FootballFieldSerializer(serializers.ModelSerializer):
             owner = attrs.get('owner')
             if owner and owner != self.instance.owner:
                 raise serializers.ValidationError("Owner cannot be changed.")
+
+        cover_image = attrs.get('cover_image')
+        if cover_image:
+            if 'images' in attrs:
+                images = attrs['images']
+            else:
+                images = self.instance.images.all() if self.instance else []
+            if cover_image not in images:
+                raise serializers.ValidationError({'cover_image': "Cover image must be one of the images."})
         return attrs
 
     def create(self, validated_data):
@@ -70,27 +104,38 @@ class FootballFieldSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         # Handle address update if provided
-        AddressSerializer().update(instance.address, validated_data.pop('address'))
+        if 'address' in validated_data:
+            AddressSerializer().update(instance.address, validated_data.pop('address'))
 
-        # Handle images if provided
-        if 'images' in validated_data:
-            instance.images.clear()
-            instance.images.set(validated_data.pop('images'))
+        images = validated_data.pop('images', None)
+        cover_image = validated_data.pop('cover_image', None)
 
         field = super().update(instance, validated_data)
 
+        # Handle images if provided, the cover is kept in sync by the service
+        if images is not None:
+            FootballFieldService.set_images(field, images, cover_image)
+        elif cover_image:
+            FootballFieldService.set_cover_image(field, cover_image)
+
         return field
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
         data['owner'] = UserMiniSerializer(instance.owner).data
-        data['images'] = FileSerializer(instance.images.all(), many=True).data
+        data['images'] = FileSerializer(instance.get_images(), many=True).data
         return data
 
 
-class FootballFieldListSerializer(serializers.ModelSerializer):
+class FootballFieldListSerializer(SparseFieldsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    """
+    the card shows the cover only, its thumbnail is kept on the field so no image is queried
+    """
+    method_field_columns = {'cover_thumbnail': ('cover_thumbnail',), 'distance': ()}
+
     address = AddressSerializer()
-    images = FileSerializer(many=True)
+    cover_thumbnail = serializers.SerializerMethodField()
+    distance = serializers.SerializerMethodField()
 
     class Meta:
         model = FootballField
@@ -102,19 +147,24 @@ class FootballFieldListSerializer(serializers.ModelSerializer):
             'contact_number2',
             'description',
             'hourly_price',
-            'images',
+            'cover_thumbnail',
+            'distance',
         )
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data['distance'] = round(getattr(instance, 'distance', 0), 2)
-        return data
+    def get_cover_thumbnail(self, obj):
+        return get_cover_thumbnail_url(obj.cover_thumbnail)
+
+    def get_distance(self, obj):
+        return round_distance(getattr(obj, 'distance', 0))
 
 
-class FootballDetailSerializer(serializers.ModelSerializer):
+class FootballDetailSerializer(SparseFieldsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = {'images': (IMAGES_PREFETCH,)}
+    method_field_columns = {'images': ()}
+
     address = AddressSerializer()
     owner = UserMiniSerializer()
-    images = FileSerializer(many=True)
+    images = FileSerializer(source='get_images', many=True)
 
     class Meta:
         model = FootballField
@@ -127,6 +177,7 @@ class FootballDetailSerializer(serializers.ModelSerializer):
             'description',
             'hourly_price',
             'images',
+            'cover_image',
             'width',
             'length',
             'owner',
@@ -140,4 +191,42 @@ class FootballFieldMiniSerializer(serializers.ModelSerializer):
         fields = (
             'id',
             'name',
-        )
\ No newline at end of file
+        )
+
+
+class FootballFieldSyncSerializer(serializers.ModelSerializer):
+    """
+    the address and the images are returned separately, the field refers to them by id
+    """
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FootballField
+        fields = (
+            'id',
+            'name',
+            'address',
+            'contact_number',
+            'contact_number2',
+            'description',
+            'hourly_price',
+            'images',
+            'cover_image',
+            'width',
+            'length',
+            'modified_at',
+        )
+
+    def get_images(self, obj):
+        # in their order, from the prefetched `field_images`
+        return [image.file_id for image in obj.field_images.all()]
+
+
+class FieldChangesSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    has_more = serializers.BooleanField()
+    reset = serializers.BooleanField()
+    fields = FootballFieldSyncSerializer(many=True)
+    addresses = AddressSerializer(many=True)
+    images = FileSerializer(many=True)
+    deleted = serializers.DictField(child=serializers.ListField(child=serializers.IntegerField()))
@@ -1,18 +1,30 @@
-from django.db.models import F, Value, FloatField, Q
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, F, Value, FloatField, Q, When
 from django.db.models import QuerySet
 from django.db.models.functions import Sqrt, Power, Radians, Sin, Cos, ATan2
+from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 
 from base.v1.views import BaseModelViewSet
 from bookings.models import Booking
-from fields.filters import FieldsOrdering, FieldsFilter
+from fields.autocomplete import autocomplete_index
+from fields.filters import FieldsOrdering, FieldsFilter, FieldsSearchFilter
 from fields.models import FootballField
-from fields.v1.serializers import FootballFieldSerializer, FootballFieldListSerializer, FootballDetailSerializer
+from fields.services import FieldChangesService, FieldFacetService, FieldRankingService
+from fields.v1.projections import FootballFieldListProjection
+from fields.v1.serializers import (
+    FootballFieldSerializer, FootballFieldListSerializer, FootballDetailSerializer, FieldChangesSerializer
+)
 from user.permissions import IsOwnerOrAdmin
-from utils.constants import BookingStatus
+from utils.cache import get_or_set_single_flight, make_cache_key, normalize_query, snap_coordinate
+from utils.constants import BookingStatus, CacheNamespace
 from utils.response import SuccessResponse
 from utils.tools import parse_datetime
 
@@ -20,15 +32,67 @@ from utils.tools import parse_datetime
 class FootballFieldViewSet(BaseModelViewSet):
     filter_backends = (
         DjangoFilterBackend,
-        SearchFilter,
+        FieldsSearchFilter,
         FieldsOrdering,
     )
     filterset_class = FieldsFilter
+    # the icontains fallback of `FieldsSearchFilter`
     search_fields = (
         'name', 'description',
-        'address__address_line'
+        'address__address_line', 'address__district__name'
+    )
+    list_projection = FootballFieldListProjection
+    # query parameters rounded to `FIELDS_SETTINGS['LIST_CACHE_COORDINATE_GRID']` in the cached list
+    coordinate_query_params = ('latitude', 'longitude')
+    snap_coordinates = False
+    # images are part of the field, changing them touches its `modified_at`
+    etag_fields = (
+        'modified_at',
+        'address__modified_at',
+        'address__district__modified_at',
+        'address__district__region__modified_at',
+        'address__district__region__country__modified_at',
+    )
+    # the detail also shows the owner, who has no `modified_at`, and the processed image metadata
+    detail_etag_fields = etag_fields + (
+        'owner__full_name',
+        'owner__phone_number',
+        'field_images__file__modified_at',
     )
 
+    def get_list_projection(self):
+        if self.action in ['list', 'my_fields']:
+            return self.list_projection(self.get_fieldset())
+        return super().get_list_projection()
+
+    def get_etag_fields(self):
+        if self.action == 'retrieve':
+            return self.detail_etag_fields
+        return super().get_etag_fields()
+
+    def is_best_match(self) -> bool:
+        return self.action == 'list' and FieldsOrdering().is_best_match(self.request)
+
+    def get_list_data(self, queryset):
+        """
+        The best matches are ranked by their ids, only the fields of the page are read then
+        """
+        if not self.is_best_match():
+            return super().get_list_data(queryset)
+        if self.cursor_query_param in self.request.query_params:
+            raise ValidationError(_("Cursor pagination is not supported for this ordering"))
+
+        ids = FieldRankingService().rank(queryset, self.get_time_window(), by_distance=any(self.get_coordinates()))
+        page_ids = self.paginate_queryset(ids, self.request)
+        page = queryset.filter(pk__in=page_ids).order_by(
+            Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(page_ids)])
+        ) if page_ids else queryset.none()
+
+        projection = self.get_list_projection()
+        if projection is not None:
+            return projection.map(projection.apply(page))
+        return self.get_serializer(page, many=True).data
+
     def get_serializer_class(self):
         if self.action in ['list', 'my_fields']:
             return FootballFieldListSerializer
@@ -65,14 +129,22 @@ class FootballFieldViewSet(BaseModelViewSet):
         fields = self._annotate_distance(fields)
         return fields.order_by('name')
 
-    def filter_queryset(self, queryset):
-        # Filter by date/time availability
+    def get_time_window(self):
+        """
+        Returns the (start_time, end_time) the field is looked for, None if not given
+        """
         start_time = self.request.query_params.get('start_time')
         end_time = self.request.query_params.get('end_time')
+        if not (start_time and end_time):
+            return None
+        return parse_datetime(start_time), parse_datetime(end_time)
+
+    def filter_queryset(self, queryset):
+        # Filter by date/time availability
+        window = self.get_time_window()
 
-        if start_time and end_time:
-            start_time = parse_datetime(start_time)
-            end_time = parse_datetime(end_time)
+        if window:
+            start_time, end_time = window
 
             # Find fields with conflicting bookings
             booked_fields = Booking.objects.filter(
@@ -90,8 +162,7 @@ class FootballFieldViewSet(BaseModelViewSet):
         Annotate fields with distance from a given location
         """
         # Sort by proximity if latitude and longitude provided
-        latitude = float(self.request.query_params.get('latitude', 0))
-        longitude = float(self.request.query_params.get('longitude', 0))
+        latitude, longitude = self.get_coordinates()
         # Radius of the Earth in kilometers
         R = 6371
 
@@ -122,6 +193,69 @@ class FootballFieldViewSet(BaseModelViewSet):
         )
         return fields
 
+    def get_coordinates(self):
+        latitude, longitude = (self.request.query_params.get(name, 0) for name in self.coordinate_query_params)
+        if self.snap_coordinates:
+            # the cached response is built for the grid point, so it is the same whoever builds it
+            grid = Decimal(settings.FIELDS_SETTINGS['LIST_CACHE_COORDINATE_GRID'])
+            latitude, longitude = (snap_coordinate(value, grid) if value else value for value in (latitude, longitude))
+        return float(latitude), float(longitude)
+
+    def get_list_cache_key(self):
+        """
+        Anonymous lists are cached by the normalized query string, None if the request is not cached
+        """
+        if self.request.user.is_authenticated:
+            return None
+        grid = Decimal(settings.FIELDS_SETTINGS['LIST_CACHE_COORDINATE_GRID'])
+        query = normalize_query(self.request.query_params, self.coordinate_query_params, grid)
+        if query is None:
+            return None
+        return make_cache_key(CacheNamespace.FIELDS_LIST, query)
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_list_cache_key()
+        if cache_key is None:
+            return super().list(request, *args, **kwargs)
+
+        self.snap_coordinates = True
+        cached = get_or_set_single_flight(
+            cache_key,
+            self.get_cached_list,
+            timeout=int(settings.FIELDS_SETTINGS['LIST_CACHE_TIMEOUT']),
+            lock_timeout=int(settings.FIELDS_SETTINGS['LIST_CACHE_LOCK_TIMEOUT']),
+        )
+        etag = self.get_etag(cached['etag_validator'])
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = cached['data']
+        response = SuccessResponse(**{"data": dict(data, links=self.get_links_for_request(data['links']))})
+        if etag:
+            response['ETag'] = etag
+        return response
+
+    def get_cached_list(self):
+        """
+        The page and its ETag validator, a digest of the page, so a cached page is validated without a query
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        data = self.get_list_response_data(queryset)
+        return {
+            'etag_validator': hashlib.sha1(JSONRenderer().render(data)).hexdigest(),
+            'data': data,
+        }
+
+    def get_list_response_data(self, queryset) -> dict:
+        """
+        With `?facets=true` the counts per district, price band and size band are added, see `FieldFacetService`
+        """
+        data = super().get_list_response_data(queryset)
+        if self.action == 'list' and self.request.query_params.get('facets') in ('1', 'true'):
+            data['facets'] = FieldFacetService().get_facets(queryset)
+        return data
+
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
@@ -130,8 +264,29 @@ class FootballFieldViewSet(BaseModelViewSet):
         """
         Retrieve fields owned by the authenticated user
         """
-        queryset = self.filter_queryset(self.get_queryset().filter(owner=request.user))
-        paginated_queryset = self.paginate_queryset(queryset, request)
-        serializer = self.get_serializer(paginated_queryset, many=True)
-        return SuccessResponse(**{"data": self.get_paginated_data(serializer.data)})
+        queryset = self.filter_queryset(self.get_queryset().filter(owner_id=request.user.id))
+        return SuccessResponse(**{"data": self.get_paginated_data(self.get_list_data(queryset))})
 
+    @action(methods=['get'], detail=False, url_path='changes', url_name='changes')
+    def changes(self, request, *args, **kwargs):
+        """
+        Fields, addresses and images changed since the `since` token, deleted ones by id.
+        Start with an empty token and repeat with the returned one while `has_more`,
+        the client drops its copy when `reset` is set.
+        """
+        changes = FieldChangesService().get_changes(request.query_params.get('since', ''))
+        return SuccessResponse(**{"data": FieldChangesSerializer(changes, context=self.get_serializer_context()).data})
+
+    @action(methods=['get'], detail=False, url_path='autocomplete', url_name='autocomplete')
+    def autocomplete(self, request, *args, **kwargs):
+        """
+        Names of fields, districts and regions starting with `q`, any word of the name may be the start.
+        Served from the index in memory, see `AutocompleteIndex`.
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.FIELDS_SETTINGS['AUTOCOMPLETE_LIMIT']))
+        except ValueError:
+            limit = int(settings.FIELDS_SETTINGS['AUTOCOMPLETE_LIMIT'])
+        limit = min(max(limit, 1), int(settings.FIELDS_SETTINGS['AUTOCOMPLETE_MAX_LIMIT']))
+        suggestions = autocomplete_index.search(request.query_params.get('q', ''), limit)
+        return SuccessResponse(**{"data": {"results": suggestions}})
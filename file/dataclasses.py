@@ -0,0 +1,8 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class CollectionResult:
+    files: int = 0
+    blobs: int = 0
+    bytes: int = 0
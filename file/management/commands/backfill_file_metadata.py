@@ -0,0 +1,83 @@
+import mimetypes
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from file.models import File
+from file.processing import process_file
+
+
+class Command(BaseCommand):
+    help = 'Collect the metadata of the files uploaded before it was recorded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+        parser.add_argument('--batch-size', type=int, default=500, help='Files updated per query')
+        parser.add_argument('--variants', action='store_true', help='Generate the missing image variants as well')
+
+    def handle(self, *args, **options):
+        files = File.objects.filter(mime_type='').only('id', 'file', 'variants').order_by('pk')
+        storage = File._meta.get_field('file').storage
+        # `modified_at` is not set by bulk_update, it validates the cached responses showing the files
+        fields = ['size', 'mime_type', 'width', 'height', 'placeholder', 'modified_at']
+        if options['variants']:
+            fields.append('variants')
+
+        processed = missing = failed = 0
+        last_id = 0
+        with ProcessPoolExecutor(
+                max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            while True:
+                batch = list(files.filter(pk__gt=last_id)[:options['batch_size']])
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+
+                stored = [file for file in batch if storage.exists(file.file.name)]
+                missing += len(batch) - len(stored)
+                futures = [
+                    executor.submit(
+                        process_file, storage.location, file.file.name, file.pk, variants=options['variants']
+                    )
+                    for file in stored
+                ]
+                updated = []
+                for file, future in zip(stored, futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # e.g. a corrupt image, recorded without the image metadata so the next run skips it
+                        self.stderr.write(f'File {file.pk} is not processed: {e}')
+                        result = self.get_fallback_result(storage, file)
+                        failed += 1
+                    if options['variants']:
+                        # only images get variants
+                        result.setdefault('variants', file.variants)
+                    for field, value in result.items():
+                        setattr(file, field, value)
+                    file.modified_at = timezone.now()
+                    updated.append(file)
+
+                File.objects.bulk_update(updated, fields)
+                processed += len(updated)
+                self.stdout.write(f'{processed} files processed')
+
+        self.stdout.write(
+            f'{processed} files processed, {failed} of them without the image metadata, '
+            f'{missing} files missing from the storage'
+        )
+
+    @staticmethod
+    def get_fallback_result(storage, file: File) -> dict:
+        try:
+            size = storage.size(file.file.name)
+        except OSError:
+            size = None
+        return {
+            'size': size,
+            'mime_type': mimetypes.guess_type(file.file.name)[0] or 'application/octet-stream',
+        }
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from file.services import OrphanFileCollector
+
+
+class Command(BaseCommand):
+    help = 'Delete the files no model refers to, older than the grace period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-period', type=int, help='Seconds since the file was uploaded')
+        parser.add_argument('--batch-size', type=int, help='Files deleted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report the orphans without deleting them')
+
+    def handle(self, *args, **options):
+        grace_period = options['grace_period']
+        collector = OrphanFileCollector(
+            grace_period=timedelta(seconds=grace_period) if grace_period is not None else None,
+            batch_size=options['batch_size'],
+        )
+        result = collector.collect(dry_run=options['dry_run'])
+        self.stdout.write(
+            f"{result.files} files, {result.blobs} blobs, {filesizeformat(result.bytes)} "
+            f"{'would be reclaimed' if options['dry_run'] else 'reclaimed'}"
+        )
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from file.services import UploadSessionService
+
+
+class Command(BaseCommand):
+    help = 'Remove the upload sessions not changed within the time to live, with their partial content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl', type=int, default=int(settings.FILE_SETTINGS['UPLOAD_SESSION_TTL']),
+            help='Seconds since the last change of a session',
+        )
+
+    def handle(self, *args, **options):
+        count = UploadSessionService.expire_sessions(timedelta(seconds=options['ttl']))
+        self.stdout.write(f'{count} upload sessions removed')
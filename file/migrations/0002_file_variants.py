@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of the image, variant name -> storage name.'),
+        ),
+    ]
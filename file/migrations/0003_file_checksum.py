@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0002_file_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='checksum',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the content, files uploaded before it was recorded have none.', max_length=64, null=True, unique=True),
+        ),
+    ]
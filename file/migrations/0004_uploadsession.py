@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0003_file_checksum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='modified at')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Size of the whole upload in bytes.')),
+                ('checksum', models.CharField(help_text='Expected SHA-256 of the whole upload.', max_length=64)),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Number of bytes received.')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed')], default='active', max_length=20)),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_sessions', to='file.file')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'modified_at'], name='file_upload_status_0f5485_idx')],
+            },
+        ),
+    ]
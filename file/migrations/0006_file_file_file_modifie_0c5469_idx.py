@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0005_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['modified_at', 'id'], name='file_file_modifie_0c5469_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0006_file_file_file_modifie_0c5469_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['file'], name='file_file_file_9b5a81_idx'),
+        ),
+    ]
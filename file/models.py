@@ -1,9 +1,14 @@
+import os
+import uuid
+
 from django.db import models
 from base.models import BaseModel
 from django.core.files.storage import storages
 from file import get_upload_path
 from django.utils.translation import gettext_lazy as _
 
+from utils.constants import UploadStatus
+
 
 class File(BaseModel):
     file = models.FileField(
@@ -11,3 +16,70 @@ class File(BaseModel):
         storage=storages['default'],
         verbose_name=_('file')
     )
+    checksum = models.CharField(
+        max_length=64,
+        unique=True, null=True, blank=True,
+        editable=False,
+        help_text=_('SHA-256 of the content, files uploaded before it was recorded have none.')
+    )
+    variants = models.JSONField(
+        default=dict, blank=True,
+        help_text=_('Resized copies of the image, variant name -> storage name.')
+    )
+    # metadata collected by file.services.ImagePipeline, empty until the file is processed
+    size = models.PositiveBigIntegerField(null=True, blank=True, help_text=_('Size in bytes.'))
+    mime_type = models.CharField(max_length=100, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    placeholder = models.TextField(
+        blank=True,
+        help_text=_('Tiny blurred preview of the image as a data uri, shown until the image is loaded.')
+    )
+
+    class Meta:
+        indexes = [
+            # changes since a sync token, see fields.services.FieldChangesService
+            models.Index(fields=('modified_at', 'id')),
+            # blobs shared by several rows, see file.services.OrphanFileCollector
+            models.Index(fields=('file',)),
+        ]
+
+    @property
+    def thumbnail_name(self):
+        """
+        storage name of the smallest variant, the original until the variants are generated
+        """
+        return self.variants.get('thumbnail') or self.file.name
+
+
+class UploadSession(BaseModel):
+    """
+    Resumable upload, see `file.services.UploadSessionService`.
+
+    The chunks are appended to a temporary file in the storage,
+    which becomes a `File` once the upload is complete and matches the checksum.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text=_('Size of the whole upload in bytes.'))
+    checksum = models.CharField(max_length=64, help_text=_('Expected SHA-256 of the whole upload.'))
+    offset = models.PositiveBigIntegerField(default=0, help_text=_('Number of bytes received.'))
+    status = models.CharField(
+        max_length=20,
+        choices=UploadStatus.CHOICES,
+        default=UploadStatus.ACTIVE,
+    )
+    file = models.ForeignKey(
+        File, on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='upload_sessions',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('status', 'modified_at')),
+        ]
+
+    @property
+    def temp_name(self):
+        return os.path.join('uploads', f'{self.id}.part')
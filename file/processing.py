@@ -0,0 +1,89 @@
+"""
+Image processing run in the worker processes of `file.services.ImagePipeline`.
+Only depends on Pillow, the workers do not set up Django.
+"""
+import base64
+import io
+import mimetypes
+import os
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# name of the variant -> longest side in pixels
+IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'small': 480,
+    'medium': 1024,
+}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_QUALITY = 80
+
+# low quality image placeholder, a tiny blurred WebP inlined as a data uri
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 30
+
+
+def get_variant_name(name: str, key, variant: str) -> str:
+    """
+    Variants are stored next to the original, e.g. 20240116/photo.jpg -> 20240116/photo_<key>_small.webp.
+    The key of the file keeps apart the originals with the same name but another extension, photo.jpg and photo.png
+    """
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{key}_{variant}.webp'
+
+
+def get_placeholder(image: Image.Image) -> str:
+    placeholder = image.copy()
+    placeholder.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    placeholder.save(buffer, VARIANT_FORMAT, quality=PLACEHOLDER_QUALITY)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def process_file(location: str, name: str, key, variants: bool = True) -> dict:
+    """
+    Collect the metadata of the file stored under `location`/`name` and write the variants of images.
+    :param key: primary key of the `File`, part of the names of the variants
+    Returns the values of the `File` fields, the image fields are empty if the file is not an image.
+    """
+    path = os.path.join(location, name)
+    result = {
+        'size': os.path.getsize(path),
+        'mime_type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+        'width': None,
+        'height': None,
+        'placeholder': '',
+    }
+    try:
+        image = Image.open(path)
+    except UnidentifiedImageError:
+        return result
+
+    with image:
+        result['mime_type'] = image.get_format_mimetype() or result['mime_type']
+        image = ImageOps.exif_transpose(image)
+        # size as displayed, after the EXIF orientation is applied
+        result['width'], result['height'] = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        result['placeholder'] = get_placeholder(image)
+        if variants:
+            result['variants'] = generate_variants(image, location, name, key)
+    return result
+
+
+def generate_variants(image: Image.Image, location: str, name: str, key) -> dict:
+    """
+    Write the resized WebP variants of the image next to the original.
+    Returns variant -> storage name.
+    """
+    variants = {}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        # never upscale, small originals are stored as they are
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variant_name = get_variant_name(name, key, variant)
+        resized.save(os.path.join(location, variant_name), VARIANT_FORMAT, quality=VARIANT_QUALITY)
+        variants[variant] = variant_name
+    return variants
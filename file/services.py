@@ -0,0 +1,418 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Tuple, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File as DjangoFile
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from file import get_upload_path
+from file.dataclasses import CollectionResult
+from file.models import File, UploadSession
+from file.processing import process_file
+from file.signals import file_processed
+from utils.cache import cache_lock
+from utils.constants import UploadStatus
+from utils.exceptions import UploadOffsetMismatch
+
+logger = logging.getLogger(__name__)
+
+
+class ImagePipeline:
+    """
+    Collects the metadata and generates the image variants of uploaded files in a process pool,
+    off the request thread. They are recorded on the `File` once the worker is done.
+    """
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    # spawned workers do not inherit the threads and connections of the server process
+                    cls._executor = ProcessPoolExecutor(
+                        max_workers=int(settings.FILE_SETTINGS['PROCESS_POOL_SIZE']),
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+        return cls._executor
+
+    @classmethod
+    def submit(cls, file: File):
+        location = getattr(file.file.storage, 'location', None)
+        if location is None:
+            # the workers write to the local file system only
+            logger.warning('Storage of file %s is not local, variants are not generated', file.pk)
+            return None
+
+        future = cls.get_executor().submit(process_file, location, file.file.name, file.pk)
+        future.add_done_callback(partial(cls._save_result, file.pk))
+        return future
+
+    @staticmethod
+    def _save_result(file_id, future):
+        """
+        Runs in a thread of the executor, not in the worker process
+        """
+        try:
+            result = future.result()
+            File.objects.filter(pk=file_id).update(**result, modified_at=timezone.now())
+            file_processed.send(sender=File, file_id=file_id, result=result)
+        except Exception:
+            logger.exception('File %s is not processed', file_id)
+        finally:
+            connection.close()
+
+
+class FileService:
+    """
+    Service class for storing uploaded files.
+
+    Files are content addressed, uploading the same content again returns the existing `File`
+    instead of storing another copy.
+    """
+
+    @staticmethod
+    def get_checksum(content: DjangoFile) -> str:
+        checksum = hashlib.sha256()
+        for chunk in content.chunks():
+            checksum.update(chunk)
+        content.seek(0)
+        return checksum.hexdigest()
+
+    @classmethod
+    def create_file(cls, content: DjangoFile, checksum: str = None) -> Tuple[File, bool]:
+        """
+        Returns the stored file and whether it was created.
+        :param checksum: SHA-256 of the content if it was computed while receiving it
+        """
+        checksum = checksum or cls.get_checksum(content)
+
+        def store(file: File, name: str):
+            file.file.save(content.name, content, save=False)
+
+        return cls._create(checksum, content.name, store)
+
+    @classmethod
+    def create_file_from_path(cls, path: str, filename: str, checksum: str) -> Tuple[File, bool]:
+        """
+        Same as `create_file` for content already written to the storage, the file at `path` is moved.
+        """
+
+        def store(file: File, name: str):
+            target = file.file.storage.path(name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+            file.file.name = name
+
+        return cls._create(checksum, filename, store)
+
+    @staticmethod
+    def touch(file: File) -> bool:
+        """
+        Mark the file as used again, the orphan collector keeps it for another grace period.
+        False if it was deleted meanwhile.
+        """
+        now = timezone.now()
+        if not File.objects.filter(pk=file.pk).update(modified_at=now):
+            return False
+        file.modified_at = now
+        return True
+
+    @classmethod
+    def _create(cls, checksum: str, filename: str, store: Callable[[File, str], None]) -> Tuple[File, bool]:
+        file = File.objects.filter(checksum=checksum).first()
+        if file and cls.touch(file):
+            return file, False
+
+        file = File(checksum=checksum)
+        name = get_upload_path(file, filename)
+        # the blob may be about to be deleted with an orphan row, it is kept once reserved
+        OrphanFileCollector.reserve_blob(name)
+        if file.file.storage.exists(name):
+            # left by a deleted row or stored by a concurrent upload, the content is the same
+            file.file.name = name
+        else:
+            store(file, name)
+
+        try:
+            with transaction.atomic():
+                file.save()
+        except IntegrityError:
+            # the same content was uploaded concurrently
+            return File.objects.get(checksum=checksum), False
+        return file, True
+
+
+class UploadSessionService:
+    """
+    Service class for resumable uploads.
+
+    1. the client creates a session with the name, size and SHA-256 of the file
+    2. the client sends the content in chunks, each chunk starting at the current offset of the session
+    3. the client finalizes the session, the content is verified and stored as a `File`
+
+    A dropped chunk keeps the bytes received until then, the client continues from the session offset.
+    """
+    chunk_size = 64 * 1024
+
+    @staticmethod
+    def create_session(filename: str, size: int, checksum: str) -> UploadSession:
+        file = File.objects.filter(checksum=checksum).first()
+        if file and FileService.touch(file):
+            # the content is stored already, nothing to upload
+            return UploadSession.objects.create(
+                filename=filename, size=size, checksum=checksum,
+                offset=size, status=UploadStatus.COMPLETED, file=file,
+            )
+        return UploadSession.objects.create(filename=filename, size=size, checksum=checksum)
+
+    @classmethod
+    def append_chunk(cls, session_id, stream, start: int) -> UploadSession:
+        """
+        Receive the chunk read from `stream` into a file of its own and append it to the temporary file of the session.
+        Only the append is done under the lock of the session, a slow client does not hold it.
+        """
+        session = UploadSession.objects.get(pk=session_id)
+        cls._check_offset(session, start)
+
+        path = cls._get_temp_path(session)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        chunk_path = f'{path}.{uuid.uuid4().hex}'
+        try:
+            written = cls._receive_chunk(stream, chunk_path, session.size - start)
+            with transaction.atomic():
+                session = UploadSession.objects.select_for_update().get(pk=session_id)
+                # a concurrent request may have appended the same chunk meanwhile
+                cls._check_offset(session, start)
+                with open(path, 'r+b' if os.path.exists(path) else 'wb') as f, open(chunk_path, 'rb') as chunk:
+                    # bytes after the offset are left by a failed request, they are overwritten
+                    f.seek(session.offset)
+                    shutil.copyfileobj(chunk, f, cls.chunk_size)
+                    f.truncate()
+                session.offset += written
+                session.save(update_fields=['offset', 'modified_at'])
+        finally:
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+        return session
+
+    @staticmethod
+    def _check_offset(session: UploadSession, start: int):
+        if session.status != UploadStatus.ACTIVE:
+            raise ValidationError(_("Upload is already completed"))
+        if start != session.offset:
+            raise UploadOffsetMismatch(_("Chunk must start at offset %(offset)s") % {'offset': session.offset})
+
+    @classmethod
+    def _receive_chunk(cls, stream, path: str, remaining: int) -> int:
+        """
+        Write at most `remaining` bytes of the stream to `path`, returns the number of bytes written
+        """
+        written = 0
+        with open(path, 'wb') as f:
+            while written < remaining:
+                try:
+                    chunk = stream.read(min(cls.chunk_size, remaining - written))
+                except OSError:
+                    # connection dropped, keep what was received
+                    break
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+
+        if written == remaining and stream.read(1):
+            raise ValidationError(_("Upload is larger than the declared size"))
+        return written
+
+    @classmethod
+    def finalize(cls, session_id) -> Tuple[UploadSession, bool]:
+        """
+        Store the upload as a `File`.
+        Returns the session and whether the content matched the checksum,
+        an upload which does not match is discarded and has to be sent again.
+        """
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id)
+            if session.status == UploadStatus.COMPLETED:
+                return session, True
+            if session.offset != session.size:
+                raise ValidationError(
+                    _("Upload is not complete, %(offset)s of %(size)s bytes received")
+                    % {'offset': session.offset, 'size': session.size}
+                )
+
+            path = cls._get_temp_path(session)
+            if cls._get_file_checksum(path) != session.checksum:
+                cls._remove_temp_file(session)
+                session.offset = 0
+                session.save(update_fields=['offset', 'modified_at'])
+                return session, False
+
+            file, created = FileService.create_file_from_path(path, session.filename, session.checksum)
+            # moved to the storage, unless the same content was stored already
+            cls._remove_temp_file(session)
+
+            session.file = file
+            session.status = UploadStatus.COMPLETED
+            session.save(update_fields=['file', 'status', 'modified_at'])
+
+        if created:
+            transaction.on_commit(lambda: ImagePipeline.submit(file))
+        return session, True
+
+    @classmethod
+    def expire_sessions(cls, older_than: timedelta) -> int:
+        """
+        Remove the sessions not changed for the given time, with the content received for them
+        """
+        sessions = UploadSession.objects.filter(modified_at__lt=timezone.now() - older_than)
+        count = 0
+        for session in sessions.iterator():
+            cls._remove_temp_file(session)
+            session.delete()
+            count += 1
+        return count
+
+    @classmethod
+    def _get_file_checksum(cls, path: str) -> Optional[str]:
+        if not os.path.exists(path):
+            return None
+        checksum = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(cls.chunk_size), b''):
+                checksum.update(chunk)
+        return checksum.hexdigest()
+
+    @staticmethod
+    def _get_temp_path(session: UploadSession) -> str:
+        return File._meta.get_field('file').storage.path(session.temp_name)
+
+    @classmethod
+    def _remove_temp_file(cls, session: UploadSession):
+        path = cls._get_temp_path(session)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class OrphanFileCollector:
+    """
+    Deletes the files no model refers to, with their blobs and variants.
+
+    Orphans are found with an anti-join (NOT EXISTS) against every relation to `File`,
+    so relations added later are taken into account without changes here.
+    Upload sessions only record which file an upload became and do not keep it alive.
+    Files changed within the grace period are kept, they may be about to be attached.
+    Uploads of the same content touch the file, see `FileService.touch`.
+
+    Blobs are deleted after their rows, an upload may store the same content under the same name meanwhile.
+    Uploads reserve the name first, see `reserve_blob`, and reserved blobs are not deleted.
+    """
+    ignored_models = (UploadSession,)
+    BLOB_KEY = 'file:blob:{digest}'
+    BLOB_LOCK_TIMEOUT = 10  # seconds
+
+    def __init__(self, grace_period: timedelta = None, batch_size: int = None):
+        if grace_period is None:
+            grace_period = timedelta(seconds=int(settings.FILE_SETTINGS['ORPHAN_GRACE_PERIOD']))
+        if batch_size is None:
+            batch_size = int(settings.FILE_SETTINGS['ORPHAN_BATCH_SIZE'])
+        self.grace_period = grace_period
+        self.batch_size = batch_size
+
+    def get_queryset(self):
+        queryset = File.objects.filter(modified_at__lt=timezone.now() - self.grace_period)
+        for relation in File._meta.related_objects:
+            if relation.related_model in self.ignored_models:
+                continue
+            if relation.many_to_many:
+                model = relation.through
+                lookup = relation.field.m2m_reverse_field_name()
+            else:
+                model = relation.related_model
+                lookup = relation.field.name
+            queryset = queryset.filter(~Exists(model.objects.filter(**{lookup: OuterRef('pk')})))
+        return queryset
+
+    def collect(self, dry_run: bool = False) -> CollectionResult:
+        result = CollectionResult()
+        last_id = 0
+        while True:
+            files = list(
+                self.get_queryset().filter(pk__gt=last_id).order_by('pk')
+                .only('id', 'file', 'variants')[:self.batch_size]
+            )
+            if not files:
+                return result
+            last_id = files[-1].pk
+
+            if not dry_run:
+                files = self._delete_rows(files)
+            result.files += len(files)
+
+            names = {name for file in files for name in (file.file.name, *file.variants.values()) if name}
+            # stored before the content addressed names, shared by another row
+            names -= set(File.objects.filter(file__in=names).values_list('file', flat=True))
+            storage = File._meta.get_field('file').storage
+            for name in sorted(names):
+                size = self._delete_blob(storage, name, dry_run)
+                if size is not None:
+                    result.blobs += 1
+                    result.bytes += size
+
+    @transaction.atomic
+    def _delete_rows(self, files: list) -> list:
+        # checked again under the lock, a file may have been attached since the batch was read
+        ids = set(
+            self.get_queryset().filter(pk__in=[file.pk for file in files])
+            .select_for_update(skip_locked=True).values_list('pk', flat=True)
+        )
+        File.objects.filter(pk__in=ids).delete()
+        return [file for file in files if file.pk in ids]
+
+    @classmethod
+    def reserve_blob(cls, name: str):
+        """
+        Keep the blob from being deleted, for a grace period, as it is about to be referred to again.
+        Shared by the processes using the same cache.
+        """
+        key = cls._get_blob_key(name)
+        with cache_lock(key, cls.BLOB_LOCK_TIMEOUT):
+            cache.set(key, 1, timeout=int(settings.FILE_SETTINGS['ORPHAN_GRACE_PERIOD']))
+
+    @classmethod
+    def _get_blob_key(cls, name: str) -> str:
+        return cls.BLOB_KEY.format(digest=hashlib.sha1(name.encode()).hexdigest())
+
+    @classmethod
+    def _delete_blob(cls, storage, name: str, dry_run: bool) -> Optional[int]:
+        """
+        Returns the size of the deleted blob, None if there was nothing to delete
+        """
+        key = cls._get_blob_key(name)
+        with cache_lock(key, cls.BLOB_LOCK_TIMEOUT):
+            if cache.get(key) is not None:
+                # reserved by an upload, see `reserve_blob`
+                return None
+            try:
+                size = storage.size(name)
+                if not dry_run:
+                    storage.delete(name)
+            except (OSError, NotImplementedError):
+                return None
+        return size
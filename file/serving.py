@@ -0,0 +1,161 @@
+import mimetypes
+import os
+import posixpath
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from file.processing import IMAGE_VARIANTS
+
+# content addressed names, see `file.get_upload_path`,
+# ab/cd/<sha256>.jpg and their variants ab/cd/<sha256>_<id>_small.webp, see `get_variant_name`.
+# Anything else, e.g. a name the storage made unique with a random suffix, may change
+HASHED_NAME_RE = re.compile(
+    r'^[0-9a-f]{2}/[0-9a-f]{2}/(?P<checksum>[0-9a-f]{64})'
+    r'(?:_(?P<variant>\d+_(?:%s)))?\.\w+$' % '|'.join(map(re.escape, IMAGE_VARIANTS))
+)
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+# directories of the storage which are not served, e.g. unfinished uploads
+PRIVATE_DIRS = ('uploads/',)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_etag(name: str, stat: os.stat_result) -> str:
+    """
+    Hashed names are identified by the hash, other files by their modification time and size as nginx does
+    """
+    match = HASHED_NAME_RE.match(name)
+    if match:
+        return '"%s"' % '-'.join(filter(None, (match['checksum'], match['variant'])))
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+def get_byte_range(request, etag: str, last_modified: int, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Returns the inclusive (start, end) of a single range request, None to send the whole file.
+    Multiple ranges are answered with the whole file, which the clients accept.
+    """
+    match = RANGE_RE.match(request.headers.get('Range', '').replace(' ', ''))
+    if not match or not (match['start'] or match['end']):
+        return None
+
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        # the file changed since the client got the first part
+        return None
+
+    if match['start']:
+        start = int(match['start'])
+        end = min(int(match['end']), size - 1) if match['end'] else size - 1
+    else:
+        # suffix range, the last n bytes
+        start = max(size - int(match['end']), 0)
+        end = size - 1
+    return start, end
+
+
+def _read_range(path: str, start: int, length: int):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload(name: str, path: str) -> Optional[HttpResponse]:
+    """
+    Hands the file over to the front proxy, which handles the ranges itself
+    """
+    backend = settings.FILE_SETTINGS['MEDIA_OFFLOAD']
+    response = HttpResponse()
+    if backend == 'x-accel-redirect':
+        # a uri, decoded by nginx, the names may contain spaces and non-latin1 characters
+        response['X-Accel-Redirect'] = settings.FILE_SETTINGS['MEDIA_ACCEL_PREFIX'] + quote(name)
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = path
+    else:
+        return None
+    # the proxy sets the content type from the file unless it is already set
+    del response['Content-Type']
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves the files of the default storage.
+
+    Supports single range and conditional requests, hashed names are cached as immutable.
+    With `FILE_SETTINGS['MEDIA_OFFLOAD']` the bytes are sent by the front proxy instead of the worker.
+    """
+    # normalized first, ./uploads/ or x/../uploads/ are the private directories as well
+    name = posixpath.normpath(path.lstrip('/'))
+    if name in ('.', '..') or name.startswith(('../', *PRIVATE_DIRS)):
+        raise Http404
+    try:
+        full_path = safe_join(default_storage.location, name)
+        stat = os.stat(full_path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = get_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    if HASHED_NAME_RE.match(name):
+        cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache_control = f'public, max-age={int(settings.FILE_SETTINGS["MEDIA_MAX_AGE"])}'
+
+    def set_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = cache_control
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return set_headers(not_modified)
+
+    response = _offload(name, full_path)
+    if response is not None:
+        return set_headers(response)
+
+    size = stat.st_size
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    byte_range = get_byte_range(request, etag, last_modified, size)
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return set_headers(response)
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return set_headers(response)
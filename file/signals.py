@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# sent by file.services.ImagePipeline once the metadata and variants of a file are saved,
+# from a thread of the pipeline, with `file_id` and the saved `result`
+file_processed = Signal()
@@ -0,0 +1,472 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from fields.services import FootballFieldService
+from fields.tests import create_field, create_owner
+from file import services
+from file.dataclasses import CollectionResult
+from file.models import File, UploadSession
+from file.processing import IMAGE_VARIANTS, get_variant_name, process_file
+from file.serving import HASHED_NAME_RE
+from file.services import FileService, ImagePipeline, OrphanFileCollector, UploadSessionService
+from file.signals import file_processed
+from utils.constants import UploadStatus
+from utils.exceptions import UploadOffsetMismatch
+
+CHECKSUM = hashlib.sha256(b'content').hexdigest()
+
+
+def make_image(size=(2000, 1000), format='JPEG') -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format)
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """
+    Files are stored in a temporary media root, removed after the test
+    """
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+        self.client = APIClient()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return name
+
+    def upload(self, content=b'content', name='notes.txt'):
+        return self.client.post('/api/v1/file/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+
+class FileImmutabilityTest(MediaTestCase):
+
+    def test_file_is_not_updated(self):
+        file = File.objects.get(pk=self.upload().json()['id'])
+        other = SimpleUploadedFile('notes.txt', b'other content')
+        url = f'/api/v1/file/{file.pk}/'
+        self.assertEqual(self.client.put(url, {'file': other}, format='multipart').status_code, 405)
+        self.assertEqual(self.client.patch(url, {'file': other}, format='multipart').status_code, 405)
+
+        file.refresh_from_db()
+        with file.file.open('rb') as f:
+            self.assertEqual(hashlib.sha256(f.read()).hexdigest(), file.checksum)
+
+    def test_hashed_names(self):
+        prefix = f'{CHECKSUM[:2]}/{CHECKSUM[2:4]}/{CHECKSUM}'
+        self.assertTrue(HASHED_NAME_RE.match(f'{prefix}.jpg'))
+        self.assertTrue(HASHED_NAME_RE.match(f'{prefix}_12_small.webp'))
+        # made unique by the storage, the content may change
+        self.assertFalse(HASHED_NAME_RE.match(f'{prefix}_hS0EACC.txt'))
+        self.assertFalse(HASHED_NAME_RE.match(f'{prefix}_12_huge.webp'))
+
+
+class ImageVariantsTest(MediaTestCase):
+
+    def test_variants(self):
+        name = self.write('ab/cd/photo.jpg', make_image())
+        result = process_file(self.media_root, name, 7)
+
+        self.assertEqual(set(result['variants']), set(IMAGE_VARIANTS))
+        for variant, size in IMAGE_VARIANTS.items():
+            variant_name = result['variants'][variant]
+            self.assertEqual(variant_name, get_variant_name(name, 7, variant))
+            self.assertEqual(variant_name, f'ab/cd/photo_7_{variant}.webp')
+            with Image.open(os.path.join(self.media_root, variant_name)) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, (size, size // 2))
+
+    def test_small_image_is_not_upscaled(self):
+        name = self.write('photo.png', make_image((100, 50), 'PNG'))
+        result = process_file(self.media_root, name, 1)
+        with Image.open(os.path.join(self.media_root, result['variants']['medium'])) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_variants_of_same_name_are_kept_apart(self):
+        jpeg = self.write('photo.jpg', make_image())
+        png = self.write('photo.png', make_image(format='PNG'))
+        self.assertNotEqual(
+            process_file(self.media_root, jpeg, 1)['variants'], process_file(self.media_root, png, 2)['variants']
+        )
+
+    def test_pipeline_saves_result(self):
+        file = File.objects.create(file=self.write('photo.jpg', make_image()))
+        future = Future()
+        future.set_result(process_file(self.media_root, file.file.name, file.pk))
+        received = []
+
+        def receiver(sender, file_id, **kwargs):
+            received.append(file_id)
+
+        file_processed.connect(receiver)
+        self.addCleanup(file_processed.disconnect, receiver)
+
+        # closing the connection would end the test transaction
+        with mock.patch.object(services, 'connection'):
+            ImagePipeline._save_result(file.pk, future)
+
+        file.refresh_from_db()
+        self.assertEqual(file.variants['thumbnail'], get_variant_name(file.file.name, file.pk, 'thumbnail'))
+        self.assertEqual(received, [file.pk])
+
+
+class FileDeduplicationTest(MediaTestCase):
+
+    def test_same_content_is_stored_once(self):
+        first = self.upload(name='notes.txt')
+        second = self.upload(name='copy.TXT')
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual(second.status_code, 200, second.content)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+
+        file = File.objects.get()
+        self.assertEqual(file.checksum, CHECKSUM)
+        self.assertEqual(file.file.name, f'{CHECKSUM[:2]}/{CHECKSUM[2:4]}/{CHECKSUM}.txt')
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, file.file.name)))
+
+    def test_upload_is_hashed_while_received(self):
+        with mock.patch.object(FileService, 'get_checksum') as get_checksum:
+            self.upload()
+        get_checksum.assert_not_called()
+        self.assertEqual(File.objects.get().checksum, CHECKSUM)
+
+    def test_other_content_is_another_file(self):
+        self.upload()
+        self.assertEqual(self.upload(b'other content').status_code, 201)
+        self.assertEqual(File.objects.count(), 2)
+
+    def test_create_file(self):
+        file, created = FileService.create_file(ContentFile(b'content', name='notes.txt'))
+        self.assertTrue(created)
+        self.assertEqual(FileService.create_file(ContentFile(b'content', name='other.txt')), (file, False))
+
+    def test_blob_of_deleted_row_is_reused(self):
+        file, _ = FileService.create_file(ContentFile(b'content', name='notes.txt'))
+        name = file.file.name
+        File.objects.filter(pk=file.pk).delete()
+
+        file, created = FileService.create_file(ContentFile(b'content', name='notes.txt'))
+        self.assertTrue(created)
+        self.assertEqual(file.file.name, name)
+        self.assertEqual(os.listdir(os.path.dirname(os.path.join(self.media_root, name))), [f'{CHECKSUM}.txt'])
+
+
+class DroppedStream(io.BytesIO):
+    """
+    Stream of a connection dropped after its content was read
+    """
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        if not chunk:
+            raise OSError('Connection reset')
+        return chunk
+
+
+class UploadSessionTest(MediaTestCase):
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        super().setUp()
+        self.session = UploadSessionService.create_session(
+            'notes.txt', len(self.content), hashlib.sha256(self.content).hexdigest()
+        )
+
+    def append(self, start, end, stream_class=io.BytesIO):
+        return UploadSessionService.append_chunk(self.session.pk, stream_class(self.content[start:end]), start)
+
+    def test_upload_in_chunks(self):
+        self.assertEqual(self.append(0, 40).offset, 40)
+        self.assertEqual(self.append(40, 100).offset, 100)
+        session, is_valid = UploadSessionService.finalize(self.session.pk)
+
+        self.assertTrue(is_valid)
+        self.assertEqual(session.status, UploadStatus.COMPLETED)
+        with session.file.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'uploads')), [])
+
+    def test_chunk_at_other_offset(self):
+        self.append(0, 40)
+        for start in (0, 50):
+            with self.subTest(start=start), self.assertRaises(UploadOffsetMismatch):
+                UploadSessionService.append_chunk(self.session.pk, io.BytesIO(self.content[start:]), start)
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).offset, 40)
+
+    def test_dropped_connection_keeps_received_bytes(self):
+        self.assertEqual(self.append(0, 30, DroppedStream).offset, 30)
+        self.assertEqual(self.append(30, 100).offset, 100)
+        self.assertTrue(UploadSessionService.finalize(self.session.pk)[1])
+
+    def test_chunk_larger_than_upload(self):
+        with self.assertRaises(ValidationError):
+            UploadSessionService.append_chunk(self.session.pk, io.BytesIO(self.content + b'more'), 0)
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).offset, 0)
+
+    def test_finalize_incomplete_upload(self):
+        self.append(0, 40)
+        with self.assertRaises(ValidationError):
+            UploadSessionService.finalize(self.session.pk)
+
+    def test_finalize_other_content(self):
+        UploadSessionService.append_chunk(self.session.pk, io.BytesIO(self.content[::-1]), 0)
+        session, is_valid = UploadSessionService.finalize(self.session.pk)
+        self.assertFalse(is_valid)
+        self.assertEqual(session.offset, 0)
+        self.assertIsNone(session.file)
+
+    def test_stored_content_is_not_uploaded(self):
+        file, _ = FileService.create_file(ContentFile(self.content, name='notes.txt'))
+        session = UploadSessionService.create_session('copy.txt', len(self.content), file.checksum)
+        self.assertEqual(session.status, UploadStatus.COMPLETED)
+        self.assertEqual(session.file, file)
+
+    def test_api(self):
+        url = f'/api/v1/file/uploads/{self.session.pk}/'
+        response = self.client.put(
+            url, self.content[:40], content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes 0-39/100'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['offset'], 40)
+
+        response = self.client.put(
+            url, self.content[:40], content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes 0-39/100'
+        )
+        self.assertEqual(response.status_code, 409, response.content)
+        response = self.client.put(
+            url, self.content[40:], content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes 40-99/100'
+        )
+        self.assertEqual(response.json()['offset'], 100)
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['status'], UploadStatus.COMPLETED)
+
+
+class ServeMediaTest(MediaTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        self.hashed_name = self.write(f'{CHECKSUM[:2]}/{CHECKSUM[2:4]}/{CHECKSUM}.txt', self.content)
+        self.write('20240101/notes.txt', self.content)
+        self.write('uploads/secret.part', self.content)
+
+    def get(self, name, **headers):
+        response = self.client.get(f'/media/{name}', **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.get(self.hashed_name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read(response), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{CHECKSUM}"')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_name_without_hash_is_not_immutable(self):
+        response = self.get('20240101/notes.txt')
+        self.assertEqual(
+            response['Cache-Control'], f"public, max-age={int(settings.FILE_SETTINGS['MEDIA_MAX_AGE'])}"
+        )
+
+    def test_range(self):
+        response = self.get(self.hashed_name, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.read(response), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        response = self.get(self.hashed_name, HTTP_RANGE='bytes=-3')
+        self.assertEqual(self.read(response), b'789')
+        response = self.get(self.hashed_name, HTTP_RANGE='bytes=8-')
+        self.assertEqual(self.read(response), b'89')
+
+    def test_range_not_satisfiable(self):
+        response = self.get(self.hashed_name, HTTP_RANGE='bytes=10-20')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_range_of_changed_file(self):
+        response = self.get(self.hashed_name, HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read(response), self.content)
+
+    def test_not_modified(self):
+        etag = self.get(self.hashed_name)['ETag']
+        response = self.get(self.hashed_name, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_offload(self):
+        file_settings = dict(settings.FILE_SETTINGS, MEDIA_OFFLOAD='x-accel-redirect')
+        name = self.write('20240101/my photo.jpg', self.content)
+        with override_settings(FILE_SETTINGS=file_settings):
+            response = self.get(name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'], settings.FILE_SETTINGS['MEDIA_ACCEL_PREFIX'] + '20240101/my%20photo.jpg'
+        )
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('Content-Type', response)
+
+    def test_private_and_missing_files(self):
+        for name in ('uploads/secret.part', './uploads/secret.part', '20240101/../uploads/secret.part',
+                     '../secret.part', '20240101', '20240101/missing.txt'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    def test_only_safe_methods(self):
+        self.assertEqual(self.client.head(f'/media/{self.hashed_name}').status_code, 200)
+        self.assertEqual(self.client.post(f'/media/{self.hashed_name}').status_code, 405)
+
+
+class OrphanFileCollectorTest(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.collector = OrphanFileCollector(grace_period=timedelta(hours=1), batch_size=2)
+
+    def create_file(self, content=b'content', age=timedelta(days=1)) -> File:
+        file, _ = FileService.create_file(ContentFile(content, name='photo.jpg'))
+        file.variants = {'thumbnail': self.write(get_variant_name(file.file.name, file.pk, 'thumbnail'), b'thumb')}
+        file.save()
+        File.objects.filter(pk=file.pk).update(modified_at=timezone.now() - age)
+        # the name reserved by the upload expires with the grace period as well
+        cache.delete(OrphanFileCollector._get_blob_key(file.file.name))
+        return file
+
+    def exists(self, name) -> bool:
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_orphans_are_deleted_with_their_blobs(self):
+        files = [self.create_file(f'content {index}'.encode()) for index in range(3)]
+        self.assertEqual(self.collector.collect(), CollectionResult(files=3, blobs=6, bytes=3 * 9 + 3 * 5))
+        self.assertFalse(File.objects.exists())
+        for file in files:
+            self.assertFalse(self.exists(file.file.name))
+            self.assertFalse(self.exists(file.variants['thumbnail']))
+
+    def test_dry_run(self):
+        file = self.create_file()
+        self.assertEqual(self.collector.collect(dry_run=True).files, 1)
+        self.assertTrue(File.objects.filter(pk=file.pk).exists())
+        self.assertTrue(self.exists(file.file.name))
+
+    def test_recent_files_are_kept(self):
+        file = self.create_file(age=timedelta(minutes=10))
+        self.assertEqual(self.collector.collect().files, 0)
+        self.assertTrue(File.objects.filter(pk=file.pk).exists())
+
+    def test_attached_files_are_kept(self):
+        image, cover = self.create_file(b'image'), self.create_file(b'cover')
+        field = create_field(create_owner())
+        FootballFieldService.set_images(field, [image])
+        FootballFieldService.set_cover_image(field, cover)
+        # the upload session only records what the upload became
+        session = UploadSessionService.create_session('photo.jpg', 7, hashlib.sha256(b'content').hexdigest())
+        uploaded = self.create_file()
+        UploadSession.objects.filter(pk=session.pk).update(file=uploaded)
+
+        self.assertEqual(self.collector.collect().files, 1)
+        self.assertEqual(set(File.objects.values_list('pk', flat=True)), {image.pk, cover.pk})
+
+    def test_uploaded_again_is_kept(self):
+        file = self.create_file()
+        # the same content is uploaded while the file is about to be collected
+        self.assertEqual(FileService.create_file(ContentFile(b'content', name='photo.jpg')), (file, False))
+        self.assertEqual(self.collector.collect().files, 0)
+        self.assertTrue(self.exists(file.file.name))
+
+    def test_reserved_blob_is_kept(self):
+        file = self.create_file()
+        # an upload of the same content reserved the name after the row was read by the collector
+        OrphanFileCollector.reserve_blob(file.file.name)
+        result = self.collector.collect()
+        self.assertEqual((result.files, result.blobs), (1, 1))
+        self.assertTrue(self.exists(file.file.name))
+        self.assertFalse(self.exists(file.variants['thumbnail']))
+
+    def test_shared_blob_is_kept(self):
+        file = self.create_file()
+        # stored before the names were content addressed
+        File.objects.create(file=file.file.name)
+        self.assertEqual(self.collector.collect().files, 1)
+        self.assertTrue(self.exists(file.file.name))
+
+
+class FileMetadataTest(MediaTestCase):
+
+    def test_image(self):
+        result = process_file(self.media_root, self.write('photo.jpg', make_image()), 1, variants=False)
+        self.assertEqual(result['mime_type'], 'image/jpeg')
+        self.assertEqual((result['width'], result['height']), (2000, 1000))
+        self.assertEqual(result['size'], os.path.getsize(os.path.join(self.media_root, 'photo.jpg')))
+        self.assertTrue(result['placeholder'].startswith('data:image/webp;base64,'))
+        self.assertNotIn('variants', result)
+
+    def test_orientation_is_applied(self):
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        # rotated by 90 degrees
+        exif[0x0112] = 6
+        Image.new('RGB', (200, 100)).save(buffer, 'JPEG', exif=exif)
+        result = process_file(self.media_root, self.write('photo.jpg', buffer.getvalue()), 1)
+        self.assertEqual((result['width'], result['height']), (100, 200))
+
+    def test_other_file(self):
+        result = process_file(self.media_root, self.write('notes.txt', b'content'), 1)
+        self.assertEqual(result, {
+            'size': 7, 'mime_type': 'text/plain', 'width': None, 'height': None, 'placeholder': '',
+        })
+
+    def test_metadata_is_read_only(self):
+        response = self.client.post(
+            '/api/v1/file/', {'file': SimpleUploadedFile('notes.txt', b'content'), 'width': 5, 'size': 1}
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        file = File.objects.get()
+        self.assertEqual((file.width, file.size), (None, None))
+
+    def test_backfill(self):
+        image = File.objects.create(file=self.write('20240101/photo.jpg', make_image()))
+        # the header is read, the pixels are not
+        broken = File.objects.create(file=self.write('20240101/broken.jpg', make_image()[:300]))
+        File.objects.create(file='20240101/missing.jpg')
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('backfill_file_metadata', workers=1, stdout=stdout, stderr=stderr)
+        self.assertIn('2 files processed, 1 of them without the image metadata, 1 files missing', stdout.getvalue())
+
+        image.refresh_from_db()
+        self.assertEqual((image.mime_type, image.width), ('image/jpeg', 2000))
+        broken.refresh_from_db()
+        self.assertEqual((broken.mime_type, broken.size, broken.width), ('image/jpeg', 300, None))
@@ -0,0 +1,28 @@
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class ChecksumUploadHandler(FileUploadHandler):
+    """
+    Hashes the uploaded files while they are received.
+    Has to be placed before the handlers storing the files, the data is passed on unchanged.
+    The hex digests are kept in `checksums` by field name.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.checksums = {}
+        self._hash = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.checksums[self.field_name] = self._hash.hexdigest()
+        return None
@@ -2,6 +2,13 @@ import os
 
 
 def get_upload_path(instance, filename):
+    if instance.checksum:
+        # content addressed: the same content is always stored under the same name,
+        # sharded by the first bytes of the hash to keep the directories small
+        _, extension = os.path.splitext(filename)
+        checksum = instance.checksum
+        return os.path.join(checksum[:2], checksum[2:4], f'{checksum}{extension.lower()}')
+
     # Create the upload path using the current date
     upload_path = os.path.join(instance.created_at.strftime("%Y%m%d"), filename)
     return upload_path
@@ -1,19 +1,67 @@
 from django.conf import settings
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from file.models import File
+from file.models import File, UploadSession
 
 
 class FileSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = File
         fields = (
             'id',
             'file',
-            'url'
+            'url',
+            'thumbnail',
+            'srcset',
+            'size',
+            'mime_type',
+            'width',
+            'height',
+            'placeholder',
         )
+        # collected from the content, see file.services.ImagePipeline
+        read_only_fields = ('size', 'mime_type', 'width', 'height', 'placeholder')
 
     def get_url(self, obj):
         return f"{settings.API_HOST}{obj.file.url}"
+
+    def get_thumbnail(self, obj):
+        return f"{settings.API_HOST}{obj.file.storage.url(obj.thumbnail_name)}"
+
+    def get_srcset(self, obj):
+        return {
+            variant: f"{settings.API_HOST}{obj.file.storage.url(name)}"
+            for variant, name in obj.variants.items()
+        }
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    checksum = serializers.RegexField(r'^[0-9a-f]{64}$', help_text=_('SHA-256 of the whole file, hex encoded.'))
+    file = FileSerializer(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = (
+            'id',
+            'filename',
+            'size',
+            'checksum',
+            'offset',
+            'status',
+            'file',
+            'created_at',
+        )
+        read_only_fields = ('offset', 'status')
+
+    def validate_size(self, value):
+        max_size = int(settings.FILE_SETTINGS['UPLOAD_MAX_SIZE'])
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(
+                _("Size must be between 1 and %(max_size)s bytes") % {'max_size': max_size}
+            )
+        return value
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from file.v1.views import FileViewSet
+from file.v1.views import FileViewSet, UploadSessionViewSet
 
 router = routers.SimpleRouter()
+router.register('uploads', UploadSessionViewSet, 'upload')
 router.register('', FileViewSet, 'file')
 app_name = 'file'
 
@@ -1,11 +1,96 @@
+import re
+
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status, mixins
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from file.models import File, UploadSession
+from file.services import ImagePipeline, FileService, UploadSessionService
+from file.upload_handlers import ChecksumUploadHandler
+from file.v1.serializers import FileSerializer, UploadSessionSerializer
 
-from file.models import File
-from file.v1.serializers import FileSerializer
+CONTENT_RANGE_RE = re.compile(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+)$')
 
 
-class FileViewSet(ModelViewSet):
+class FileViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Uploaded files are deduplicated by content,
+    clients can look up a file by its SHA-256 (`?checksum=`) before uploading it.
+    Files are immutable, another content is another file, so they are not updated.
+    """
     permission_classes = (AllowAny, )
     serializer_class = FileSerializer
     queryset = File.objects.all()
+    filterset_fields = ('checksum',)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action == 'create':
+            # hash the upload while it is received, before the body is parsed
+            self.checksum_handler = ChecksumUploadHandler(request)
+            request.upload_handlers.insert(0, self.checksum_handler)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        content = serializer.validated_data['file']
+        file, created = FileService.create_file(
+            content, checksum=self.checksum_handler.checksums.get('file')
+        )
+        if created:
+            transaction.on_commit(lambda: ImagePipeline.submit(file))
+
+        return Response(
+            self.get_serializer(file).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Resumable uploads for large files and unreliable connections.
+
+    - `POST /uploads/` with filename, size and checksum creates the session,
+      a file with the same checksum is returned at once as a completed session
+    - `PUT /uploads/{id}/` sends a chunk as the raw body with `Content-Range: bytes {start}-{end}/{size}`,
+      `start` must be the current offset of the session
+    - `GET /uploads/{id}/` returns the offset to continue from after a dropped connection
+    - `POST /uploads/{id}/finalize/` verifies the checksum and stores the file
+    """
+    permission_classes = (AllowAny, )
+    serializer_class = UploadSessionSerializer
+    queryset = UploadSession.objects.select_related('file')
+
+    def perform_create(self, serializer):
+        serializer.instance = UploadSessionService.create_session(**serializer.validated_data)
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            raise ValidationError(_("Content-Range header is required, e.g. 'bytes 0-1048575/4194304'"))
+        if int(match['total']) != session.size:
+            raise ValidationError(_("Content-Range size does not match the upload size"))
+        if request.stream is None:
+            # no body was sent
+            raise ValidationError(_("Chunk is empty"))
+
+        session = UploadSessionService.append_chunk(session.pk, request.stream, int(match['start']))
+        return Response(self.get_serializer(session).data)
+
+    @action(methods=['post'], detail=True)
+    def finalize(self, request, *args, **kwargs):
+        session, is_valid = UploadSessionService.finalize(self.get_object().pk)
+        if not is_valid:
+            return Response(
+                {'detail': _("Checksum does not match, the upload has to be sent again"),
+                 **self.get_serializer(session).data},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(self.get_serializer(session).data)
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from notifications.models import SMSMessage
+from notifications.providers import redact
+
+
+@admin.register(SMSMessage)
+class SMSMessageAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the sms outbox.
+    """
+    list_display = ('id', 'phone_number', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('phone_number',)
+    exclude = ('body',)
+    readonly_fields = ('redacted_body', 'last_error')
+    list_per_page = 25
+
+    @admin.display(description='body')
+    def redacted_body(self, obj):
+        return redact(obj.body)
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.services import SMSDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Send the queued sms messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send the queued messages and exit')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        dispatcher = SMSDispatcher()
+        while True:
+            count = dispatcher.dispatch()
+            if count:
+                self.stdout.write(f'{count} messages dispatched')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
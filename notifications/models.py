@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+from base.models import BaseModel
+from utils.constants import SMSStatus
+
+
+class SMSMessage(BaseModel):
+    """
+    Outbox of the sms messages.
+
+    Messages are written in the same transaction as the data they belong to
+    and sent later by the `dispatch_sms` command, see `notifications.services.SMSDispatcher`.
+    The body is cleared once the message is sent or given up, it may contain a confirmation code.
+    """
+    phone_number = models.CharField(max_length=17)
+    body = models.TextField(blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=SMSStatus.CHOICES,
+        default=SMSStatus.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="The message is not sent before this time."
+    )
+    expires_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="The message is not sent after this time."
+    )
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('status', 'next_attempt_at')),
+        ]
+
+    def __str__(self):
+        return f'{self.phone_number} ({self.status})'
@@ -0,0 +1,49 @@
+import logging
+import re
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# confirmation codes and other numbers long enough to be secrets
+SECRET_PATTERN = re.compile(r'\d{4,}')
+
+
+def redact(body: str) -> str:
+    return SECRET_PATTERN.sub(lambda match: '*' * len(match.group()), body)
+
+
+class BaseSMSProvider(ABC):
+    """Abstract base class for sms gateways"""
+
+    @abstractmethod
+    def send(self, to: str, body: str, timeout: float) -> None:
+        """
+        Send the message, raise an exception if it was not sent.
+        Give up after `timeout` seconds, the message may be sent again by another dispatcher after that.
+        """
+        pass
+
+
+class LogSMSProvider(BaseSMSProvider):
+    """
+    Stand-in provider for development and tests,
+    writes the messages to the log with the codes redacted and to `SMS_SETTINGS['LOG_FILE']` if it is set.
+    The file is meant for development only, it keeps the codes.
+    """
+
+    def __init__(self, log_file: str = None):
+        self.log_file = log_file or settings.SMS_SETTINGS['LOG_FILE']
+
+    def send(self, to: str, body: str, timeout: float) -> None:
+        logger.info('sms to %s: %s', to, redact(body))
+        if self.log_file:
+            with open(self.log_file, 'a') as f:
+                f.write(f'{timezone.now().isoformat()}\t{to}\t{body}\n')
+
+
+def get_sms_provider() -> BaseSMSProvider:
+    return import_string(settings.SMS_SETTINGS['PROVIDER'])()
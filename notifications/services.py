@@ -0,0 +1,160 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notifications.models import SMSMessage
+from notifications.providers import BaseSMSProvider, get_sms_provider
+from utils.constants import SMSStatus
+
+# returned by `SMSDispatcher._send` for the messages there was no time left to send
+NOT_SENT = object()
+
+
+class SMSDispatcher:
+    """
+    Sends the queued sms messages in batches.
+
+    A batch is claimed by moving it to `SENDING` with a lease, so several dispatchers can run at once
+    and messages of a crashed dispatcher are picked up again when the lease is over.
+    Failed messages are retried with an exponential backoff until `max_attempts` is reached.
+
+    Every send is bound by `send_timeout` and is not started unless it ends before the lease,
+    so a message is not claimed and sent again by another dispatcher while it is being sent.
+    A provider still sending when the lease ends may deliver the message later, it is marked `UNKNOWN`
+    and not retried, so it is not sent twice.
+    """
+
+    def __init__(
+            self,
+            provider: BaseSMSProvider = None,
+            batch_size: int = None,
+            concurrency: int = None,
+            max_attempts: int = None,
+            retry_delay: int = None,
+            lease_time: int = None,
+            send_timeout: int = None,
+    ):
+        sms_settings = settings.SMS_SETTINGS
+        self.provider = provider or get_sms_provider()
+        self.batch_size = batch_size if batch_size is not None else int(sms_settings['BATCH_SIZE'])
+        self.concurrency = concurrency if concurrency is not None else int(sms_settings['CONCURRENCY'])
+        self.max_attempts = max_attempts if max_attempts is not None else int(sms_settings['MAX_ATTEMPTS'])
+        self.retry_delay = retry_delay if retry_delay is not None else int(sms_settings['RETRY_DELAY'])
+        self.lease_time = lease_time if lease_time is not None else int(sms_settings['LEASE_TIME'])
+        self.send_timeout = send_timeout if send_timeout is not None else int(sms_settings['SEND_TIMEOUT'])
+        if self.send_timeout >= self.lease_time:
+            raise ImproperlyConfigured('The sms send timeout must be shorter than the lease time')
+
+    def dispatch(self) -> int:
+        """
+        Send one batch, returns the number of claimed messages
+        """
+        lease_end = time.monotonic() + self.lease_time
+        messages = self._claim_batch()
+        if not messages:
+            return 0
+
+        # only the provider calls run in the pool, the database is updated from this thread
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        futures = [executor.submit(self._send, message, lease_end) for message in messages]
+        # providers ignoring the timeout are not waited for beyond the lease
+        wait(futures, timeout=max(lease_end - time.monotonic(), 0))
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        for message, future in zip(messages, futures):
+            if future.cancelled():
+                self._release(message)
+            elif not future.done():
+                self._mark_unknown(message)
+            elif future.result() is NOT_SENT:
+                self._release(message)
+            elif future.result() is None:
+                self._mark_sent(message)
+            else:
+                self._mark_failed(message, future.result())
+        return len(messages)
+
+    @transaction.atomic
+    def _claim_batch(self) -> List[SMSMessage]:
+        now = timezone.now()
+        self._expire_messages(now)
+
+        messages = list(
+            SMSMessage.objects.select_for_update(skip_locked=True).filter(
+                status__in=[SMSStatus.PENDING, SMSStatus.SENDING],
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at')[:self.batch_size]
+        )
+        SMSMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            status=SMSStatus.SENDING,
+            next_attempt_at=now + timedelta(seconds=self.lease_time),
+            modified_at=now,
+        )
+        return messages
+
+    def _send(self, message: SMSMessage, lease_end: float) -> Optional[str]:
+        if time.monotonic() + self.send_timeout > lease_end:
+            return NOT_SENT
+        try:
+            self.provider.send(to=message.phone_number, body=message.body, timeout=self.send_timeout)
+        except Exception as e:
+            return str(e) or e.__class__.__name__
+        return None
+
+    def _mark_sent(self, message: SMSMessage):
+        now = timezone.now()
+        SMSMessage.objects.filter(id=message.id).update(
+            status=SMSStatus.SENT, sent_at=now, body='',
+            attempts=message.attempts + 1, modified_at=now,
+        )
+
+    def _release(self, message: SMSMessage):
+        """
+        Not sent within the lease, the message is claimed again without counting an attempt
+        """
+        now = timezone.now()
+        SMSMessage.objects.filter(id=message.id).update(
+            status=SMSStatus.PENDING, next_attempt_at=now, modified_at=now,
+        )
+
+    def _mark_unknown(self, message: SMSMessage):
+        """
+        The provider call is still running and may send the message after all
+        """
+        now = timezone.now()
+        SMSMessage.objects.filter(id=message.id).update(
+            status=SMSStatus.UNKNOWN, body='', attempts=message.attempts + 1,
+            last_error='No answer from the provider within the lease', modified_at=now,
+        )
+
+    def _mark_failed(self, message: SMSMessage, error: str):
+        now = timezone.now()
+        attempts = message.attempts + 1
+        if attempts >= self.max_attempts:
+            SMSMessage.objects.filter(id=message.id).update(
+                status=SMSStatus.FAILED, body='', attempts=attempts,
+                last_error=error, modified_at=now,
+            )
+            return
+
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        SMSMessage.objects.filter(id=message.id).update(
+            status=SMSStatus.PENDING, attempts=attempts, last_error=error,
+            next_attempt_at=now + timedelta(seconds=delay), modified_at=now,
+        )
+
+    @staticmethod
+    def _expire_messages(now):
+        """
+        Messages which can not be used anymore, e.g. expired confirmation codes, are not sent
+        """
+        SMSMessage.objects.filter(
+            Q(status__in=[SMSStatus.PENDING, SMSStatus.SENDING]) & Q(expires_at__lte=now)
+        ).update(status=SMSStatus.EXPIRED, body='', modified_at=now)
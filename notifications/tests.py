@@ -0,0 +1,140 @@
+import threading
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from notifications.models import SMSMessage
+from notifications.providers import BaseSMSProvider, redact
+from notifications.services import SMSDispatcher
+from utils.constants import SMSStatus
+
+
+class RecordingProvider(BaseSMSProvider):
+    def __init__(self, error: Exception = None):
+        self.sent = []
+        self.error = error
+
+    def send(self, to: str, body: str, timeout: float) -> None:
+        if self.error:
+            raise self.error
+        self.sent.append((to, body))
+
+
+class BlockingProvider(BaseSMSProvider):
+    """Ignores the timeout and answers only when released"""
+
+    def __init__(self):
+        self.released = threading.Event()
+
+    def send(self, to: str, body: str, timeout: float) -> None:
+        self.released.wait(5)
+
+
+def create_message(**kwargs) -> SMSMessage:
+    kwargs.setdefault('phone_number', '+998901234567')
+    kwargs.setdefault('body', 'Your code 123456')
+    return SMSMessage.objects.create(**kwargs)
+
+
+class SMSDispatcherTest(TestCase):
+    def dispatcher(self, provider, **kwargs) -> SMSDispatcher:
+        kwargs = dict(dict(batch_size=10, concurrency=2, max_attempts=3, retry_delay=10,
+                           lease_time=60, send_timeout=10), **kwargs)
+        return SMSDispatcher(provider=provider, **kwargs)
+
+    def test_sent(self):
+        provider = RecordingProvider()
+        message = create_message()
+
+        self.assertEqual(self.dispatcher(provider).dispatch(), 1)
+
+        message.refresh_from_db()
+        self.assertEqual(provider.sent, [('+998901234567', 'Your code 123456')])
+        self.assertEqual(message.status, SMSStatus.SENT)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.body, '')
+        self.assertIsNotNone(message.sent_at)
+
+    def test_claim_leases_the_batch(self):
+        messages = [create_message() for _ in range(3)]
+        later = create_message(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        dispatcher = self.dispatcher(RecordingProvider(), batch_size=2)
+
+        before = timezone.now()
+        claimed = dispatcher._claim_batch()
+
+        self.assertEqual([message.id for message in claimed], [message.id for message in messages[:2]])
+        for message in claimed:
+            message.refresh_from_db()
+            self.assertEqual(message.status, SMSStatus.SENDING)
+            self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=60))
+        # leased messages are not claimed again, the rest of the queue is
+        self.assertEqual([message.id for message in dispatcher._claim_batch()], [messages[2].id])
+        self.assertEqual(dispatcher._claim_batch(), [])
+        later.refresh_from_db()
+        self.assertEqual(later.status, SMSStatus.PENDING)
+
+    def test_expired_lease_is_claimed_again(self):
+        message = create_message(status=SMSStatus.SENDING, next_attempt_at=timezone.now() - timedelta(seconds=1))
+        provider = RecordingProvider()
+
+        self.assertEqual(self.dispatcher(provider).dispatch(), 1)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSStatus.SENT)
+        self.assertEqual(len(provider.sent), 1)
+
+    def test_retry_backoff(self):
+        message = create_message()
+        dispatcher = self.dispatcher(RecordingProvider(error=ConnectionError('refused')))
+
+        for attempts in (1, 2):
+            before = timezone.now()
+            self.assertEqual(dispatcher.dispatch(), 1)
+            message.refresh_from_db()
+            self.assertEqual(message.status, SMSStatus.PENDING)
+            self.assertEqual(message.attempts, attempts)
+            self.assertEqual(message.last_error, 'refused')
+            self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=10 * 2 ** (attempts - 1)))
+            self.assertLess(message.next_attempt_at, timezone.now() + timedelta(seconds=10 * 2 ** (attempts - 1)))
+            # not retried before the delay
+            self.assertEqual(dispatcher.dispatch(), 0)
+            SMSMessage.objects.filter(id=message.id).update(next_attempt_at=timezone.now())
+
+        self.assertEqual(dispatcher.dispatch(), 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSStatus.FAILED)
+        self.assertEqual(message.attempts, 3)
+        self.assertEqual(message.body, '')
+
+    def test_expired_messages_are_not_sent(self):
+        message = create_message(expires_at=timezone.now() - timedelta(seconds=1))
+        provider = RecordingProvider()
+
+        self.assertEqual(self.dispatcher(provider).dispatch(), 0)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSStatus.EXPIRED)
+        self.assertEqual(message.body, '')
+        self.assertEqual(provider.sent, [])
+
+    def test_no_answer_within_the_lease_is_not_retried(self):
+        message = create_message()
+        provider = BlockingProvider()
+        self.addCleanup(provider.released.set)
+
+        self.assertEqual(self.dispatcher(provider, lease_time=1, send_timeout=0).dispatch(), 1)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSStatus.UNKNOWN)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.body, '')
+        # the provider may still send it, another dispatch must not send it again
+        self.assertEqual(self.dispatcher(RecordingProvider()).dispatch(), 0)
+
+
+class RedactTest(TestCase):
+    def test_redact(self):
+        self.assertEqual(redact('Your code 123456'), 'Your code ******')
+        self.assertEqual(redact('Booking 12 at 18:00, code 4821'), 'Booking 12 at 18:00, code ****')
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.core.checks import Tags, register
+from django.db.models.signals import post_migrate, post_save, post_delete, m2m_changed
 
 
 class UserConfig(AppConfig):
@@ -7,6 +8,27 @@ class UserConfig(AppConfig):
     name = 'user'
 
     def ready(self):
-        from user.signals import create_groups_signal
+        from django.contrib.auth.models import Group
+        from user.checks import check_revocation_cache
+        from user.models import User
+        from user.signals import (
+            create_groups_signal,
+            clear_group_ids_cache_signal,
+            user_groups_changed_signal,
+            user_saved_signal,
+            user_deleted_signal,
+        )
         # Connect the signal to the function that creates groups
         post_migrate.connect(create_groups_signal, sender=self)
+
+        # keep the cached group ids in sync with the database
+        post_save.connect(clear_group_ids_cache_signal, sender=Group)
+        post_delete.connect(clear_group_ids_cache_signal, sender=Group)
+        m2m_changed.connect(user_groups_changed_signal, sender=User.groups.through)
+
+        # keep the cached users and the issued tokens in sync with the database
+        post_save.connect(user_saved_signal, sender=User)
+        post_delete.connect(user_deleted_signal, sender=User)
+
+        # `manage.py check --deploy` fails when the revoked user tokens are kept per process
+        register(check_revocation_cache, Tags.caches, deploy=True)
@@ -0,0 +1,129 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from user.revocation import is_user_token_revoked, revocation_list
+from user.tokens import USER_CLAIMS, get_token_issued_at
+
+
+class UserCache:
+    """
+    Bounded LRU of full user instances with a time to live.
+    Every caller gets its own copy, so changes made during a request do not leak into the cache.
+    """
+
+    def __init__(self, max_size: int, timeout: int):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry and entry[1] > time.monotonic():
+                self._users.move_to_end(user_id)
+                return copy.copy(entry[0])
+
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is not None:
+            self.set(user)
+            user = copy.copy(user)
+        return user
+
+    def set(self, user):
+        with self._lock:
+            self._users[user.pk] = (user, time.monotonic() + self.timeout)
+            self._users.move_to_end(user.pk)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(
+    max_size=int(settings.AUTH_SETTINGS['USER_CACHE_SIZE']),
+    timeout=int(settings.AUTH_SETTINGS['USER_CACHE_TIMEOUT']),
+)
+
+
+def _load_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    return user
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Lightweight user built from the token claims.
+
+    id, user_type, is_verified and is_active are answered from the token,
+    any other attribute loads the full user from the `user_cache`.
+    """
+
+    def __init__(self, user_id, claims: dict):
+        super().__init__(lambda: _load_user(user_id))
+        self.__dict__['_claims'] = dict(claims, id=user_id, pk=user_id)
+
+    def __getattr__(self, name):
+        claims = self.__dict__['_claims']
+        if name in claims:
+            return claims[name]
+        return super().__getattr__(name)
+
+    def __bool__(self):
+        return True
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication which does not query the database.
+
+    The user is built from the claims embedded by `UserClaimsRefreshToken`,
+    revoked tokens are rejected by the cache backed deny-list and the `revocation_list`.
+    Tokens issued without the claims fall back to loading the user.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if (
+                is_user_token_revoked(user_id, get_token_issued_at(validated_token))
+                or revocation_list.is_revoked(validated_token.get(api_settings.JTI_CLAIM))
+        ):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return ClaimsUser(user_id, {claim: validated_token[claim] for claim in USER_CLAIMS})
@@ -0,0 +1,18 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error
+
+
+def check_revocation_cache(app_configs, **kwargs):
+    """
+    The tokens of a user are revoked in the default cache, see `user.revocation.revoke_user_tokens`,
+    a revocation kept by one worker is not seen by the others
+    """
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return [Error(
+            'The default cache is not shared between the workers, revoked user tokens are accepted by the others.',
+            hint='Set REDIS_URL, or another cache shared by all the workers.',
+            id='user.E001',
+        )]
+    return []
@@ -0,0 +1,49 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from user.models import RevokedToken
+from user.revocation import is_user_token_revoked, revocation_list
+
+
+class Command(BaseCommand):
+    help = 'Measure the token revocation checks run on every authenticated request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revoked', type=int, default=10000, help='Revoked tokens in the table')
+        parser.add_argument('--requests', type=int, default=100000, help='Tokens checked')
+
+    def handle(self, *args, **options):
+        # the revoked tokens are rolled back, nothing is left in the table
+        with transaction.atomic():
+            expires_at = timezone.now() + timedelta(hours=1)
+            revoked = [uuid.uuid4().hex for _ in range(options['revoked'])]
+            RevokedToken.objects.bulk_create(
+                [RevokedToken(jti=jti, expires_at=expires_at) for jti in revoked], batch_size=1000
+            )
+            revocation_list.rebuild()
+
+            issued_at = time.time()
+            valid = [uuid.uuid4().hex for _ in range(options['requests'])]
+            self.report('user revocation', valid, lambda jti: is_user_token_revoked(0, issued_at))
+            self.report('deny-list, valid tokens', valid, revocation_list.is_revoked)
+            self.report('deny-list, revoked tokens', revoked[:1000], revocation_list.is_revoked)
+
+            transaction.set_rollback(True)
+        revocation_list.rebuild()
+
+    def report(self, name, jtis, check):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for jti in jtis:
+                check(jti)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name}: {elapsed / len(jtis) * 1e6:.2f} µs per request, '
+            f'{len(queries) / len(jtis):.4f} queries per request ({len(jtis)} requests)'
+        )
@@ -2,7 +2,10 @@ import uuid
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.base_user import BaseUserManager
-from django.db.models import QuerySet
+from django.db import IntegrityError, transaction
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
@@ -22,18 +25,23 @@ class BaseUserQuerySet(QuerySet):
 
 class UserManager(BaseUserManager):
     def _create_user(self, username, email=None, phone_number=None, password=None,
-                     user_type=None, auth_method=None, **extra_fields):
+                     user_type=None, auth_method=None, checker=None, **extra_fields):
+        """
+        :param checker: UserUniqueIdentifierChecker already used for the same identifiers, if any
+        """
         if not username:
             raise ValueError(_('The given username must be set'))
         if not auth_method:
             raise ValueError(_('Auth method must be set'))
 
-        checker = UserUniqueIdentifierChecker(email, username, auth_method=auth_method)
+        checker = checker or UserUniqueIdentifierChecker(email, phone_number, auth_method=auth_method)
         if not checker.is_unique_username():
             if not checker.is_verified:
                 raise UserNotVerified
             else:
-                raise UserAlreadyExists(_(f"User with username: {username} already exists"))
+                raise UserAlreadyExists(_("User with username: %(username)s already exists") % {'username': username})
+        if not checker.are_identifiers_unique():
+            raise ValidationError(_("User with this email or phone number already exists"))
 
         if email:
             email = self.normalize_email(email).lower()
@@ -48,20 +56,25 @@ class UserManager(BaseUserManager):
 
         user.is_active = extra_fields.get('is_active', True)
         user.is_verified = self._get_is_verified(user_type)
-        user.save(using=self._db)
+        try:
+            with transaction.atomic(using=self._db):
+                user.save(using=self._db)
+        except IntegrityError:
+            # registered by a concurrent request
+            raise ValidationError(_("User with this email or phone number already exists"))
 
         self._add_group(user, user_type)
         return user
 
     def create_user(self, username=None, email=None, phone_number=None, password=None,
-                    user_type=None, auth_method=None, **extra_fields):
+                    user_type=None, auth_method=None, checker=None, **extra_fields):
         if not username:
             username = self._determine_username(email, phone_number, auth_method)
 
         return self._create_user(
             username=username, email=email, phone_number=phone_number,
             password=password, user_type=user_type,
-            auth_method=auth_method, **extra_fields
+            auth_method=auth_method, checker=checker, **extra_fields
         )
 
     def _determine_username(self, email: str, phone_number: str, auth_method: str) -> str:
@@ -117,24 +130,68 @@ class UserManager(BaseUserManager):
 
 
 class UserUniqueIdentifierChecker:
+    """
+    Checks whether the identifiers of a user are taken.
+    Every lookup is run on first use only and then kept, so one instance can be shared
+    by the serializer and the manager during a request.
+
+    `user` is the active user the identifiers belong to. The uniqueness checks include the deactivated users,
+    they keep their identifiers and the unique indexes cover them as well.
+    """
+
     def __init__(self, email: str, phone_number: str,
                  user_type: str = None, auth_method: str = None):
         """
         :param user_type: CONSTANTS.UserType.CHOICES
         """
-        self.email = email
+        self.email = email.lower() if email else email
         self.phone_number = phone_number
         self.user_type = user_type
         self.auth_method = auth_method
         self.username = self._get_username()
-        self.user = get_user_model().objects.filter(username=self.username).first()
-        self.is_verified = self.user.is_verified if self.user else None
+
+    @cached_property
+    def user(self):
+        if not self.username:
+            return None
+        return get_user_model().objects.filter(username=self.username).first()
+
+    @cached_property
+    def is_verified(self):
+        return self.user.is_verified if self.user else None
+
+    @staticmethod
+    def _get_all_users():
+        return get_user_model().objects.with_deleted()
+
+    @cached_property
+    def _email_taken(self):
+        # backed by the unique index on lower(email)
+        return self._get_all_users().alias(
+            email_lower=Lower('email')
+        ).filter(email_lower=self.email).exists()
+
+    @cached_property
+    def _phone_taken(self):
+        return self._get_all_users().filter(phone_number=self.phone_number).exists()
+
+    @cached_property
+    def _identifiers_taken(self):
+        """
+        Username, email or phone number taken by any user, in a single query
+        """
+        lookups = Q(username=self.username)
+        if self.email:
+            lookups |= Q(email_lower=self.email)
+        if self.phone_number:
+            lookups |= Q(phone_number=self.phone_number)
+        return self._get_all_users().alias(email_lower=Lower('email')).filter(lookups).exists()
 
     def is_email_unique(self):
-        return not get_user_model().objects.filter(email=self.email).exists()
+        return not self._email_taken
 
     def is_phone_unique(self):
-        return not get_user_model().objects.filter(phone_number=self.phone_number).exists()
+        return not self._phone_taken
 
     def is_email_and_phone_unique(self):
         return self.is_email_unique() and self.is_phone_unique()
@@ -142,6 +199,9 @@ class UserUniqueIdentifierChecker:
     def is_unique_username(self):
         return not self.user
 
+    def are_identifiers_unique(self):
+        return not self._identifiers_taken
+
     def _get_username(self):
         if self.auth_method == AuthMethod.EMAIL:
             username = self.email
@@ -149,4 +209,5 @@ class UserUniqueIdentifierChecker:
             username = self.phone_number
         else:
             username = self.email or self.phone_number
-        return username
+        # usernames are stored in lower case, see `UserManager._create_user`
+        return username.lower() if username else username
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def delete_codes(apps, schema_editor):
+    # plain codes can not be hashed for the new lookup, they expire in minutes anyway
+    VerificationCode = apps.get_model('user', 'VerificationCode')
+    VerificationCode.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='verificationcode',
+            name='code',
+        ),
+        migrations.AddField(
+            model_name='verificationcode',
+            name='code_hash',
+            field=models.CharField(default='', max_length=128),
+            preserve_default=False,
+        ),
+        migrations.AddConstraint(
+            model_name='verificationcode',
+            constraint=models.UniqueConstraint(fields=('user', 'code_type'), name='unique_user_code_type'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:13
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+import django.db.models.functions.text
+
+
+def dedupe_emails_and_phone_numbers(apps, schema_editor):
+    """
+    Keeps every email and phone number on one user and clears it on the others, so the unique indexes can be built.
+    Active, verified and most recently logged in users keep them first.
+    """
+    User = apps.get_model('user', 'User')
+    # the default manager leaves out the deactivated users
+    users = User._base_manager.using(schema_editor.connection.alias)
+    users.filter(email='').update(email=None)
+    users.filter(phone_number='').update(phone_number=None)
+
+    ordering = ('-is_active', '-is_verified', F('last_login').desc(nulls_last=True), '-date_joined', 'id')
+    for field, key in (('email', Lower('email')), ('phone_number', F('phone_number'))):
+        users_by_key = users.filter(**{f'{field}__isnull': False}).annotate(key=key)
+        duplicates = users_by_key.values('key').annotate(count=Count('id')).filter(count__gt=1).values_list(
+            'key', flat=True
+        )
+        for value in duplicates:
+            ids = list(users_by_key.filter(key=value).order_by(*ordering).values_list('id', flat=True))
+            users.filter(id__in=ids[1:]).update(**{field: None})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_hash_verification_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_emails_and_phone_numbers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email__isnull', False)), name='unique_user_email_lower'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(condition=models.Q(('phone_number__isnull', False)), fields=('phone_number',), name='unique_user_phone_number'),
+        ),
+    ]
@@ -1,16 +1,20 @@
-import random
+import secrets
 from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.utils import timezone
+from django.utils.crypto import salted_hmac, constant_time_compare
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
 from base.models import BaseModel
 from user.managers import UserManager
+from user.tokens import USER_CLAIMS, UserClaimsRefreshToken, get_user_claims
 from utils.constants import (
     Languages,
     UserTypes,
@@ -116,17 +120,37 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = _("user")
         verbose_name_plural = _("users")
+        constraints = [
+            # emails are stored and looked up in lower case, see `UserUniqueIdentifierChecker`
+            models.UniqueConstraint(
+                Lower('email'),
+                condition=Q(email__isnull=False),
+                name='unique_user_email_lower',
+            ),
+            models.UniqueConstraint(
+                fields=('phone_number',),
+                condition=Q(phone_number__isnull=False),
+                name='unique_user_phone_number',
+            ),
+        ]
 
     def __str__(self):
         return self.full_name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the token claims as loaded, to detect changes on save
+        if all(claim in field_names for claim in USER_CLAIMS):
+            instance._loaded_claims = get_user_claims(instance)
+        return instance
+
     def verify(self):
         self.is_verified = True
         self.save(update_fields=['is_verified'])
 
     def get_pair_token(self):
-        from rest_framework_simplejwt.tokens import RefreshToken
-        refresh = RefreshToken.for_user(self)
+        refresh = UserClaimsRefreshToken.for_user(self)
         return {
             'refresh': str(refresh),
             'access': str(refresh.access_token)
@@ -148,14 +172,22 @@ class VerificationCode(BaseModel):
     1. User initiates an action requiring verification and receives a verification code.
     2. User submits the verification code to the backend for validation.
     3. Upon successful verification, user is verified
+
+    A user has at most one code per code type, resending replaces it.
+    Only a hash of the code is stored, every step is a single lookup by (user, code_type).
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    code = models.IntegerField()  # number which will be sent to the user
+    code_hash = models.CharField(max_length=128)  # hash of the number which is sent to the user
     code_type = models.CharField(
         max_length=20, choices=CodeType.CHOICES,
     )
     expires_at = models.DateTimeField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'code_type'), name='unique_user_code_type'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.expires_at:
             self.expires_at = timezone.now() + timedelta(
@@ -163,28 +195,49 @@ class VerificationCode(BaseModel):
             )
         super().save(*args, **kwargs)
 
-    @classmethod
-    def create_code(cls, user: User, code_type: str):
-        code = cls.generate_code()
-        cls.objects.create(
-            user=user, code=code,
-            code_type=code_type
-        )
-        return code
-
     @classmethod
     def generate_code(cls):
         length = int(settings.OTP_SETTINGS['OTP_LENGTH'])
-        return random.randint(10 ** (length - 1), 10 ** length - 1)
+        return 10 ** (length - 1) + secrets.randbelow(9 * 10 ** (length - 1))
 
     @classmethod
-    def send_code(cls, user: User, code_type: str):
-        from utils.services import send_confirmation_sms
+    def hash_code(cls, user: User, code_type: str, code: int) -> str:
+        return salted_hmac(
+            'user.VerificationCode', f'{user.pk}:{code_type}:{code}', algorithm='sha256'
+        ).hexdigest()
 
-        if cls.already_sent_code(user, code_type):
+    @classmethod
+    @transaction.atomic
+    def create_code(cls, user: User, code_type: str):
+        """
+        Create a new code for the user, or replace the code sent before once it can be resent
+        """
+        code = cls.generate_code()
+        code_hash = cls.hash_code(user, code_type, code)
+
+        verification_code = cls.objects.select_for_update().filter(
+            user=user, code_type=code_type
+        ).first()
+        if verification_code:
+            if not verification_code.can_be_resent():
+                raise ValidationError("Confirmation code already sent, please use that one.")
+            verification_code.code_hash = code_hash
+            verification_code.expires_at = None
+            verification_code.save()
+            return code
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(user=user, code_hash=code_hash, code_type=code_type)
+        except IntegrityError:
+            # created by a concurrent request
             raise ValidationError("Confirmation code already sent, please use that one.")
+        return code
 
-        cls.delete_old_codes(user, code_type)
+    @classmethod
+    @transaction.atomic
+    def send_code(cls, user: User, code_type: str):
+        from utils.services import send_confirmation_sms
 
         code = cls.create_code(user=user, code_type=code_type)
         if user.auth_method == AuthMethod.EMAIL:
@@ -198,15 +251,12 @@ class VerificationCode(BaseModel):
             elif code_type == CodeType.FORGOT_PASSWORD:
                 raise NotImplementedError
 
-    @classmethod
-    def already_sent_code(cls, user: User, code_type: str):
+    def can_be_resent(self):
         """
-        Check if the user has already sent the code
+        Check if enough time passed since the code was sent
         """
-        verification_code = cls.objects.filter(user=user, code_type=code_type).last()
-        if verification_code and not verification_code.is_expired():
-            return True
-        return False
+        resend_time = timedelta(seconds=int(settings.OTP_SETTINGS['OTP_RESEND_TIME']))
+        return self.is_expired() or self.modified_at + resend_time <= timezone.now()
 
     def is_expired(self):
         expired = self.expires_at < timezone.now()
@@ -215,21 +265,26 @@ class VerificationCode(BaseModel):
     @classmethod
     def check_code(cls, user: User, code: int, code_type: str) -> 'VerificationCode':
         verification_code: VerificationCode = cls.objects.filter(
-            user=user, code=code, code_type=code_type
-        ).last()
-        if not verification_code:
+            user=user, code_type=code_type
+        ).first()
+        if not verification_code or not constant_time_compare(
+                verification_code.code_hash, cls.hash_code(user, code_type, code)
+        ):
             raise ValidationError({"code": _("Invalid code")})
         if verification_code.is_expired():
             raise ValidationError({"code": _("Code is expired")})
 
-        # delete all other codes of this type
-        cls.delete_old_codes(user, code_type)
+        # the code can be used only once, a concurrent request using or replacing it deletes no row
+        deleted = cls.objects.filter(pk=verification_code.pk, code_hash=verification_code.code_hash).delete()[0]
+        if not deleted:
+            raise ValidationError({"code": _("Invalid code")})
         return verification_code
 
-    @classmethod
-    def delete_old_codes(cls, user: User, code_type: str, exclude_id=None):
-        codes = cls.objects.filter(user=user, code_type=code_type)
-        if exclude_id:
-            codes = codes.exclude(id=exclude_id)
 
-        codes.delete()
+class RevokedToken(BaseModel):
+    """
+    Tokens revoked before they expire, e.g. on logout.
+    Rows are removed once the token expires, see `user.revocation.TokenRevocationList`.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
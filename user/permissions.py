@@ -1,18 +1,71 @@
 from django.apps import apps
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from rest_framework.permissions import BasePermission
 
+from user.authentication import ClaimsUser
 from utils.constants import UserTypes
 
+# process-wide cache of group name -> group id, see `clear_group_ids_cache`.
+# Cleared by the signals of this process only, the other workers keep the ids of renamed
+# or recreated groups until they are restarted.
+_group_ids = {}
+
+# attribute used to keep the resolved group ids on the request user
+USER_GROUP_IDS_ATTR = '_cached_group_ids'
+
+
+def _get_group_id(group_name):
+    """
+    Returns the id of the group with the given name, the lookup is cached for the process lifetime.
+    Missing groups are not cached, they may be created by another process, e.g. on migrate.
+    """
+    group_id = _group_ids.get(group_name)
+    if group_id is None:
+        group_id = Group.objects.filter(name=group_name).values_list('id', flat=True).first()
+        if group_id is not None:
+            _group_ids[group_name] = group_id
+    return group_id
+
+
+def clear_group_ids_cache():
+    _group_ids.clear()
+
+
+def _get_user_group_ids(user):
+    """
+    Returns the ids of the groups the user belongs to.
+    Resolved once and kept on the user object, so it lives as long as the request does.
+
+    Users authenticated from the token claims are in the group of their user type,
+    the same group they are added to on creation.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    # accessed through __dict__, so a `ClaimsUser` is not loaded from the database
+    group_ids = user.__dict__.get(USER_GROUP_IDS_ATTR)
+    if group_ids is None:
+        if isinstance(user, ClaimsUser):
+            group_ids = frozenset(filter(None, [_get_group_id(user.user_type)]))
+        else:
+            group_ids = frozenset(
+                get_user_model().groups.through.objects.filter(
+                    user_id=user.id
+                ).values_list('group_id', flat=True)
+            )
+        user.__dict__[USER_GROUP_IDS_ATTR] = group_ids
+    return group_ids
+
 
 def _is_in_group(user, group_name):
     """
     Takes a user and a group name, and returns `True` if the user is in that group.
     """
-    try:
-        return Group.objects.get(name=group_name).user_set.filter(id=user.id).exists()
-    except Group.DoesNotExist:
+    group_id = _get_group_id(group_name)
+    if group_id is None:
         return None
+    return group_id in _get_user_group_ids(user)
 
 
 def _has_group_permission(user, required_groups):
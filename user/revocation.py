@@ -0,0 +1,99 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from utils.bloom import BloomFilter
+
+USER_REVOCATION_KEY = 'auth:revoked:user:{user_id}'
+
+
+def revoke_user_tokens(user_id):
+    """
+    Revoke all tokens issued to the user until now.
+    Kept as long as a refresh token lives, older tokens are expired anyway.
+    Kept in the default cache, which must be shared by all the workers, see `user.checks.check_revocation_cache`.
+    """
+    timeout = int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+    cache.set(USER_REVOCATION_KEY.format(user_id=user_id), time.time(), timeout=timeout)
+
+
+def is_user_token_revoked(user_id, issued_at) -> bool:
+    """
+    :param issued_at: `user.tokens.get_token_issued_at`, compared with sub-second precision,
+        so a token issued right after the revocation is accepted
+    """
+    revoked_at = cache.get(USER_REVOCATION_KEY.format(user_id=user_id))
+    return revoked_at is not None and (issued_at or 0) <= revoked_at
+
+
+class TokenRevocationList:
+    """
+    Revoked token ids stored in `RevokedToken`, fronted by an in-process bloom filter.
+
+    Only ids the filter reports as possibly revoked are looked up in the table,
+    so checking a token which was not revoked costs no query.
+    The filter is rebuilt every `rebuild_interval` seconds, expired rows are removed on rebuild.
+    Tokens revoked by another process are rejected once this process rebuilds its filter.
+    """
+
+    def __init__(self, rebuild_interval: int, error_rate: float):
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self._filter = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def revoke(self, token):
+        from user.models import RevokedToken
+
+        jti = token[api_settings.JTI_CLAIM]
+        RevokedToken.objects.get_or_create(
+            jti=jti, defaults={'expires_at': datetime_from_epoch(token['exp'])}
+        )
+        self._get_filter().add(jti)
+
+    def is_revoked(self, jti) -> bool:
+        from user.models import RevokedToken
+
+        if not jti or jti not in self._get_filter():
+            return False
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+    def rebuild(self):
+        from user.models import RevokedToken
+
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        jtis = list(RevokedToken.objects.values_list('jti', flat=True))
+
+        # leave room for the tokens revoked until the next rebuild
+        bloom_filter = BloomFilter(capacity=max(len(jtis) * 2, 1024), error_rate=self.error_rate)
+        for jti in jtis:
+            bloom_filter.add(jti)
+
+        self._filter = bloom_filter
+        self._built_at = time.monotonic()
+
+    def _get_filter(self) -> BloomFilter:
+        if self._filter is None:
+            with self._lock:
+                if self._filter is None:
+                    self.rebuild()
+        elif time.monotonic() - self._built_at > self.rebuild_interval:
+            # a single thread rebuilds, the others keep using the current filter
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.rebuild()
+                finally:
+                    self._lock.release()
+        return self._filter
+
+
+revocation_list = TokenRevocationList(
+    rebuild_interval=int(settings.AUTH_SETTINGS['REVOCATION_REBUILD_INTERVAL']),
+    error_rate=float(settings.AUTH_SETTINGS['REVOCATION_ERROR_RATE']),
+)
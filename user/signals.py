@@ -1,4 +1,7 @@
-from user.permissions import create_groups
+from user.authentication import user_cache
+from user.permissions import create_groups, clear_group_ids_cache, USER_GROUP_IDS_ATTR
+from user.revocation import revoke_user_tokens
+from user.tokens import get_user_claims
 
 
 def create_groups_signal(sender, **kwargs):
@@ -7,3 +10,38 @@ def create_groups_signal(sender, **kwargs):
     """
     if sender.name == 'user':
         create_groups()
+
+
+def clear_group_ids_cache_signal(sender, **kwargs):
+    """
+    group saved or deleted, cached group ids may be outdated
+    """
+    clear_group_ids_cache()
+
+
+def user_groups_changed_signal(sender, instance, action, **kwargs):
+    """
+    membership changed, drop the group ids resolved for the user instance
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        instance.__dict__.pop(USER_GROUP_IDS_ATTR, None)
+
+
+def user_saved_signal(sender, instance, **kwargs):
+    """
+    tokens carry the user claims, revoke them when the claims are changed
+    """
+    user_cache.invalidate(instance.pk)
+
+    claims = get_user_claims(instance)
+    loaded_claims = instance.__dict__.get('_loaded_claims') or claims
+    changed = {claim for claim, value in claims.items() if loaded_claims[claim] != value}
+    # tokens are issued after the user is verified, there is nothing to revoke then
+    if changed - {'is_verified'} or (changed and not instance.is_verified):
+        revoke_user_tokens(instance.pk)
+    instance._loaded_claims = claims
+
+
+def user_deleted_signal(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    revoke_user_tokens(instance.pk)
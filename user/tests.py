@@ -1,3 +1,293 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.checks import Tags, run_checks
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APIRequestFactory
+
+from user.authentication import ClaimsUser, user_cache
+from user.checks import check_revocation_cache
+from user.models import User, VerificationCode
+from user.revocation import revoke_user_tokens
+from user.permissions import (
+    _get_group_id, clear_group_ids_cache,
+    IsAuthenticatedUserOrAdmin, IsCustomer, IsOwnerOrAdmin, IsStaffUser
+)
+from user.throttling import SendOTPIPRateThrottle
+from user.tokens import get_user_claims
+from user.v1.serializers import SendOTPSerializer, VerifyOTPSerializer
+from utils.constants import AuthMethod, CodeType, UserTypes
+from utils.testing import RequestQueriesMixin
+
+
+def create_user(phone_number='+998901234567', user_type=UserTypes.CUSTOMER, **kwargs):
+    return User.objects.create_user(
+        phone_number=phone_number, user_type=user_type,
+        auth_method=AuthMethod.PHONE, full_name='Test User', **kwargs
+    )
+
+
+class CacheClearingTestCase(TestCase):
+    """
+    The in-process caches outlive the test transactions, every test starts with them empty
+    """
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        clear_group_ids_cache()
+
+
+class GroupIdsCacheTest(CacheClearingTestCase):
+
+    def test_group_id_is_queried_once(self):
+        with self.assertNumQueries(1):
+            group_id = _get_group_id(UserTypes.CUSTOMER)
+        with self.assertNumQueries(0):
+            self.assertEqual(_get_group_id(UserTypes.CUSTOMER), group_id)
+
+    def test_missing_group_is_not_cached(self):
+        self.assertIsNone(_get_group_id('referee'))
+        # created by another process, no signal is sent to this one
+        Group.objects.bulk_create([Group(name='referee')])
+        self.assertEqual(_get_group_id('referee'), Group.objects.get(name='referee').pk)
+
+    def test_cache_is_cleared_on_group_change(self):
+        group = Group.objects.get(name=UserTypes.ADMIN)
+        _get_group_id(UserTypes.ADMIN)
+        group.delete()
+        self.assertIsNone(_get_group_id(UserTypes.ADMIN))
+
+
+class PermissionQueriesTest(CacheClearingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        # group ids are resolved once per process
+        for group_name in UserTypes.LIST:
+            _get_group_id(group_name)
+
+    def check_permissions(self, user, obj=None):
+        request = type('Request', (), {'user': user})()
+        for permission in (IsStaffUser(), IsCustomer(), IsOwnerOrAdmin()):
+            permission.has_permission(request, None)
+        if obj is not None:
+            IsAuthenticatedUserOrAdmin().has_object_permission(request, None, obj)
+
+    def test_claims_user_costs_no_query(self):
+        user = ClaimsUser(self.user.pk, get_user_claims(self.user))
+        with self.assertNumQueries(0):
+            self.check_permissions(user)
+            self.check_permissions(user)
+
+    def test_claims_user_object_permission(self):
+        user = ClaimsUser(self.user.pk, get_user_claims(self.user))
+        # comparing with the object loads the user, from the user cache once it is there
+        with self.assertNumQueries(1):
+            self.check_permissions(user, obj=self.user)
+        with self.assertNumQueries(0):
+            self.check_permissions(ClaimsUser(self.user.pk, get_user_claims(self.user)), obj=self.user)
+
+    def test_user_groups_are_queried_once(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.check_permissions(user, obj=user)
+            self.check_permissions(user, obj=user)
+
+    def test_membership_change_is_seen(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(IsStaffUser().has_permission(type('Request', (), {'user': user})(), None))
+        user.groups.add(Group.objects.get(name=UserTypes.ADMIN))
+        self.assertTrue(IsStaffUser().has_permission(type('Request', (), {'user': user})(), None))
+
+
+class ProtectedEndpointQueriesTest(RequestQueriesMixin, CacheClearingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.user.verify()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.get_pair_token()['access']}")
+        # warm up the process-wide caches, the revocation filter and the group ids
+        self.client.get('/api/v1/user/me/')
+        user_cache.clear()
+
+    def test_profile(self):
+        # the user is loaded once to be serialized, the permission check costs no query
+        with self.assertNumRequestQueries(1):
+            response = self.client.get('/api/v1/user/me/')
+        self.assertEqual(response.status_code, 200)
+        # the user is kept in the user cache
+        with self.assertNumRequestQueries(0):
+            self.client.get('/api/v1/user/me/')
+
+    def test_profile_update(self):
+        with self.assertNumRequestQueries(2):
+            response = self.client.patch('/api/v1/user/me/', {'full_name': 'New Name'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class UserTokensRevocationTest(CacheClearingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.user.verify()
+
+    def get_profile(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token['access']}")
+        return client.get('/api/v1/user/me/')
+
+    def test_tokens_issued_after_revocation_are_accepted(self):
+        issued_before = self.user.get_pair_token()
+        revoke_user_tokens(self.user.pk)
+        # within the same second as the revocation
+        issued_after = self.user.get_pair_token()
+
+        self.assertEqual(self.get_profile(issued_before).status_code, 401)
+        self.assertEqual(self.get_profile(issued_after).status_code, 200)
+
+
+class RevocationCacheCheckTest(TestCase):
+
+    def test_local_cache(self):
+        for backend in ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache'):
+            with self.subTest(backend=backend), override_settings(CACHES={'default': {'BACKEND': backend}}):
+                errors = check_revocation_cache(None)
+                self.assertEqual([error.id for error in errors], ['user.E001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379',
+    }})
+    def test_shared_cache(self):
+        self.assertEqual(check_revocation_cache(None), [])
+
+    def test_deploy_check(self):
+        errors = run_checks(tags=[Tags.caches], include_deployment_checks=True)
+        self.assertIn('user.E001', [error.id for error in errors])
+        self.assertNotIn('user.E001', [error.id for error in run_checks(tags=[Tags.caches])])
+
+
+class IPRateThrottleTest(TestCase):
+
+    def get_ident(self, **headers):
+        request = APIRequestFactory().post('/', REMOTE_ADDR='10.0.0.1', **headers)
+        return SendOTPIPRateThrottle().get_cache_key(request, None)
+
+    def test_forwarded_for_set_by_client_is_ignored(self):
+        self.assertEqual(self.get_ident(), self.get_ident(HTTP_X_FORWARDED_FOR='1.2.3.4'))
+
+    @override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, NUM_PROXIES=1))
+    def test_forwarded_for_behind_proxy(self):
+        self.assertEqual(
+            self.get_ident(HTTP_X_FORWARDED_FOR='1.2.3.4, 5.6.7.8'),
+            self.get_ident(HTTP_X_FORWARDED_FOR='5.6.7.8'),
+        )
+        self.assertNotEqual(self.get_ident(HTTP_X_FORWARDED_FOR='5.6.7.8'), self.get_ident())
+
+
+@mock.patch.object(VerificationCode, 'generate_code', return_value=123456)
+class OTPSerializerQueriesTest(CacheClearingTestCase):
+    phone_number = '+998901112233'
+
+    def send_otp(self, **data):
+        serializer = SendOTPSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def verify_otp(self, **data):
+        serializer = VerifyOTPSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_register(self, generate_code):
+        # user lookup, identifiers check, user insert, group, code and sms, savepoints included
+        with self.assertNumQueries(17):
+            user = self.send_otp(phone_number=self.phone_number)
+        self.assertFalse(user.is_verified)
+
+        with self.assertNumQueries(4):
+            user = self.verify_otp(phone_number=self.phone_number, code=123456)
+        self.assertTrue(user.is_verified)
+
+    def test_login(self, generate_code):
+        self.send_otp(phone_number=self.phone_number)
+        self.verify_otp(phone_number=self.phone_number, code=123456)
+        VerificationCode.objects.all().delete()
+
+        # the user is found, no uniqueness check is run
+        with self.assertNumQueries(10):
+            self.send_otp(phone_number=self.phone_number)
+        with self.assertNumQueries(4):
+            self.verify_otp(phone_number=self.phone_number, code=123456)
+
+
+class RegistrationUniquenessTest(CacheClearingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user(email='user@example.com')
+
+    def send_otp(self, **data):
+        return APIClient().post('/api/v1/user/send-otp/', data, format='json')
+
+    def test_phone_number_of_another_user(self):
+        response = self.send_otp(email='new@example.com', phone_number=self.user.phone_number)
+        self.assertEqual(response.status_code, 400)
+
+    def test_email_of_another_user(self):
+        response = self.send_otp(email='USER@example.com', phone_number='+998909998877')
+        self.assertEqual(response.status_code, 400)
+
+    def test_identifiers_of_deactivated_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.send_otp(phone_number=self.user.phone_number)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.with_deleted().count(), 1)
+
+
+@mock.patch.object(VerificationCode, 'generate_code', return_value=123456)
+class VerificationCodeTest(CacheClearingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+
+    def test_used_once(self, generate_code):
+        VerificationCode.create_code(self.user, CodeType.LOGIN)
+        VerificationCode.check_code(self.user, 123456, CodeType.LOGIN)
+        with self.assertRaises(ValidationError):
+            VerificationCode.check_code(self.user, 123456, CodeType.LOGIN)
+
+    def test_used_concurrently(self, generate_code):
+        VerificationCode.create_code(self.user, CodeType.LOGIN)
+        is_expired = VerificationCode.is_expired
+
+        def use_concurrently(verification_code):
+            # another request consumes the code after this one has read it
+            VerificationCode.objects.filter(pk=verification_code.pk).delete()
+            return is_expired(verification_code)
+
+        with mock.patch.object(VerificationCode, 'is_expired', autospec=True, side_effect=use_concurrently):
+            with self.assertRaises(ValidationError):
+                VerificationCode.check_code(self.user, 123456, CodeType.LOGIN)
+
+    def test_replaced_concurrently(self, generate_code):
+        VerificationCode.create_code(self.user, CodeType.LOGIN)
+        is_expired = VerificationCode.is_expired
+
+        def replace_concurrently(verification_code):
+            # the code is resent after this request has read the old one
+            VerificationCode.objects.filter(pk=verification_code.pk).update(code_hash='new')
+            return is_expired(verification_code)
+
+        with mock.patch.object(VerificationCode, 'is_expired', autospec=True, side_effect=replace_concurrently):
+            with self.assertRaises(ValidationError):
+                VerificationCode.check_code(self.user, 123456, CodeType.LOGIN)
+        self.assertTrue(VerificationCode.objects.filter(code_hash='new').exists())
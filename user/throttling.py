@@ -0,0 +1,49 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class IdentifierRateThrottle(SimpleRateThrottle):
+    """
+    Limits the requests made for the same phone number or email.
+    DRF keeps the request history of every key in the cache, so the limit is a sliding window
+    shared by all the workers using the same cache.
+    """
+
+    def get_cache_key(self, request, view):
+        identifier = request.data.get('phone_number') or request.data.get('email')
+        if not identifier:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': str(identifier).strip().lower()
+        }
+
+
+class IPRateThrottle(SimpleRateThrottle):
+    """
+    Limits the requests made from the same IP address, authenticated or not.
+
+    The address is taken from X-Forwarded-For only behind the `NUM_PROXIES` proxies set in REST_FRAMEWORK,
+    the header is set by the client otherwise and would give every request its own limit.
+    """
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class SendOTPIdentifierRateThrottle(IdentifierRateThrottle):
+    scope = 'send_otp_identifier'
+
+
+class SendOTPIPRateThrottle(IPRateThrottle):
+    scope = 'send_otp_ip'
+
+
+class VerifyOTPIdentifierRateThrottle(IdentifierRateThrottle):
+    scope = 'verify_otp_identifier'
+
+
+class VerifyOTPIPRateThrottle(IPRateThrottle):
+    scope = 'verify_otp_ip'
@@ -0,0 +1,35 @@
+import time
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# user fields copied into the tokens, so authentication does not need to load the user
+USER_CLAIMS = ('user_type', 'is_verified', 'is_active')
+
+# issue time with sub-second precision, `iat` is in whole seconds
+ISSUED_AT_CLAIM = 'issued_at'
+
+
+def get_user_claims(user) -> dict:
+    return {claim: getattr(user, claim) for claim in USER_CLAIMS}
+
+
+def get_token_issued_at(token):
+    """
+    Tokens issued before the claim was added fall back to `iat`
+    """
+    return token.get(ISSUED_AT_CLAIM, token.get('iat'))
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user claims,
+    the claims are copied to every access token created from it.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in get_user_claims(user).items():
+            token[claim] = value
+        token[ISSUED_AT_CLAIM] = time.time()
+        return token
@@ -1,9 +1,15 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 from base.v1.serializers import AddressSerializer
 from user.managers import UserUniqueIdentifierChecker
 from user.models import User, VerificationCode
+from user.revocation import is_user_token_revoked, revocation_list
+from user.tokens import UserClaimsRefreshToken, get_token_issued_at
 from utils.constants import AuthMethod, UserTypes, CodeType
 from utils.exceptions import UserNotVerified, UserAlreadyExists
 from utils.validators import phone_number_validator
@@ -20,6 +26,7 @@ class EmailPhoneBaseSerializer(serializers.Serializer):
         super().__init__(*args, **kwargs)
         self.user = None
         self.auth_method = None
+        self.checker = None
 
     def validate(self, attrs):
         email = attrs.get('email')
@@ -28,7 +35,9 @@ class EmailPhoneBaseSerializer(serializers.Serializer):
             raise ValidationError("Email or phone number is required")
 
         username, auth_method = self._get_username(email=email, phone_number=phone_number)
-        self.user = User.objects.filter(username=username).first()
+        # the checker keeps the user, it is passed on to the manager when the user is created
+        self.checker = UserUniqueIdentifierChecker(email, phone_number, auth_method=auth_method)
+        self.user = self.checker.user
         self.auth_method = auth_method
 
         return attrs
@@ -49,7 +58,7 @@ class SendOTPSerializer(EmailPhoneBaseSerializer):
 
         code_type = CodeType.REGISTER
         try:
-            self.user = User.objects.create_user(**validated_data)
+            self.user = User.objects.create_user(checker=self.checker, **validated_data)
         except UserNotVerified:
             pass
         except UserAlreadyExists:
@@ -129,8 +138,8 @@ class StaffUserSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         if attrs['user_type'] == 'CUSTOMER':
             raise serializers.ValidationError('You cannot create customer user')
-        checker = UserUniqueIdentifierChecker(attrs['phone_number'])
-        if checker.is_registered():
+        checker = UserUniqueIdentifierChecker(None, attrs['phone_number'], auth_method=AuthMethod.PHONE)
+        if not checker.is_phone_unique():
             raise serializers.ValidationError('User with this phone number already exist')
         return attrs
 
@@ -149,3 +158,42 @@ class UserMiniSerializer(serializers.ModelSerializer):
         )
 
 
+class UserClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserClaimsRefreshToken
+
+
+class UserClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    access tokens copy the claims of the refresh token,
+    so refresh tokens issued before the user was changed are not accepted
+    """
+    token_class = UserClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if (
+                is_user_token_revoked(refresh.get(api_settings.USER_ID_CLAIM), get_token_issued_at(refresh))
+                or revocation_list.is_revoked(refresh.get(api_settings.JTI_CLAIM))
+        ):
+            raise InvalidToken(_("Token has been revoked"))
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            refresh = UserClaimsRefreshToken(value)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        if refresh.get(api_settings.USER_ID_CLAIM) != self.context['request'].user.id:
+            raise ValidationError(_("Token does not belong to the user"))
+        return refresh
+
+    def save(self):
+        request = self.context['request']
+        revocation_list.revoke(self.validated_data['refresh'])
+        if request.auth is not None:
+            revocation_list.revoke(request.auth)
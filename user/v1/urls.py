@@ -1,9 +1,10 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
 
 from user.v1.views import (
     UserProfileAPIView,
     CustomTokenObtainPairView,
+    CustomTokenRefreshView,
+    LogoutAPIView,
     SendOTPAPIView,
     VerifyOTPAPIView
 )
@@ -15,5 +16,6 @@ urlpatterns = [
     path('me/', UserProfileAPIView.as_view(), name='me'),
 
     path('token/', CustomTokenObtainPairView.as_view(), name='token-obtain-pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token-refresh'),
+    path('logout/', LogoutAPIView.as_view(), name='logout'),
 ]
@@ -1,15 +1,23 @@
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework import generics, views
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from user.permissions import (
     IsAuthenticatedUserOrAdmin,
 )
+from user.throttling import (
+    SendOTPIdentifierRateThrottle,
+    SendOTPIPRateThrottle,
+    VerifyOTPIdentifierRateThrottle,
+    VerifyOTPIPRateThrottle
+)
 from user.v1.serializers import (
     UserSerializer,
-    StaffUserSerializer, SendOTPSerializer, VerifyOTPSerializer
+    StaffUserSerializer, SendOTPSerializer, VerifyOTPSerializer,
+    UserClaimsTokenObtainPairSerializer, UserClaimsTokenRefreshSerializer,
+    LogoutSerializer
 )
 from utils.constants import UserTypes
 from utils.response import SuccessResponse, FailResponse
@@ -19,6 +27,7 @@ class SendOTPAPIView(views.APIView):
     """
     Send OTP to user's phone or email
     """
+    throttle_classes = (SendOTPIdentifierRateThrottle, SendOTPIPRateThrottle)
 
     def post(self, request, *args, **kwargs):
         serializer = SendOTPSerializer(data=request.data)
@@ -33,6 +42,7 @@ class VerifyOTPAPIView(views.APIView):
     """
     Verify OTP and authenticate user
     """
+    throttle_classes = (VerifyOTPIdentifierRateThrottle, VerifyOTPIPRateThrottle)
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
@@ -50,6 +60,19 @@ class VerifyOTPAPIView(views.APIView):
         return SuccessResponse(**data)
 
 
+class LogoutAPIView(views.APIView):
+    """
+    Revoke the given refresh token and the access token of the request
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = LogoutSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return SuccessResponse(message=_("User successfully logged out"))
+
+
 class UserProfileAPIView(generics.RetrieveAPIView, generics.UpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticatedUserOrAdmin,)
@@ -71,7 +94,7 @@ class UserProfileAPIView(generics.RetrieveAPIView, generics.UpdateAPIView):
 class CustomTokenObtainPairView(TokenObtainPairView):
 
     def get_serializer_class(self):
-        return TokenObtainPairSerializer
+        return UserClaimsTokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
         """
@@ -98,3 +121,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             }
         }
         return SuccessResponse(**data)
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = UserClaimsTokenRefreshSerializer
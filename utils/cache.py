@@ -0,0 +1,120 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from typing import Callable, Iterable, Optional
+
+from django.core.cache import cache
+from django.http import QueryDict
+
+VERSION_KEY = 'cache:version:{namespace}'
+LOCK_SUFFIX = ':lock'
+LOCK_POLL_INTERVAL = 0.05  # seconds
+
+
+def get_cache_version(namespace: str) -> int:
+    key = VERSION_KEY.format(namespace=namespace)
+    version = cache.get(key)
+    if version is None:
+        # kept until bumped, the entries of old versions expire by their own timeout
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_cache_version(namespace: str) -> None:
+    """
+    Invalidates every entry of the namespace, the keys built from the new version are not cached yet
+    """
+    key = VERSION_KEY.format(namespace=namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # not set or evicted, any value other than the one the old entries were built from will do
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def snap_coordinate(value: str, grid: Decimal) -> Optional[str]:
+    """
+    Rounds the coordinate to the grid, e.g. 41.3123 -> 41.31 for a grid of 0.01, None if it is not a number
+    """
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not number.is_finite():
+        return None
+    return str((number / grid).quantize(Decimal(1), rounding=ROUND_HALF_EVEN) * grid)
+
+
+def normalize_query(query_params: QueryDict, coordinates: Iterable[str] = (), grid: Optional[Decimal] = None,
+                    exclude: Iterable[str] = ()) -> Optional[str]:
+    """
+    Query string with sorted parameters and the coordinates snapped to the grid,
+    so the same request is cached once however it is written. None if a coordinate is not a number.
+    """
+    items = []
+    for name in sorted(query_params):
+        if name in exclude:
+            continue
+        for value in sorted(query_params.getlist(name)):
+            if name in coordinates and grid is not None and value:
+                value = snap_coordinate(value, grid)
+                if value is None:
+                    return None
+            items.append((name, value))
+    query = QueryDict(mutable=True)
+    for name, value in items:
+        query.appendlist(name, value)
+    return query.urlencode()
+
+
+def make_cache_key(namespace: str, *parts: str) -> str:
+    digest = hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+    return f'cache:{namespace}:{get_cache_version(namespace)}:{digest}'
+
+
+def get_or_set_single_flight(key: str, build: Callable, timeout: int, lock_timeout: int):
+    """
+    Returns the cached value or builds it, only one caller builds a missing value.
+
+    The others wait for it up to `lock_timeout` seconds and build it themselves if it does not appear,
+    e.g. the builder failed or the lock expired. `build` must not return None.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = key + LOCK_SUFFIX
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, timeout=timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return build()
+
+
+@contextmanager
+def cache_lock(key: str, timeout: int):
+    """
+    Lock shared by the processes using the same cache, waits until it is free.
+    Held for at most `timeout` seconds, so a holder which died does not keep it.
+    """
+    lock_key = key + LOCK_SUFFIX
+    while not cache.add(lock_key, 1, timeout=timeout):
+        time.sleep(LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
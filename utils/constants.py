@@ -20,6 +20,13 @@ class Languages:
         (RUSSIAN, _('Russian')),
     )
 
+    # PostgreSQL text search configurations, there is none for Uzbek, its words are indexed as they are
+    SEARCH_CONFIGS = {
+        ENGLISH: 'english',
+        UZBEK: 'simple',
+        RUSSIAN: 'russian',
+    }
+
 
 class UserTypes:
     CUSTOMER = 'customer'
@@ -118,3 +125,37 @@ class BookingStatus:
         (CANCELLED, _("Cancelled")),
         (COMPLETED, _("Completed")),
     )
+
+
+class SMSStatus:
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    EXPIRED = 'expired'
+    # the provider did not answer within the lease, the message may have been sent, it is not retried
+    UNKNOWN = 'unknown'
+
+    CHOICES = (
+        (PENDING, _("Pending")),
+        (SENDING, _("Sending")),
+        (SENT, _("Sent")),
+        (FAILED, _("Failed")),
+        (EXPIRED, _("Expired")),
+        (UNKNOWN, _("Unknown")),
+    )
+
+
+class UploadStatus:
+    ACTIVE = 'active'
+    COMPLETED = 'completed'
+
+    CHOICES = (
+        (ACTIVE, _("Active")),
+        (COMPLETED, _("Completed")),
+    )
+
+
+class CacheNamespace:
+    # responses of the field list, invalidated by changes of the fields and their bookings
+    FIELDS_LIST = 'fields-list'
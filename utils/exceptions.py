@@ -1,5 +1,5 @@
 from django.utils.translation import gettext_lazy as _
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
 
 
 class UserNotVerified(APIException):
@@ -7,4 +7,13 @@ class UserNotVerified(APIException):
 
 
 class UserAlreadyExists(APIException):
-    default_detail = _('User already exists')
\ No newline at end of file
+    default_detail = _('User already exists')
+
+
+class UploadOffsetMismatch(ValidationError):
+    """
+    Raised as a validation error, so the handler reports the expected offset in the message
+    """
+    status_code = 409
+    default_detail = _('Chunk does not start at the current offset of the upload')
+    default_code = 'upload_offset_mismatch'
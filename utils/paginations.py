@@ -1,11 +1,144 @@
+import base64
+import datetime
+import hashlib
+import json
+from functools import reduce
+from operator import or_, and_
+from typing import List, Tuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.paginator import Paginator, Page, PageNotAnInteger, EmptyPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.query import ValuesListIterable
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ApproximatePage(Page):
+    """
+    Page of an approximately counted queryset, whether there is a next page is known from the rows
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CountingPaginator(Paginator):
+    """
+    Paginator which avoids counting the queryset on every request.
+
+    Exact counts are cached per query with a short timeout. On PostgreSQL, when the planner estimates
+    more rows than the threshold the estimate is used instead, `count_approximate` is set then and
+    the pages are not limited by the count.
+    """
+
+    @cached_property
+    def count_query(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return None
+        # the ordering and the selected columns do not change the count
+        return queryset.order_by().values('pk')
+
+    @cached_property
+    def count_signature(self) -> Optional[str]:
+        if self.count_query is None:
+            return None
+        sql, params = self.count_query.query.sql_with_params()
+        return hashlib.sha1(f'{self.count_query.db}:{sql}:{params!r}'.encode()).hexdigest()
+
+    @cached_property
+    def _count(self) -> Tuple[int, bool]:
+        if self.count_signature is None:
+            return super().count, False
+
+        cache_key = f'pagination:count:{self.count_signature}'
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        estimate = self.estimate_count()
+        if estimate is not None and estimate >= int(settings.PAGINATION_SETTINGS['COUNT_ESTIMATE_THRESHOLD']):
+            result = (estimate, True)
+        else:
+            result = (super().count, False)
+        cache.set(cache_key, result, int(settings.PAGINATION_SETTINGS['COUNT_CACHE_TIMEOUT']))
+        return result
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_approximate(self) -> bool:
+        return self._count[1]
+
+    def estimate_count(self) -> Optional[int]:
+        """
+        Rows estimated by the PostgreSQL planner, None on other databases
+        """
+        connection = connections[self.count_query.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.count_query.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def validate_number(self, number):
+        if not self.count_approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        if not self.count_approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return ApproximatePage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
 
 
 class DynamicPagination(PageNumberPagination):
+    """
+    Page number pagination, or keyset pagination when the `cursor` query parameter is given.
+
+    Keyset pagination continues after the ordering key of the last row, e.g. (distance, name, id),
+    instead of counting and skipping the previous rows. Pass an empty `?cursor=` for the first page,
+    the `next` and `previous` links carry the cursor of the following pages. The key columns must be
+    names of fields or annotations, `id` is added to make the key unique.
+    """
     page_size = 10  # Default page size
     page_size_query_param = 'page_size'  # Query parameter for custom page size
     max_page_size = 100  # Maximum page size allowed
+    cursor_query_param = 'cursor'
+    django_paginator_class = CountingPaginator
+
+    cursor = None
 
     def get_page_size(self, request):
         if self.page_size_query_param in request.query_params:
@@ -17,17 +150,220 @@ class DynamicPagination(PageNumberPagination):
                 pass
         return self.page_size
 
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = None
+        if self.cursor_query_param in request.query_params:
+            return self.paginate_queryset_by_cursor(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        keys = get_ordering_keys(queryset)
+        values, reverse = decode_cursor(request.query_params[self.cursor_query_param], len(keys))
+
+        queryset = queryset.order_by(*(f"{'-' if desc else ''}{name}" for name, desc in keys))
+        if reverse:
+            queryset = queryset.reverse()
+            keys = [(name, not desc) for name, desc in keys]
+        if values is not None:
+            try:
+                values = [to_key_value(queryset, name, value) for (name, _), value in zip(keys, values)]
+                queryset = queryset.filter(get_keyset_filter(keys, values))
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(_("Invalid cursor"))
+
+        is_values_list = issubclass(queryset._iterable_class, ValuesListIterable)
+        if is_values_list:
+            # the key is read from extra columns of the rows, annotated as the key may not be selected
+            queryset = queryset.annotate(**{f'cursor_key_{index}': F(name) for index, (name, _) in enumerate(keys)})
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        if is_values_list:
+            row_keys = [row[-len(keys):] for row in rows]
+            rows = [row[:-len(keys)] for row in rows]
+        else:
+            row_keys = [tuple(get_key_value(row, name) for name, _ in keys) for row in rows]
+
+        self.cursor = {
+            'next': row_keys[-1] if row_keys and (has_more or reverse) else None,
+            'previous': row_keys[0] if row_keys and (values is not None and (not reverse or has_more)) else None,
+        }
+        return rows
+
+    def get_cursor_link(self, values, reverse=False):
+        if values is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(values, reverse))
+
     def get_paginated_response(self, data):
         return Response(self.get_paginated_data(data))
 
+    def get_links_for_request(self, links: dict) -> dict:
+        """
+        Links of a cached page for the current request,
+        the cached links carry the query string of the request they were built for
+        """
+        url = self.request.build_absolute_uri()
+        return {name: self._relink(url, link) for name, link in links.items()}
+
+    def _relink(self, url, link):
+        if link is None:
+            return None
+        query = parse_qs(urlparse(link).query)
+        for param in (self.page_query_param, self.cursor_query_param):
+            if param in query:
+                url = replace_query_param(url, param, query[param][0])
+            else:
+                url = remove_query_param(url, param)
+        return url
+
     def get_paginated_data(self, data):
+        if self.cursor is not None:
+            # the count is skipped in keyset pagination
+            return {
+                'links': {
+                    'next': self.get_cursor_link(self.cursor['next']),
+                    'previous': self.get_cursor_link(self.cursor['previous'], reverse=True)
+                },
+                'count': None,
+                'count_approximate': None,
+                'current_page': None,
+                'total_pages': None,
+                'results': data
+            }
         return {
             'links': {
                 'next': self.get_next_link(),
                 'previous': self.get_previous_link()
             },
             'count': self.page.paginator.count,
+            'count_approximate': getattr(self.page.paginator, 'count_approximate', False),
             'current_page': self.page.number,
             'total_pages': self.page.paginator.num_pages,
             'results': data
         }
+
+
+def get_ordering_keys(queryset) -> List[Tuple[str, bool]]:
+    """
+    Returns the (name, descending) pairs of the ordering of the queryset, with `id` as the last key
+    """
+    ordering = queryset.query.order_by or queryset.query.get_meta().ordering
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str):
+            raise ValidationError(_("Cursor pagination is not supported for this ordering"))
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = 'id'
+        keys.append((name, item.startswith('-')))
+    if 'id' not in [name for name, _ in keys]:
+        keys.append(('id', False))
+    return keys
+
+
+def get_key_value(instance, name):
+    for attr in name.split('__'):
+        instance = getattr(instance, attr) if instance is not None else None
+    if hasattr(instance, 'pk'):
+        return instance.pk
+    return instance
+
+
+def get_key_field(queryset, name):
+    """
+    Model field or output field of the annotation the key is read from, None if it is not found
+    """
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    model = queryset.model
+    field = None
+    for attr in name.split('__'):
+        if model is None:
+            return None
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    return field
+
+
+def to_key_value(queryset, name, value):
+    """
+    Converts a value of the cursor to the type of its key, raises ValidationError if it is not one
+    """
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        raise DjangoValidationError(_("Invalid cursor"))
+    field = get_key_field(queryset, name)
+    if not hasattr(field, 'to_python'):
+        return value
+    return field.to_python(value)
+
+
+def get_keyset_filter(keys: List[Tuple[str, bool]], values) -> Q:
+    """
+    Rows after the key, (a > 1) | (a = 1 & b > 2) | (a = 1 & b = 2 & id > 3)
+    NULLs sort as in PostgreSQL, after the values in ascending order
+    """
+    conditions = []
+    for index, ((name, desc), value) in enumerate(zip(keys, values)):
+        equal = [_equal(key_name, key_value) for (key_name, _), key_value in zip(keys[:index], values[:index])]
+        conditions.append(reduce(and_, equal + [_after(name, desc, value)]))
+    return reduce(or_, conditions)
+
+
+def _equal(name, value) -> Q:
+    if value is None:
+        return Q(**{f'{name}__isnull': True})
+    return Q(**{name: value})
+
+
+def _after(name, desc, value) -> Q:
+    if value is None:
+        # NULLs are last in ascending and first in descending order
+        return Q(pk__in=[]) if not desc else Q(**{f'{name}__isnull': False})
+    if desc:
+        return Q(**{f'{name}__lt': value})
+    return Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """
+    Keeps the microseconds, the key must compare equal to the stored value
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, reverse=False) -> str:
+    data = json.dumps({'v': list(values), 'r': int(reverse)}, cls=CursorJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int):
+    """
+    Returns the key values and whether to page backwards, no values for the first page
+    """
+    if not cursor:
+        return None, False
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, reverse = data['v'], bool(data['r'])
+    except (TypeError, ValueError, KeyError):
+        raise NotFound(_("Invalid cursor"))
+    if not isinstance(values, list) or len(values) != size:
+        raise NotFound(_("Invalid cursor"))
+    return values, reverse
@@ -0,0 +1,59 @@
+from bisect import bisect_left, insort
+from typing import Hashable, Iterable, List, Tuple
+
+
+class PrefixIndex:
+    """
+    Sorted array of (key, item id) searched by prefix with bisect.
+    Every item is found by each of its keys, e.g. its name from the start of every word.
+    Adding and removing single items keeps the array sorted, `build` sorts it once.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, Hashable]] = []
+        # item id -> (value returned by `search`, keys)
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def build(self, items: Iterable[Tuple[Hashable, Iterable[str], object]]):
+        """
+        Replaces the index with the (item id, keys, value) items
+        """
+        self._items = {item_id: (value, tuple(set(keys))) for item_id, keys, value in items}
+        self._keys = sorted((key, item_id) for item_id, (_, keys) in self._items.items() for key in keys)
+
+    def add(self, item_id: Hashable, keys: Iterable[str], value):
+        self.remove(item_id)
+        keys = tuple(set(keys))
+        for key in keys:
+            insort(self._keys, (key, item_id))
+        self._items[item_id] = (value, keys)
+
+    def remove(self, item_id: Hashable):
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            index = bisect_left(self._keys, (key, item_id))
+            if index < len(self._keys) and self._keys[index] == (key, item_id):
+                del self._keys[index]
+
+    def search(self, prefix: str, limit: int) -> list:
+        """
+        Values of the first `limit` items with a key starting with the prefix, in the order of the keys
+        """
+        keys = self._keys
+        results = []
+        seen = set()
+        index = bisect_left(keys, (prefix,))
+        while index < len(keys) and len(results) < limit:
+            key, item_id = keys[index]
+            if not key.startswith(prefix):
+                break
+            if item_id not in seen:
+                seen.add(item_id)
+                results.append(self._items[item_id][0])
+            index += 1
+        return results
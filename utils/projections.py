@@ -0,0 +1,85 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Union
+
+from utils.serializers import Fieldset, freeze_fieldset, thaw_fieldset
+
+
+def field_converter(field) -> Callable:
+    """
+    Converter from a serializer field, so values are represented as the serializer does, e.g. datetimes
+    """
+    to_representation = field.to_representation
+
+    def convert(value):
+        return None if value is None else to_representation(value)
+
+    return convert
+
+
+class Projection:
+    """
+    Fast path for list responses, reads `values_list()` rows instead of model instances
+    and maps them to the response of the serializer it stands for.
+
+    `fields` maps the keys of the response to a lookup, a (lookup, converter) pair
+    or a dict of the same for nested objects. The row mapper is compiled once per class and fieldset,
+    with a fieldset only the requested lookups are selected, so unrequested relations are not joined.
+    """
+    fields: Dict[str, Union[str, tuple, dict]] = {}
+
+    def __init__(self, fieldset: Optional[Fieldset] = None):
+        self.lookups, self.map_row = _compile(type(self), freeze_fieldset(fieldset))
+
+    def apply(self, queryset):
+        # the relations are joined by the lookups, the eager loading of the serializer is not needed
+        return queryset.prefetch_related(None).values_list(*self.lookups)
+
+    def map(self, rows) -> List[dict]:
+        map_row = self.map_row
+        return [map_row(row) for row in rows]
+
+    @staticmethod
+    def _prune(fields: dict, fieldset: Optional[Fieldset]) -> dict:
+        if not fieldset:
+            return fields
+        pruned = {}
+        for key, value in fields.items():
+            if key not in fieldset:
+                continue
+            if isinstance(value, dict):
+                value = Projection._prune(value, fieldset[key])
+            pruned[key] = value
+        return pruned
+
+    @staticmethod
+    def _compile(fields: dict):
+        lookups = []
+        namespace = {}
+
+        def build(declaration: dict) -> str:
+            items = []
+            for key, value in declaration.items():
+                if isinstance(value, dict):
+                    expression = build(value)
+                else:
+                    lookup, converter = value if isinstance(value, tuple) else (value, None)
+                    if lookup not in lookups:
+                        lookups.append(lookup)
+                    expression = f'row[{lookups.index(lookup)}]'
+                    if converter is not None:
+                        name = f'convert_{len(namespace)}'
+                        namespace[name] = converter
+                        expression = f'{name}({expression})'
+                items.append(f'{key!r}: {expression}')
+            return '{%s}' % ', '.join(items)
+
+        source = f'def map_row(row):\n    return {build(fields)}\n'
+        exec(compile(source, f'<projection {id(fields)}>', 'exec'), namespace)
+        # nothing requested, a column is still selected for the pagination
+        return tuple(lookups) or ('pk',), namespace['map_row']
+
+
+@lru_cache(maxsize=128)
+def _compile(projection_class, frozen_fieldset):
+    fields = Projection._prune(projection_class.fields, thaw_fieldset(frozen_fieldset))
+    return Projection._compile(fields)
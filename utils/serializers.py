@@ -0,0 +1,256 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+# name -> None for the whole field or the fieldset of a nested serializer, see `parse_fieldset`
+Fieldset = dict
+
+
+def parse_fieldset(value: str) -> Optional[Fieldset]:
+    """
+    Parses `?fields=id,name,address.latitude` into {'id': None, 'name': None, 'address': {'latitude': None}}
+    """
+    fieldset = {}
+    for path in value.split(','):
+        names = [name.strip() for name in path.split('.')]
+        if not all(names):
+            continue
+        node = fieldset
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                # the whole field is requested already
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = None
+    return fieldset or None
+
+
+def freeze_fieldset(fieldset: Optional[Fieldset]):
+    if fieldset is None:
+        return None
+    return tuple(sorted((name, freeze_fieldset(nested)) for name, nested in fieldset.items()))
+
+
+def thaw_fieldset(frozen) -> Optional[Fieldset]:
+    if frozen is None:
+        return None
+    return {name: thaw_fieldset(nested) for name, nested in frozen}
+
+
+def prune_fields(fields: dict, fieldset: Optional[Fieldset]) -> dict:
+    """
+    Keeps the fields in the fieldset, nested serializers are pruned to their part of it
+    """
+    if not fieldset:
+        return fields
+
+    pruned = {}
+    for name, field in fields.items():
+        if name not in fieldset:
+            continue
+        nested_fieldset = fieldset[name]
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if nested_fieldset and isinstance(nested, serializers.Serializer):
+            nested.get_fields = lambda get_fields=nested.get_fields, nested_fieldset=nested_fieldset: (
+                prune_fields(get_fields(), nested_fieldset)
+            )
+        pruned[name] = field
+    return pruned
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin which returns only the fields requested with `?fields=`,
+    the view passes the parsed fieldset as `fieldset` in the context.
+    Serializers given data are never pruned, every writable field is validated.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if hasattr(root, 'initial_data'):
+            return fields
+        if root is self or (self.parent is root and isinstance(root, serializers.ListSerializer)):
+            fields = prune_fields(fields, self.context.get('fieldset'))
+        return fields
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin which loads the relations the serializer reads together with the queryset.
+
+    Relations are collected from the declared fields, nested serializers and dotted sources,
+    including the fields of nested serializers. Relations read elsewhere, e.g. in `to_representation`,
+    are declared in `select_related_fields` and `prefetch_related_fields`,
+    as a tuple or as a dict of field name -> lookups needed by that field.
+
+    With a fieldset only the requested relations are loaded and, if every requested field maps to a column,
+    only those columns. Columns read by method fields are declared in `method_field_columns`.
+    """
+    select_related_fields = ()
+    # lookups or `Prefetch` objects
+    prefetch_related_fields = ()
+    # method field name -> columns it reads
+    method_field_columns = {}
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fieldset: Optional[Fieldset] = None):
+        if not issubclass(cls, SparseFieldsetMixin):
+            fieldset = None
+        select_related, prefetch_related, only = cls.get_related_lookups(freeze_fieldset(fieldset))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if only:
+            queryset = queryset.only(*only)
+        return queryset
+
+    @classmethod
+    @lru_cache(maxsize=128)
+    def get_related_lookups(cls, frozen_fieldset=None) -> Tuple[Tuple[str], Tuple, Optional[Tuple[str]]]:
+        # the fields depend on the class and the fieldset only, they are collected once
+        fieldset = thaw_fieldset(frozen_fieldset)
+        serializer = cls(context={'fieldset': fieldset})
+        select_related, prefetch_related = get_related_lookups(serializer, cls.Meta.model)
+        only = get_columns(serializer, cls.Meta.model) if fieldset else None
+        return (
+            tuple(dict.fromkeys(select_related)),
+            tuple(prefetch_related),
+            tuple(dict.fromkeys(only)) if only else None,
+        )
+
+
+def _get_declared(serializer, name: str) -> list:
+    declared = getattr(serializer, name, ())
+    if isinstance(declared, dict):
+        fields = serializer.fields
+        return [lookup for field_name, lookups in declared.items() if field_name in fields for lookup in lookups]
+    return list(declared)
+
+
+def get_related_lookups(serializer, model) -> Tuple[List[str], List]:
+    """
+    Returns the select_related and prefetch_related lookups of the serializer for the model
+    """
+    select_related = _get_declared(serializer, 'select_related_fields')
+    prefetch_related = _get_declared(serializer, 'prefetch_related_fields')
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            if isinstance(field, serializers.BaseSerializer):
+                nested_select, nested_prefetch = get_related_lookups(field, model)
+                select_related += nested_select
+                prefetch_related += nested_prefetch
+            continue
+
+        path, related_model, many = _resolve_relation(model, field.source_attrs)
+        if not path:
+            continue
+        lookup = '__'.join(path)
+        is_relation = len(path) == len(field.source_attrs)
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(nested, serializers.BaseSerializer):
+            if not is_relation:
+                # e.g. a method of the model, declared by the serializer if needed
+                continue
+            nested_select, nested_prefetch = get_related_lookups(nested, related_model)
+            if many:
+                prefetch_related.append(lookup)
+                prefetch_related += [_add_prefix(item, lookup) for item in nested_select + nested_prefetch]
+            else:
+                select_related.append(lookup)
+                select_related += [_add_prefix(item, lookup) for item in nested_select]
+                prefetch_related += [_add_prefix(item, lookup) for item in nested_prefetch]
+        elif many:
+            prefetch_related.append(lookup)
+        elif not (is_relation and isinstance(field, serializers.PrimaryKeyRelatedField)):
+            # the primary key of a relation is read from the row
+            select_related.append(lookup)
+
+    return select_related, prefetch_related
+
+
+def get_columns(serializer, model) -> Optional[List[str]]:
+    """
+    Returns the columns the serializer reads for `only()`,
+    None if a field reads something else than columns and relations
+    """
+    method_field_columns = getattr(serializer, 'method_field_columns', {})
+    columns = [model._meta.pk.name]
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in method_field_columns:
+            columns += method_field_columns[name]
+            continue
+        if field.source == '*':
+            if not isinstance(field, serializers.BaseSerializer):
+                return None
+            nested_columns = get_columns(field, model)
+            if nested_columns is None:
+                return None
+            columns += nested_columns
+            continue
+
+        path, related_model, many = _resolve_relation(model, field.source_attrs)
+        if many:
+            # loaded by prefetch_related, it does not depend on the columns of the row
+            continue
+        rest = field.source_attrs[len(path):]
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(nested, serializers.BaseSerializer):
+            if rest:
+                return None
+            nested_columns = get_columns(nested, related_model)
+            if nested_columns is None:
+                return None
+            columns += ['__'.join(path + [column]) for column in nested_columns]
+        elif not rest:
+            columns.append('__'.join(path))
+        elif len(rest) == 1 and _is_column(related_model, rest[0]):
+            columns.append('__'.join(path + rest))
+        else:
+            return None
+    return columns
+
+
+def _is_column(model, name: str) -> bool:
+    try:
+        return model._meta.get_field(name).concrete
+    except FieldDoesNotExist:
+        return False
+
+
+def _resolve_relation(model, attrs) -> Tuple[List[str], type, bool]:
+    """
+    Follows the relations of the source, returns the relation names,
+    the model at the end and whether any of them is to many
+    """
+    path = []
+    many = False
+    for attr in attrs:
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not model_field.is_relation:
+            break
+        path.append(attr)
+        many = many or model_field.many_to_many or model_field.one_to_many
+        model = model_field.related_model
+    return path, model, many
+
+
+def _add_prefix(lookup, prefix: str):
+    if isinstance(lookup, Prefetch):
+        return Prefetch(f'{prefix}__{lookup.prefetch_through}', queryset=lookup.queryset, to_attr=lookup.to_attr)
+    return f'{prefix}__{lookup}'
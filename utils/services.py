@@ -1,5 +1,9 @@
-from rest_framework.exceptions import ValidationError
+from datetime import timedelta
 
+from django.conf import settings
+from django.utils import timezone
+
+from notifications.models import SMSMessage
 from user.models import User
 
 
@@ -8,14 +12,13 @@ def send_confirmation_sms(user: User, code: int):
     Send confirmation code to the user's phone number
     """
     body = f'Welcome to Field Booking Service App! Your confirmation code is {code}'
-    send_sms(to=user.phone_number, body=body)
+    expires_at = timezone.now() + timedelta(seconds=int(settings.OTP_SETTINGS['OTP_EXPIRE_TIME']))
+    send_sms(to=user.phone_number, body=body, expires_at=expires_at)
 
 
-def send_sms(to, body):
-    try:
-        # here we should implement sms sending logic
-        return
-    except Exception as e:
-        raise ValidationError(
-            {'message': f'While sending sms we detected that there is an error. {e}'}
-        )
+def send_sms(to, body, expires_at=None):
+    """
+    Queue the sms in the outbox, it is sent by the `dispatch_sms` command.
+    Written in the current transaction, so it is sent only if the transaction is committed.
+    """
+    return SMSMessage.objects.create(phone_number=to, body=body, expires_at=expires_at)
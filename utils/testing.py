@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class CaptureQueriesWithoutSavepointsContext(CaptureQueriesContext):
+    """
+    Captures the queries without the savepoints, which depend on `ATOMIC_REQUESTS` and the test transaction
+    """
+
+    @property
+    def captured_queries(self):
+        return [query for query in super().captured_queries if not query['sql'].startswith(SAVEPOINT_PREFIXES)]
+
+
+class RequestQueriesMixin:
+    """
+    Test case mixin counting the queries of a request the same way whether or not it runs in a transaction
+    """
+
+    @contextmanager
+    def assertNumRequestQueries(self, num: int):
+        with CaptureQueriesWithoutSavepointsContext(connection) as context:
+            yield context
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertEqual(len(context), num, f'{len(context)} queries executed, {num} expected:\n{queries}')
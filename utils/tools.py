@@ -1,8 +1,20 @@
 from datetime import datetime
 
+from django.utils import dateparse, timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
 
 def parse_datetime(value: str) -> datetime:
     """
-    Parse a string to datetime object
+    Parse a string to datetime object, naive values are in the current time zone
     """
-    pass
\ No newline at end of file
+    try:
+        parsed = dateparse.parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError(_("Invalid date and time: %(value)s") % {'value': value})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed